@@ -0,0 +1,385 @@
+"""
+网格策略回测模块
+把历史成交或 K 线数据逐行回放给 GridTradingStrategy，模拟限价单撮合、手续费、
+杠杆保证金和强平，输出盈亏、成交次数、最大回撤和强平事件
+
+数据按生成器逐行读取，不会把整个文件载入内存，可以处理上百万行的数据
+
+使用方法:
+    python backtester.py trades.csv
+    python backtester.py klines.csv.gz --capital 5000 --maker-fee 0.0002
+"""
+
+import argparse
+import bisect
+import csv
+import gzip
+import itertools
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from grid_trading_strategy import GridTradingStrategy, GridOrder
+
+
+# 各列可能使用的列名
+TIME_COLUMNS = ('timestamp', 'time', 'ts', 'date', 'datetime', 'open_time')
+PRICE_COLUMNS = ('price', 'last', 'trade_price')
+
+
+def open_data_file(path: str):
+    """打开数据文件（.gz 结尾的文件按 gzip 解压读取）"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, 'r', newline='')
+
+
+def _find_column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    """在表头中查找列，找不到时返回 None"""
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def read_price_path(path: str, start: Any = None, end: Any = None) -> Iterator[Tuple[Any, float]]:
+    """
+    逐行读取历史数据，生成 (时间, 价格) 序列
+    
+    支持两种 CSV 格式（第一行为表头）:
+    - 逐笔成交: 包含 price 列
+    - K 线: 包含 open、high、low、close 列，每根 K 线按 开 -> 低 -> 高 -> 收（阳线）
+      或 开 -> 高 -> 低 -> 收（阴线）的路径展开为 4 个价格
+    
+    也可以传入 tick_store 转换的列式存储目录，此时直接从映射的列中读取，
+    并可用 start/end 按时间范围截取
+    
+    Args:
+        path: 数据文件路径或列式存储目录
+        start: 开始时间（含），仅列式存储支持
+        end: 结束时间（不含），仅列式存储支持
+    
+    Yields:
+        (时间, 价格)，时间为原始字符串（列式存储为毫秒时间戳），没有时间列时为行号
+    """
+    if os.path.isdir(path):
+        from tick_store import TickStore
+        with TickStore(path) as store:
+            yield from store.price_path(start, end)
+        return
+    if start is not None or end is not None:
+        raise ValueError("按时间范围截取需要先用 tick_store.py 转换为列式存储")
+    
+    with open_data_file(path) as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        time_col = _find_column(header, TIME_COLUMNS)
+        price_col = _find_column(header, PRICE_COLUMNS)
+        
+        if price_col is not None:
+            for row_number, row in enumerate(reader, 1):
+                if not row:
+                    continue
+                yield (row[time_col] if time_col is not None else row_number), float(row[price_col])
+            return
+        
+        try:
+            o, h, l, c = (header.index(name) for name in ('open', 'high', 'low', 'close'))
+        except ValueError:
+            raise ValueError(f"无法识别数据格式，需要 price 列或 open/high/low/close 列: {header}")
+        for row_number, row in enumerate(reader, 1):
+            if not row:
+                continue
+            timestamp = row[time_col] if time_col is not None else row_number
+            open_price, high, low, close = float(row[o]), float(row[h]), float(row[l]), float(row[c])
+            yield timestamp, open_price
+            if close >= open_price:
+                yield timestamp, low
+                yield timestamp, high
+            else:
+                yield timestamp, high
+                yield timestamp, low
+            yield timestamp, close
+
+
+@dataclass
+class LiquidationEvent:
+    """强平事件"""
+    timestamp: Any
+    price: float
+    position: float  # 强平前的持仓（正为多，负为空）
+    equity: float  # 强平时的账户权益
+
+
+@dataclass
+class BacktestResult:
+    """回测结果"""
+    rows: int = 0  # 回放的价格数
+    fills: int = 0  # 成交次数
+    buy_fills: int = 0
+    sell_fills: int = 0
+    volume: float = 0.0  # 成交额（名义价值）
+    fees: float = 0.0
+    realized_pnl: float = 0.0  # 已实现盈亏（未扣手续费）
+    unrealized_pnl: float = 0.0
+    position: float = 0.0  # 结束时的持仓
+    round_trips: int = 0  # 完成的网格往返次数
+    round_trip_profit: float = 0.0  # 网格往返的累计利润（已扣手续费）
+    initial_capital: float = 0.0
+    final_equity: float = 0.0
+    max_drawdown: float = 0.0  # 最大回撤（占峰值权益的比例）
+    max_drawdown_value: float = 0.0  # 最大回撤金额
+    max_margin_used: float = 0.0  # 持仓占用保证金的最大值
+    liquidations: List[LiquidationEvent] = field(default_factory=list)
+    start_time: Any = None
+    end_time: Any = None
+    
+    @property
+    def total_pnl(self) -> float:
+        """总盈亏（扣除手续费）"""
+        return self.realized_pnl + self.unrealized_pnl - self.fees
+    
+    def print_report(self):
+        """打印回测报告"""
+        print("\n" + "="*60)
+        print("回测结果")
+        print("="*60)
+        print(f"数据区间: {self.start_time} - {self.end_time}（{self.rows} 个价格）")
+        print(f"成交次数: {self.fills}（买 {self.buy_fills} / 卖 {self.sell_fills}）")
+        print(f"成交额: {self.volume:.2f} USDT")
+        print(f"手续费: {self.fees:.2f} USDT")
+        print(f"已实现盈亏: {self.realized_pnl:.2f} USDT")
+        print(f"未实现盈亏: {self.unrealized_pnl:.2f} USDT (持仓 {self.position:.6f})")
+        print(f"总盈亏: {self.total_pnl:.2f} USDT")
+        print(f"网格往返: {self.round_trips} 次，利润 {self.round_trip_profit:.2f} USDT")
+        print(f"权益: {self.initial_capital:.2f} -> {self.final_equity:.2f} USDT")
+        print(f"最大回撤: {self.max_drawdown * 100:.2f}% ({self.max_drawdown_value:.2f} USDT)")
+        print(f"最大持仓保证金: {self.max_margin_used:.2f} USDT")
+        print(f"强平次数: {len(self.liquidations)}")
+        for event in self.liquidations:
+            print(f"  {event.timestamp}: 价格 {event.price} 持仓 {event.position:.6f} 权益 {event.equity:.2f}")
+        print("="*60 + "\n")
+
+
+class Backtester:
+    """
+    网格策略回测引擎
+    
+    价格每次变动时，用二分查找找出本次价格变动穿过的网格层级，按价格路径的顺序撮合
+    这些层级上的挂单（以挂单价格成交，收 maker 手续费），再把策略返回的反向订单挂出；
+    挂出时已可成交的订单按当前价格立即成交（收 taker 手续费）。
+    """
+    
+    def __init__(self, strategy: GridTradingStrategy, initial_capital: float = 10000.0,
+                 maker_fee: float = 0.0002, taker_fee: float = 0.0005,
+                 maintenance_margin_rate: float = 0.005, fill_on_touch: bool = False,
+                 stop_on_liquidation: bool = True):
+        """
+        初始化回测引擎
+        
+        Args:
+            strategy: 网格策略（杠杆倍数取自策略）
+            initial_capital: 初始资金（USDT）
+            maker_fee: 挂单成交的手续费率
+            taker_fee: 吃单成交的手续费率
+            maintenance_margin_rate: 维持保证金率，权益低于 持仓价值 * 该比例 时强平
+            fill_on_touch: 价格触及挂单价格即成交；默认需要价格穿过挂单价格才成交
+            stop_on_liquidation: 强平后结束回测；为 False 时按强平价格重新布置网格继续回测
+        """
+        self.strategy = strategy
+        self.initial_capital = initial_capital
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.maintenance_margin_rate = maintenance_margin_rate
+        self.fill_on_touch = fill_on_touch
+        self.stop_on_liquidation = stop_on_liquidation
+        
+        # 各层级价格（浮点数，用于逐价格的二分查找）
+        self.level_prices = [float(price) for price in strategy.grid_prices]
+        self.order_ids = itertools.count(1)
+        
+        # 持仓和盈亏由策略的持仓跟踪器按成交累计
+        self.tracker = strategy.tracker
+        self.tracker.reset()
+        self.result = BacktestResult(initial_capital=initial_capital)
+        self.logger = logging.getLogger(__name__)
+    
+    def run(self, prices: Iterable[Tuple[Any, float]]) -> BacktestResult:
+        """
+        回放价格序列
+        
+        Args:
+            prices: (时间, 价格) 序列，如 read_price_path() 的结果
+        
+        Returns:
+            回测结果
+        """
+        result = self.result
+        tracker = self.tracker
+        level_prices = self.level_prices
+        # 严格穿价时，买单在价格低于挂单价时成交，卖单在价格高于挂单价时成交
+        buy_cut = bisect.bisect_left if self.fill_on_touch else bisect.bisect_right
+        sell_cut = bisect.bisect_right if self.fill_on_touch else bisect.bisect_left
+        leverage = self.strategy.leverage
+        maintenance_rate = self.maintenance_margin_rate
+        capital = self.initial_capital
+        peak = capital
+        
+        last_buy = last_sell = None
+        timestamp = price = None
+        for timestamp, price in prices:
+            if last_buy is None:
+                result.start_time = timestamp
+                self._start_grid(price)
+                last_buy, last_sell = buy_cut(level_prices, price), sell_cut(level_prices, price)
+            result.rows += 1
+            
+            # 价格下跌时撮合穿过的买单（从高到低），上涨时撮合穿过的卖单（从低到高）
+            buy_index = buy_cut(level_prices, price)
+            if buy_index < last_buy:
+                for level in range(last_buy - 1, buy_index - 1, -1):
+                    self._fill_level(level, 'buy', price)
+            sell_index = sell_cut(level_prices, price)
+            if sell_index > last_sell:
+                for level in range(last_sell, sell_index):
+                    self._fill_level(level, 'sell', price)
+            last_buy, last_sell = buy_index, sell_index
+            
+            # 按当前价格计算权益、回撤和强平
+            position = tracker.position
+            unrealized = (price - tracker.entry_price) * position
+            equity = capital + tracker.realized_pnl + unrealized - tracker.fees
+            if equity > peak:
+                peak = equity
+            elif peak > 0 and peak - equity > result.max_drawdown_value:
+                result.max_drawdown_value = peak - equity
+                result.max_drawdown = (peak - equity) / peak
+            if position:
+                notional = abs(position) * price
+                margin = notional / leverage
+                if margin > result.max_margin_used:
+                    result.max_margin_used = margin
+                if equity <= notional * maintenance_rate:
+                    self._liquidate(timestamp, price, equity)
+                    if self.stop_on_liquidation or equity <= 0:
+                        break
+                    self._start_grid(price)
+                    last_buy, last_sell = buy_cut(level_prices, price), sell_cut(level_prices, price)
+        
+        result.end_time = timestamp
+        result.fills = tracker.fills
+        result.buy_fills = tracker.buy_fills
+        result.sell_fills = tracker.sell_fills
+        result.volume = tracker.volume
+        result.fees = tracker.fees
+        result.realized_pnl = tracker.realized_pnl
+        result.position = tracker.position
+        result.unrealized_pnl = tracker.unrealized_pnl(price)
+        result.round_trips = tracker.round_trips
+        result.round_trip_profit = tracker.round_trip_profit
+        result.final_equity = capital + result.realized_pnl + result.unrealized_pnl - result.fees
+        return result
+    
+    def _start_grid(self, price: float):
+        """按当前价格布置网格，所有订单立即挂出"""
+        orders = self.strategy.generate_grid_orders(price)
+        self._place_orders(orders, price)
+    
+    def _place_orders(self, orders: List[GridOrder], price: float):
+        """挂出订单；已可成交的订单按当前价格立即成交，并继续挂出其反向订单"""
+        queue = deque(orders)
+        while queue:
+            order = queue.popleft()
+            order_id = f"bt-{next(self.order_ids)}"
+            self.strategy.on_order_placed(order, order_id)
+            limit = float(order.price)
+            if order.side == 'buy':
+                marketable = price <= limit if self.fill_on_touch else price < limit
+            else:
+                marketable = price >= limit if self.fill_on_touch else price > limit
+            if marketable:
+                fee = price * float(order.quantity) * self.taker_fee
+                queue.extend(self.strategy.on_fill(order_id, price=price, fee=fee))
+    
+    def _fill_level(self, level: int, side: str, price: float):
+        """撮合层级上的挂单（方向一致且已挂出时），以挂单价格成交"""
+        book = self.strategy.book
+        order = book.order_at(level)
+        if order is None or order.side != side or book.level_of(order.order_id) != level:
+            return
+        fill_price = self.level_prices[level]
+        fee = fill_price * float(order.quantity) * self.maker_fee
+        counters = self.strategy.on_fill(order.order_id, price=fill_price, fee=fee)
+        if counters:
+            self._place_orders(counters, price)
+    
+    def _liquidate(self, timestamp: Any, price: float, equity: float):
+        """强平：按当前价格平掉全部持仓并撤销所有挂单"""
+        position = self.tracker.position
+        self.result.liquidations.append(LiquidationEvent(timestamp, price, position, equity))
+        self.logger.warning("⚠️  强平: %s 价格 %s 持仓 %.6f 权益 %.2f", timestamp, price, position, equity)
+        self.tracker.close_position(price)
+        self.strategy.reset_orders()
+
+
+def run_backtest(path: str, strategy: GridTradingStrategy, start: Any = None, end: Any = None,
+                 **kwargs) -> BacktestResult:
+    """
+    用历史数据文件回测策略
+    
+    Args:
+        path: 数据文件路径或列式存储目录（格式见 read_price_path）
+        strategy: 网格策略
+        start: 开始时间（含），仅列式存储支持
+        end: 结束时间（不含），仅列式存储支持
+        **kwargs: 传给 Backtester 的参数
+    
+    Returns:
+        回测结果
+    """
+    return Backtester(strategy, **kwargs).run(read_price_path(path, start, end))
+
+
+def main():
+    """主函数：用 config.json 中的交易配置回测"""
+    from config import Config
+    
+    parser = argparse.ArgumentParser(description="网格策略回测")
+    parser.add_argument('data', help="历史成交或 K 线 CSV 文件（支持 .gz），或 tick_store 列式存储目录")
+    parser.add_argument('--start', default=None, help="开始时间（仅列式存储，毫秒时间戳或 ISO 时间）")
+    parser.add_argument('--end', default=None, help="结束时间（仅列式存储，不含）")
+    parser.add_argument('--capital', type=float, default=10000.0, help="初始资金（USDT）")
+    parser.add_argument('--maker-fee', type=float, default=0.0002, help="挂单手续费率")
+    parser.add_argument('--taker-fee', type=float, default=0.0005, help="吃单手续费率")
+    parser.add_argument('--maintenance-margin', type=float, default=0.005, help="维持保证金率")
+    parser.add_argument('--touch', action='store_true', help="价格触及挂单价格即成交")
+    parser.add_argument('--continue-after-liquidation', action='store_true', help="强平后重新布置网格继续回测")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    trading_config = Config.get_trading_config()
+    if not trading_config:
+        print("❌ 未找到交易配置，请先运行交互式配置脚本:")
+        print("   python interactive_setup.py")
+        return
+    
+    strategy = GridTradingStrategy(**trading_config)
+    strategy.print_strategy_info()
+    result = run_backtest(
+        args.data, strategy,
+        start=args.start,
+        end=args.end,
+        initial_capital=args.capital,
+        maker_fee=args.maker_fee,
+        taker_fee=args.taker_fee,
+        maintenance_margin_rate=args.maintenance_margin,
+        fill_on_touch=args.touch,
+        stop_on_liquidation=not args.continue_after_liquidation
+    )
+    result.print_report()
+
+
+if __name__ == "__main__":
+    main()
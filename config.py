@@ -1,10 +1,14 @@
 """
 配置文件管理模块
+解析结果按文件的修改时间缓存，文件变化（包括被其他程序替换）后下次读取时重新解析；
+保存时先写临时文件再原子替换，读取方不会读到写了一半的文件
 """
 
+import copy
 import json
 import os
-from typing import Dict, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
 
 
 class Config:
@@ -12,19 +16,52 @@ class Config:
     
     CONFIG_FILE = "config.json"
     
+    _cache: Optional[Dict] = None
+    _cache_version: Optional[Tuple] = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def file_version() -> Optional[Tuple]:
+        """
+        配置文件的版本标识（路径、修改时间、大小、inode），文件变化后随之改变
+        
+        Returns:
+            版本标识，文件不存在时为 None
+        """
+        try:
+            stat = os.stat(Config.CONFIG_FILE)
+        except FileNotFoundError:
+            return None
+        return (Config.CONFIG_FILE, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    
     @staticmethod
     def load_config() -> Dict:
-        """加载配置文件"""
-        if os.path.exists(Config.CONFIG_FILE):
-            with open(Config.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        """加载配置文件（文件未变化时使用缓存，返回副本，调用方可以随意修改）"""
+        with Config._lock:
+            version = Config.file_version()
+            if version is None:
+                return {}
+            if version != Config._cache_version:
+                with open(Config.CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    Config._cache = json.load(f)
+                Config._cache_version = version
+            return copy.deepcopy(Config._cache)
     
     @staticmethod
     def save_config(config: Dict):
-        """保存配置文件"""
-        with open(Config.CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
+        """保存配置文件（写入临时文件后原子替换，保留原文件的权限）"""
+        path = Config.CONFIG_FILE
+        temp_path = f"{path}.tmp"
+        with Config._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+            os.replace(temp_path, path)
+            Config._cache = copy.deepcopy(config)
+            Config._cache_version = Config.file_version()
     
     @staticmethod
     def get_api_credentials() -> Dict[str, str]:
@@ -47,14 +84,38 @@ class Config:
     
     @staticmethod
     def get_trading_config() -> Dict:
-        """获取交易配置"""
-        config = Config.load_config()
-        return config.get('trading', {})
+        """获取交易配置（配置了多个网格时返回第一个）"""
+        configs = Config.get_trading_configs()
+        return configs[0] if configs else {}
+    
+    @staticmethod
+    def get_trading_configs() -> List[Dict]:
+        """获取所有网格的交易配置（trading 可以是单个配置或配置列表）"""
+        trading = Config.load_config().get('trading', {})
+        if isinstance(trading, list):
+            return [item for item in trading if item]
+        return [trading] if trading else []
+    
+    @staticmethod
+    def get_logging_config() -> Dict:
+        """获取日志配置（logging_setup.setup_logging 的参数，未配置时为空）"""
+        return Config.load_config().get('logging') or {}
     
     @staticmethod
     def save_trading_config(trading_config: Dict):
-        """保存交易配置"""
+        """
+        保存交易配置
+        
+        配置了多个网格时替换交易对相同的那个（没有相同交易对时替换第一个），其余网格保持不变
+        """
         config = Config.load_config()
-        config['trading'] = trading_config
+        trading = config.get('trading')
+        if isinstance(trading, list) and trading:
+            index = next(
+                (i for i, item in enumerate(trading) if item.get('symbol') == trading_config.get('symbol')), 0
+            )
+            trading[index] = trading_config
+        else:
+            config['trading'] = trading_config
         Config.save_config(config)
 
@@ -0,0 +1,86 @@
+"""
+网格挂单对账模块
+比较期望的网格订单和交易所当前挂单，计算最少的撤单和下单操作
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from grid_trading_strategy import GridOrder, LevelBook
+
+
+@dataclass
+class ReconcilePlan:
+    """对账结果"""
+    keep: List[Tuple[GridOrder, Dict]] = field(default_factory=list)  # (期望订单, 与之匹配的挂单)
+    cancel: List[str] = field(default_factory=list)  # 需要撤销的挂单 ID
+    place: List[GridOrder] = field(default_factory=list)  # 需要新下的订单
+    
+    @property
+    def request_free(self) -> bool:
+        """挂单已与期望一致，无需任何撤单或下单"""
+        return not self.cancel and not self.place
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    """把挂单中的价格/数量转换为 Decimal，无法解析时返回 None"""
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def reconcile_orders(book: LevelBook, open_orders: List[Dict],
+                     price_tolerance: float = 1e-6, quantity_tolerance: float = 0.01) -> ReconcilePlan:
+    """
+    计算把交易所挂单调整为期望网格所需的最少操作
+    
+    期望订单为层级簿中尚未挂出的订单（generate_grid_orders 之后即整个网格）。
+    挂单与期望订单方向相同、价格和数量的相对误差都在容差内时视为匹配并保留；
+    每个期望订单最多匹配一笔挂单，未匹配的挂单撤销，未匹配的期望订单新下。
+    
+    Args:
+        book: 策略的层级簿
+        open_orders: get_open_orders 返回的挂单列表
+        price_tolerance: 价格的相对容差
+        quantity_tolerance: 数量的相对容差
+    
+    Returns:
+        对账结果
+    """
+    desired = book.pending_orders()
+    desired_ids = {id(order) for order in desired}
+    matched = set()
+    
+    plan = ReconcilePlan()
+    price_tol = Decimal(str(price_tolerance))
+    quantity_tol = Decimal(str(quantity_tolerance))
+    
+    for open_order in open_orders:
+        order_id = open_order.get('order_id')
+        if not order_id:
+            continue
+        price = _to_decimal(open_order.get('price'))
+        quantity = _to_decimal(open_order.get('quantity'))
+        match = None
+        if price is not None and quantity is not None and price > 0:
+            # 用层级簿二分查找价格容差内的层级
+            for level in book.levels_between(price - price * price_tol, price + price * price_tol):
+                order = book.order_at(level)
+                if order is None or id(order) not in desired_ids or id(order) in matched:
+                    continue
+                if order.side != open_order.get('side'):
+                    continue
+                if abs(order.quantity - quantity) <= order.quantity * quantity_tol:
+                    match = order
+                    break
+        
+        if match is None:
+            plan.cancel.append(order_id)
+        else:
+            matched.add(id(match))
+            plan.keep.append((match, open_order))
+    
+    plan.place = [order for order in desired if id(order) not in matched]
+    return plan
@@ -0,0 +1,116 @@
+"""
+多网格公平调度模块
+多个网格共用一个 API 客户端时，按网格轮流分配请求时隙，
+避免某个网格一次性下大量订单时占满限流配额、拖慢其他网格的监控和补单
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Hashable
+
+
+class FairScheduler:
+    """
+    按网格轮询的请求时隙调度器（仅在单个事件循环内使用）
+    
+    同时进行中的操作数不超过 max_active；时隙不足时各网格排队，
+    每次发放时隙从排在最前的网格取一个等待者，然后把该网格移到队尾，
+    因此有请求等待的网格依次轮流获得时隙，不论各自排了多少请求
+    """
+    
+    def __init__(self, max_active: int = 4):
+        """
+        Args:
+            max_active: 所有网格合计同时进行中的操作数上限
+        """
+        self.max_active = max(1, int(max_active))
+        self.active = 0
+        self._waiters: Dict[Hashable, Deque[asyncio.Future]] = {}
+        self._ready: Deque[Hashable] = deque()  # 有等待者的网格，按轮询顺序
+        self._stats: Dict[Hashable, Dict] = {}
+        self.logger = logging.getLogger(__name__)
+    
+    def _key_stats(self, key: Hashable) -> Dict:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {'granted': 0, 'waiting': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+        return stats
+    
+    async def acquire(self, key: Hashable):
+        """
+        为网格 key 获取一个时隙
+        
+        Args:
+            key: 网格标识（如交易对）
+        """
+        stats = self._key_stats(key)
+        if self.active < self.max_active and not self._ready:
+            self.active += 1
+            stats['granted'] += 1
+            return
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._waiters.setdefault(key, deque())
+        if not queue:
+            self._ready.append(key)
+        queue.append(future)
+        stats['waiting'] += 1
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 时隙已发放但等待者被取消，归还时隙
+                self.release(key)
+            raise
+        finally:
+            stats['waiting'] -= 1
+        waited = time.monotonic() - started
+        stats['wait_total'] += waited
+        stats['wait_max'] = max(stats['wait_max'], waited)
+    
+    def release(self, key: Hashable):
+        """归还网格 key 的时隙，并按轮询顺序发放给下一个等待者"""
+        self.active -= 1
+        self._grant()
+    
+    def _grant(self):
+        """在时隙允许的范围内，轮流给各网格排在最前的等待者发放时隙"""
+        while self.active < self.max_active and self._ready:
+            key = self._ready.popleft()
+            queue = self._waiters[key]
+            future = queue.popleft()
+            if queue:
+                self._ready.append(key)
+            else:
+                del self._waiters[key]
+            if future.cancelled():
+                continue
+            self.active += 1
+            self._stats[key]['granted'] += 1
+            future.set_result(None)
+    
+    @asynccontextmanager
+    async def slot(self, key: Hashable):
+        """以 async with 方式占用一个时隙"""
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+    
+    def stats(self) -> Dict[Hashable, Dict]:
+        """各网格已获得的时隙数、排队数和等待时间"""
+        return {
+            key: {
+                'granted': stats['granted'],
+                'waiting': stats['waiting'],
+                'wait_avg': round(stats['wait_total'] / stats['granted'], 3) if stats['granted'] else 0.0,
+                'wait_max': round(stats['wait_max'], 3)
+            }
+            for key, stats in self._stats.items()
+        }
@@ -0,0 +1,375 @@
+"""
+多进程网格监督模块
+把 config.json 中的网格按交易对分片到多个工作进程，每个进程用 MultiGridRunner 运行自己的分片，
+某个交易所市场或网格出问题（卡住、崩溃）只影响所在的进程。监督进程负责：
+
+- 汇总各进程定期上报的状态（持仓、盈亏、挂单数、调度统计）并记录日志
+- 进程退出或长时间未上报状态（事件循环卡住）时结束并重启该进程，按退避间隔重启；
+  重启后的进程沿用交易所上的挂单（对账而不是撤单重下），并从最后一次上报的快照恢复持仓统计
+- 所有进程的限流令牌桶保存在共享内存中，合计请求速率不超过 network.rate_limits
+
+使用方法:
+    python grid_supervisor.py --workers 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from logging_setup import setup_logging
+from multi_grid_runner import MultiGridRunner, duplicate_symbols
+from rate_limiter import RateLimiter, create_shared_state
+
+
+# 监督进程和工作进程的默认日志格式（带进程名，可由 config.json 的 logging.format 覆盖）
+LOG_FORMAT = '%(asctime)s - %(processName)s - %(levelname)s - %(message)s'
+
+def shard_configs(trading_configs: List[Dict], workers: int) -> List[List[Dict]]:
+    """
+    把网格配置按顺序轮流分给各工作进程
+    
+    Args:
+        trading_configs: 网格配置列表
+        workers: 工作进程数
+    
+    Returns:
+        每个进程的网格配置（不会有空分片）
+    """
+    workers = max(1, min(workers, len(trading_configs)))
+    return [trading_configs[index::workers] for index in range(workers)]
+
+
+def _raise_interrupt(signum, frame):
+    """SIGTERM 按 Ctrl+C 处理：撤单后退出，撤单过程中不再被打断"""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def _worker_main(worker_id: int, trading_configs: List[Dict], shared_rate_state: Dict,
+                 status_queue, status_interval: float, snapshots: Dict):
+    """工作进程入口：运行分到的网格，并定期把状态放入 status_queue"""
+    # Ctrl+C 由监督进程统一处理，再用 SIGTERM 通知各工作进程退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    # fork 出的进程没有父进程的日志后台线程，重新配置；日志文件按进程分开
+    setup_logging(**dict({'format': LOG_FORMAT}, **Config.get_logging_config()),
+                  file_suffix=f"worker{worker_id}")
+    # 监督进程停止后不再读取状态，退出时不等待未送出的状态，以免撤单后卡在退出阶段
+    status_queue.cancel_join_thread()
+    runner = MultiGridRunner(
+        trading_configs,
+        shared_rate_state=shared_rate_state,
+        snapshots=snapshots,
+        on_status=lambda status: status_queue.put((worker_id, status)),
+        status_interval=status_interval
+    )
+    runner.run()
+
+
+@dataclass
+class WorkerState:
+    """监督进程记录的一个工作进程"""
+    index: int
+    configs: List[Dict]
+    process: Optional[multiprocessing.Process] = None
+    started_at: float = 0.0
+    last_seen: Optional[float] = None  # 本次启动后最近一次上报状态的时刻（尚未上报时为 None）
+    restart_at: float = 0.0  # 等待重启的进程的重启时刻
+    restarts: int = 0
+    failures: int = 0  # 连续异常退出次数，用于计算重启退避
+    status: Dict = field(default_factory=dict)  # 最近一次上报的状态（重启后保留）
+    # 本次启动的状态队列：每个进程单独一个，进程被强制结束时可能持有队列的写锁，重启时随进程一起替换
+    status_queue: Optional[Any] = None
+    
+    @property
+    def names(self) -> List[str]:
+        return [config['symbol'] for config in self.configs]
+    
+    def snapshots(self) -> Dict:
+        """最近一次上报的各网格持仓快照"""
+        return {name: grid['snapshot'] for name, grid in self.status.get('grids', {}).items()}
+
+
+class GridSupervisor:
+    """多进程网格监督器"""
+    
+    def __init__(self, trading_configs: Optional[List[Dict]] = None, workers: Optional[int] = None,
+                 status_interval: float = 5.0, heartbeat_timeout: float = 30.0,
+                 startup_timeout: float = 300.0, report_interval: float = 60.0,
+                 stop_timeout: Optional[float] = None, max_backoff: float = 60.0):
+        """
+        Args:
+            trading_configs: 网格配置，默认为 config.json 中的全部网格
+            workers: 工作进程数，默认为 network.worker_processes 或 CPU 核数（不超过网格数）
+            status_interval: 工作进程上报状态的间隔（秒）
+            heartbeat_timeout: 超过该时间未上报状态即视为卡住，强制结束并重启
+            startup_timeout: 进程启动后首次上报状态的时限（初始化需要逐个查询交易对精度）
+            report_interval: 记录汇总状态的间隔（秒）
+            stop_timeout: 停止时等待各进程撤单退出的时限，超时后强制结束；
+                默认为 network.shutdown_deadline 加 20 秒（等待网格退出和事件循环的余量）
+            max_backoff: 重启退避间隔的上限（秒）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.trading_configs = trading_configs
+        self.worker_count = workers
+        self.status_interval = status_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout
+        self.report_interval = report_interval
+        self.stop_timeout = stop_timeout
+        self.max_backoff = max_backoff
+        self.workers: List[WorkerState] = []
+        self.shared_rate_state = None
+        self.rate_view: Optional[RateLimiter] = None
+        self.running = False
+    
+    def start(self):
+        """分片网格配置，创建共享限流状态并启动所有工作进程"""
+        trading_configs = self.trading_configs
+        if trading_configs is None:
+            trading_configs = Config.get_trading_configs()
+        if not trading_configs:
+            print("❌ 未找到交易配置，请先运行交互式配置脚本:")
+            print("   python interactive_setup.py")
+            sys.exit(1)
+        duplicates = duplicate_symbols(trading_configs)
+        if duplicates:
+            print(f"❌ 交易对不能重复: {', '.join(duplicates)}")
+            sys.exit(1)
+        
+        network_config = Config.load_config().get('network', {})
+        workers = self.worker_count or network_config.get('worker_processes') or os.cpu_count() or 1
+        if self.stop_timeout is None:
+            self.stop_timeout = network_config.get('shutdown_deadline', 20) + 20
+        rate_limits = network_config.get('rate_limits')
+        self.shared_rate_state = create_shared_state(rate_limits)
+        # 只用于读取共享令牌桶的状态
+        self.rate_view = RateLimiter(rate_limits, self.shared_rate_state)
+        
+        self.workers = [
+            WorkerState(index=index, configs=configs)
+            for index, configs in enumerate(shard_configs(trading_configs, workers))
+        ]
+        self.running = True
+        for worker in self.workers:
+            self._start_worker(worker)
+    
+    def _start_worker(self, worker: WorkerState):
+        """启动（或重启）一个工作进程"""
+        self._close_queue(worker)
+        worker.status_queue = multiprocessing.Queue()
+        worker.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(worker.index, worker.configs, self.shared_rate_state, worker.status_queue,
+                  self.status_interval, worker.snapshots()),
+            name=f"grid-worker-{worker.index}"
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.last_seen = None
+        self.logger.info(
+            "工作进程 %s 已启动 (pid %s): %s", worker.index, worker.process.pid, ', '.join(worker.names)
+        )
+    
+    def _schedule_restart(self, worker: WorkerState, reason: str):
+        """记录异常并安排退避重启（持续稳定运行过的进程从最短间隔重新计算）"""
+        now = time.monotonic()
+        if now - worker.started_at > 10 * self.heartbeat_timeout:
+            worker.failures = 0
+        worker.failures += 1
+        worker.restarts += 1
+        delay = min(self.max_backoff, 2 ** (worker.failures - 1))
+        worker.process = None
+        worker.restart_at = now + delay
+        self.logger.error("❌ 工作进程 %s %s，%.0f 秒后重启", worker.index, reason, delay)
+    
+    def check_workers(self):
+        """重启已退出或卡住的工作进程"""
+        now = time.monotonic()
+        for worker in self.workers:
+            process = worker.process
+            if process is None:
+                if now >= worker.restart_at:
+                    self._start_worker(worker)
+                continue
+            if not process.is_alive():
+                process.join()
+                self._schedule_restart(worker, f"已退出（退出码 {process.exitcode}）")
+                continue
+            if worker.last_seen is None:
+                silent, limit = now - worker.started_at, self.startup_timeout
+            else:
+                silent, limit = now - worker.last_seen, self.heartbeat_timeout
+            if silent > limit:
+                # 事件循环卡住时无法正常撤单退出，直接结束进程；挂单保留在交易所，重启后对账接管
+                process.kill()
+                process.join(5)
+                self._schedule_restart(worker, f"{silent:.0f} 秒未上报状态，已强制结束")
+    
+    @staticmethod
+    def _close_queue(worker: WorkerState):
+        """关闭上一次启动的状态队列（不等待其中未读取的状态）"""
+        if worker.status_queue is not None:
+            worker.status_queue.close()
+            worker.status_queue.cancel_join_thread()
+            worker.status_queue = None
+    
+    def drain_status(self, timeout: float = 1.0):
+        """接收工作进程上报的状态，最多等待 timeout 秒（收到任何状态后立即返回）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            received = False
+            for worker in self.workers:
+                while worker.status_queue is not None:
+                    try:
+                        _, worker.status = worker.status_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    worker.last_seen = time.monotonic()
+                    received = True
+            remaining = deadline - time.monotonic()
+            if received or remaining <= 0:
+                return
+            time.sleep(min(0.05, remaining))
+    
+    def health(self) -> Dict:
+        """汇总所有工作进程的健康状态和盈亏指标"""
+        now = time.monotonic()
+        totals = {
+            'grids': 0, 'started': 0, 'open_orders': 0, 'realized_pnl': 0.0, 'unrealized_pnl': 0.0,
+            'fees': 0.0, 'total_pnl': 0.0, 'fills': 0, 'round_trips': 0
+        }
+        workers = []
+        for worker in self.workers:
+            process = worker.process
+            grids = worker.status.get('grids', {})
+            for grid in grids.values():
+                snapshot = grid['snapshot']
+                totals['grids'] += 1
+                totals['started'] += grid['started']
+                totals['open_orders'] += grid['open_orders']
+                totals['realized_pnl'] += snapshot.realized_pnl
+                totals['unrealized_pnl'] += snapshot.unrealized_pnl
+                totals['fees'] += snapshot.fees
+                totals['total_pnl'] += snapshot.total_pnl
+                totals['fills'] += snapshot.fills
+                totals['round_trips'] += snapshot.round_trips
+            workers.append({
+                'index': worker.index,
+                'pid': process.pid if process is not None else None,
+                'alive': process is not None and process.is_alive(),
+                'reporting': worker.last_seen is not None,
+                'last_seen': round(now - worker.last_seen, 1) if worker.last_seen is not None else None,
+                'restarts': worker.restarts,
+                'grids': len(worker.configs)
+            })
+        return {
+            'workers': workers,
+            'totals': totals,
+            'rate_limits': self.rate_view.stats() if self.rate_view is not None else {}
+        }
+    
+    def log_health(self):
+        """记录汇总状态"""
+        health = self.health()
+        workers = health['workers']
+        totals = health['totals']
+        reporting = sum(1 for worker in workers if worker['alive'] and worker['reporting'])
+        self.logger.info(
+            "工作进程 %s/%s 正常，累计重启 %s 次; "
+            "网格 %s/%s 运行中，挂单 %s",
+            reporting, len(workers), sum(w['restarts'] for w in workers),
+            totals['started'], sum(w['grids'] for w in workers), totals['open_orders']
+        )
+        self.logger.info(
+            "总盈亏 %.2f (已实现 %.2f "
+            "未实现 %.2f 手续费 %.2f) "
+            "成交 %s 笔 往返 %s 次",
+            totals['total_pnl'], totals['realized_pnl'], totals['unrealized_pnl'], totals['fees'],
+            totals['fills'], totals['round_trips']
+        )
+        self.logger.info("全局限流: %s", ", ".join(
+            f"{name} {s['rate']}/s 令牌{s['tokens']} 被限流{s['throttled_count']}次"
+            for name, s in health['rate_limits'].items()
+        ))
+        for worker in workers:
+            if not worker['alive'] or not worker['reporting']:
+                self.logger.warning(
+                    "⚠️  工作进程 %s "
+                    "%s（重启 %s 次）",
+                    worker['index'], '等待重启' if not worker['alive'] else '尚未上报状态', worker['restarts']
+                )
+    
+    def run(self):
+        """启动所有工作进程并持续监督（阻塞直到 Ctrl+C）"""
+        self.start()
+        
+        print("\n" + "="*60)
+        print(f"多进程网格监督启动（{len(self.workers)} 个进程，"
+              f"{sum(len(worker.configs) for worker in self.workers)} 个网格）")
+        print("="*60)
+        print("按 Ctrl+C 停止所有网格\n")
+        
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while self.running:
+                self.drain_status()
+                self.check_workers()
+                if time.monotonic() >= next_report:
+                    self.log_health()
+                    next_report = time.monotonic() + self.report_interval
+        except KeyboardInterrupt:
+            print("\n\n⚠️  收到停止信号...")
+        finally:
+            self.stop()
+    
+    def stop(self):
+        """通知所有工作进程撤单退出，超时未退出的强制结束"""
+        self.running = False
+        processes = [worker.process for worker in self.workers if worker.process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.logger.warning(
+                    "⚠️  %s 未能在 %.0f 秒内退出，已强制结束（挂单可能未撤销）", process.name, self.stop_timeout
+                )
+                process.kill()
+                process.join()
+        for worker in self.workers:
+            worker.process = None
+            self._close_queue(worker)
+        print("✅ 所有工作进程已停止")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="多进程网格监督")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认为 CPU 核数，不超过网格数）")
+    parser.add_argument('--status-interval', type=float, default=5.0, help="工作进程上报状态的间隔（秒）")
+    parser.add_argument('--heartbeat-timeout', type=float, default=30.0, help="未上报状态多久后重启进程（秒）")
+    parser.add_argument('--report-interval', type=float, default=60.0, help="记录汇总状态的间隔（秒）")
+    args = parser.parse_args()
+    
+    setup_logging(**dict({'format': LOG_FORMAT}, **Config.get_logging_config()))
+    GridSupervisor(
+        workers=args.workers,
+        status_interval=args.status_interval,
+        heartbeat_timeout=args.heartbeat_timeout,
+        report_interval=args.report_interval
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,27 +3,323 @@
 实现网格交易的逻辑：在指定价格区间内设置多个买入和卖出订单
 """
 
+import bisect
+import hashlib
 import time
 import logging
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from decimal import Decimal, ROUND_DOWN
+from dataclasses import asdict
+from itertools import accumulate
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from decimal import Decimal, Inexact, localcontext
+
+from position_tracker import PositionSnapshot, PositionTracker
+
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖，未安装时逐层计算
+    np = None
+
+# 层级数达到该值且安装了 NumPy 时默认使用向量化计算
+NUMPY_MIN_LEVELS = 1000
+# 向量化计算时中间结果需保持在 int64 范围内，超出时退回 Python 整数
+_INT64_SAFE = 2 ** 62
+
+# grid_arrays 返回的方向取值
+SIDE_NONE = 0
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+# 网格模式：等差（相邻层级价差相同）和等比（相邻层级价格比例相同）
+GRID_ARITHMETIC = 'arithmetic'
+GRID_GEOMETRIC = 'geometric'
+GRID_MODES = {GRID_ARITHMETIC: '等差', GRID_GEOMETRIC: '等比'}
+
+# 未能获取交易对精度时使用的默认价格精度和数量精度
+DEFAULT_TICK_SIZE = '0.01'
+DEFAULT_LOT_SIZE = '0.000001'
 
 
-@dataclass
 class GridOrder:
-    """网格订单数据结构"""
-    price: Decimal
-    quantity: Decimal
-    side: str  # 'buy' or 'sell'
-    grid_level: int  # 网格层级
+    """
+    网格订单数据结构
+    
+    价格和数量以整数个 tick / lot 保存，price 和 quantity 属性按需换算为 Decimal
+    """
+    __slots__ = ('price_ticks', 'quantity_lots', 'side', 'grid_level', 'tick_size', 'lot_size',
+                 'client_order_id', 'order_id')
+    
+    def __init__(self, price_ticks: int, quantity_lots: int, side: str, grid_level: int,
+                 tick_size: Decimal, lot_size: Decimal, client_order_id: str = '', order_id: str = ''):
+        self.price_ticks = price_ticks  # 价格（tick 数）
+        self.quantity_lots = quantity_lots  # 数量（lot 数）
+        self.side = side  # 'buy' or 'sell'
+        self.grid_level = grid_level  # 网格层级
+        self.tick_size = tick_size  # 价格精度
+        self.lot_size = lot_size  # 数量精度
+        self.client_order_id = client_order_id  # 客户端订单 ID（用于幂等下单）
+        self.order_id = order_id  # 交易所订单 ID（下单成功后填写）
+    
+    @property
+    def price(self) -> Decimal:
+        """价格"""
+        return Decimal(self.price_ticks) * self.tick_size
+    
+    @property
+    def quantity(self) -> Decimal:
+        """数量"""
+        return Decimal(self.quantity_lots) * self.lot_size
+    
+    def __repr__(self) -> str:
+        return (f"GridOrder(price={self.price}, quantity={self.quantity}, side={self.side!r}, "
+                f"grid_level={self.grid_level}, client_order_id={self.client_order_id!r}, "
+                f"order_id={self.order_id!r})")
+
+
+def _to_scaled_int(value: Decimal, exponent: int) -> int:
+    """把 Decimal 表示为 10 ** exponent 的整数倍（value 的小数位数不能超过 -exponent）"""
+    return int(value.scaleb(-exponent))
+
+
+@lru_cache(maxsize=None)
+def _symbol_tag(symbol: str) -> str:
+    """客户端订单 ID 中的交易对部分（只保留字母和数字）"""
+    return ''.join(c for c in symbol if c.isalnum())
+
+
+def make_client_order_id(symbol: str, grid_level: int, generation: int, side: str,
+                         round_trip: int = 0) -> str:
+    """
+    由交易对、网格层级和生成代数确定性地生成客户端订单 ID
+    
+    同一订单的重试使用相同的 ID，交易所据此去重，不会重复下单
+    
+    Args:
+        symbol: 交易对符号
+        grid_level: 网格层级
+        generation: 网格生成代数
+        side: 买卖方向
+        round_trip: 该层级在本代中的补单序号（首次下单为 0）
+        
+    Returns:
+        客户端订单 ID，如 BTCUSDT-1700000000-12-b，补单时如 BTCUSDT-1700000000-12-b3
+    """
+    symbol_part = _symbol_tag(symbol)
+    suffix = str(round_trip) if round_trip else ''
+    return f"{symbol_part}-{generation}-{grid_level}-{side[0]}{suffix}"
+
+
+class LevelBook:
+    """
+    网格层级簿
+    
+    层级价格（tick 数）按升序保存，价格 -> 层级用二分查找（O(log n)）；同时维护
+    层级 -> 当前订单、交易所订单 ID -> 层级、客户端订单 ID -> 层级三个索引
+    """
+    
+    # 层级状态
+    EMPTY = 'empty'  # 空闲
+    PENDING = 'pending'  # 已生成订单，尚未得到交易所订单 ID
+    LIVE = 'live'  # 已挂单
+    
+    def __init__(self, level_ticks: List[int], tick_size: Decimal):
+        """
+        初始化层级簿
+        
+        Args:
+            level_ticks: 各层级价格（tick 数），单调不减
+            tick_size: 价格精度
+        """
+        self.level_ticks = level_ticks
+        self.tick_size = tick_size
+        self.orders: List[Optional[GridOrder]] = [None] * len(level_ticks)
+        self.order_ids: Dict[str, int] = {}  # 交易所订单 ID -> 层级
+        self.client_ids: Dict[str, int] = {}  # 客户端订单 ID -> 层级
+    
+    def __len__(self) -> int:
+        return len(self.level_ticks)
+    
+    def price_thresholds(self, price) -> Tuple[int, int]:
+        """
+        把价格换算为 tick 阈值
+        
+        Returns:
+            (ceil, floor)：价格除以 tick_size 后向上和向下取整的结果
+        """
+        price = Decimal(str(price))
+        exponent = min(self.tick_size.as_tuple().exponent, price.as_tuple().exponent, 0)
+        floor, remainder = divmod(_to_scaled_int(price, exponent), _to_scaled_int(self.tick_size, exponent))
+        return (floor if remainder == 0 else floor + 1), floor
+    
+    def level_at_price(self, price) -> int:
+        """
+        查找价格所在的层级
+        
+        Returns:
+            价格不低于其层级价格的最高层级，价格低于最低层级时返回 -1
+        """
+        _, floor = self.price_thresholds(price)
+        return bisect.bisect_right(self.level_ticks, floor) - 1
+    
+    def levels_between(self, low_price, high_price) -> range:
+        """价格在 [low_price, high_price] 内的层级"""
+        low, _ = self.price_thresholds(low_price)
+        _, high = self.price_thresholds(high_price)
+        return range(bisect.bisect_left(self.level_ticks, low), bisect.bisect_right(self.level_ticks, high))
+    
+    def side_ranges(self, price) -> Tuple[int, int]:
+        """
+        按当前价格划分买卖层级
+        
+        Returns:
+            (buy_end, sell_start)：层级 [0, buy_end) 低于当前价格，[sell_start, 层级数) 高于当前价格
+        """
+        ceil, floor = self.price_thresholds(price)
+        return bisect.bisect_left(self.level_ticks, ceil), bisect.bisect_right(self.level_ticks, floor)
+    
+    def order_at(self, level: int) -> Optional[GridOrder]:
+        """层级上的当前订单"""
+        return self.orders[level]
+    
+    def state(self, level: int) -> str:
+        """层级状态：EMPTY / PENDING / LIVE"""
+        order = self.orders[level]
+        if order is None:
+            return self.EMPTY
+        return self.LIVE if self.order_ids.get(order.order_id) == level else self.PENDING
+    
+    def level_of(self, order_id: str) -> Optional[int]:
+        """交易所订单 ID 对应的层级"""
+        return self.order_ids.get(order_id)
+    
+    def find(self, order_id: str, client_order_id: Optional[str] = None) -> Optional[int]:
+        """按交易所订单 ID 查找层级，找不到时按客户端订单 ID 查找（如成交推送先于下单响应到达）"""
+        level = self.order_ids.get(order_id)
+        if level is None and client_order_id:
+            level = self.client_ids.get(client_order_id)
+        return level
+    
+    def live_order_ids(self) -> List[str]:
+        """已挂单的交易所订单 ID"""
+        return list(self.order_ids)
+    
+    def nearest_live_levels(self, price) -> Tuple[Optional[int], Optional[int]]:
+        """
+        价格下方和上方最近的已挂单层级（含价格恰好所在的层级）
+        
+        Returns:
+            (below, above)，某一侧没有挂单时为 None
+        """
+        buy_end, sell_start = self.side_ranges(price)
+        below = next((level for level in range(sell_start - 1, -1, -1) if self.state(level) == self.LIVE), None)
+        above = next((level for level in range(buy_end, len(self.orders)) if self.state(level) == self.LIVE), None)
+        return below, above
+    
+    def pending_orders(self) -> List[GridOrder]:
+        """尚未得到交易所订单 ID 的订单（按层级顺序）"""
+        return [order for level, order in enumerate(self.orders)
+                if order is not None and self.order_ids.get(order.order_id) != level]
+    
+    def assign(self, level: int, order: GridOrder):
+        """把订单放到层级上（状态为 PENDING），替换该层级原有的订单"""
+        self.release(level)
+        self.orders[level] = order
+        if order.client_order_id:
+            self.client_ids[order.client_order_id] = level
+    
+    def confirm(self, order: GridOrder, order_id: str, client_order_id: Optional[str] = None) -> bool:
+        """
+        记录订单的交易所订单 ID（状态变为 LIVE）
+        
+        Args:
+            order: 网格订单
+            order_id: 交易所订单 ID
+            client_order_id: 交易所记录的客户端订单 ID（与本地不同时以交易所为准）
+            
+        Returns:
+            订单仍占用其层级时返回 True
+        """
+        current = self.orders[order.grid_level] is order
+        if current and client_order_id and client_order_id != order.client_order_id:
+            self._forget(order)
+        order.order_id = order_id
+        if client_order_id:
+            order.client_order_id = client_order_id
+        if not current:
+            return False
+        self.order_ids[order_id] = order.grid_level
+        if order.client_order_id:
+            self.client_ids[order.client_order_id] = order.grid_level
+        return True
+    
+    def release(self, level: int) -> Optional[GridOrder]:
+        """释放层级，返回原来的订单"""
+        order = self.orders[level]
+        if order is not None:
+            self.orders[level] = None
+            self._forget(order)
+        return order
+    
+    def release_order(self, order: GridOrder) -> bool:
+        """订单仍占用其层级时释放该层级"""
+        if self.orders[order.grid_level] is not order:
+            return False
+        self.release(order.grid_level)
+        return True
+    
+    def clear(self):
+        """释放所有层级"""
+        self.orders = [None] * len(self.level_ticks)
+        self.order_ids = {}
+        self.client_ids = {}
+    
+    def _forget(self, order: GridOrder):
+        """删除订单在 ID 索引中的记录"""
+        if self.order_ids.get(order.order_id) == order.grid_level:
+            del self.order_ids[order.order_id]
+        if self.client_ids.get(order.client_order_id) == order.grid_level:
+            del self.client_ids[order.client_order_id]
+    
+    def snapshot(self, center: int, depth: int = 5) -> List[Tuple[int, Decimal, str, str, str]]:
+        """
+        以某个层级为中心的层级状态快照（用于界面显示）
+        
+        Returns:
+            [(层级, 价格, 状态, 方向, 交易所订单 ID)]，按价格从高到低排列
+        """
+        rows = []
+        for level in range(min(len(self.level_ticks) - 1, center + depth), max(-1, center - depth - 1), -1):
+            order = self.orders[level]
+            rows.append((
+                level,
+                Decimal(self.level_ticks[level]) * self.tick_size,
+                self.state(level),
+                order.side if order is not None else '',
+                order.order_id if order is not None else ''
+            ))
+        return rows
+    
+    def counts(self) -> Dict[str, int]:
+        """各方向已挂单和待确认的层级数"""
+        counts = {'buy': 0, 'sell': 0, 'pending': 0}
+        for level, order in enumerate(self.orders):
+            if order is None:
+                continue
+            if self.order_ids.get(order.order_id) == level:
+                counts[order.side] += 1
+            else:
+                counts['pending'] += 1
+        return counts
 
 
 class GridTradingStrategy:
     """网格交易策略类"""
     
     def __init__(self, symbol: str, lower_price: float, upper_price: float, 
-                 grid_count: int, leverage: int, order_value: float):
+                 grid_count: int, leverage: int, order_value: float,
+                 grid_mode: str = GRID_ARITHMETIC, tick_size=DEFAULT_TICK_SIZE, lot_size=DEFAULT_LOT_SIZE,
+                 use_numpy: Optional[bool] = None):
         """
         初始化网格交易策略
         
@@ -34,34 +330,223 @@ class GridTradingStrategy:
             grid_count: 网格数量
             leverage: 杠杆倍数
             order_value: 每个网格的开仓价值（USDT，名义价值，未乘以杠杆）
+            grid_mode: 网格模式，'arithmetic'（等差）或 'geometric'（等比）
+            tick_size: 价格精度（交易所的最小价格变动单位）
+            lot_size: 数量精度（交易所的最小下单数量单位）
+            use_numpy: 是否用 NumPy 向量化计算（None 表示层级数较多时自动启用；未安装 NumPy 时忽略）
         """
         self.symbol = symbol
         self.lower_price = Decimal(str(lower_price))
         self.upper_price = Decimal(str(upper_price))
+        if self.upper_price <= self.lower_price:
+            raise ValueError(f"网格上限价格 {self.upper_price} 必须高于下限价格 {self.lower_price}")
+        if grid_count < 1:
+            raise ValueError(f"网格数量必须大于 0: {grid_count}")
         self.grid_count = grid_count
         self.leverage = leverage
         self.order_value = Decimal(str(order_value))
+        if grid_mode not in GRID_MODES:
+            raise ValueError(f"不支持的网格模式: {grid_mode}")
+        self.grid_mode = grid_mode
         
-        # 计算网格价格间隔
+        self.tick_size = Decimal(str(tick_size))
+        self.lot_size = Decimal(str(lot_size))
+        
+        # 计算网格价格间隔（等差）或相邻层级的价格比例（等比）
         self.price_step = (self.upper_price - self.lower_price) / Decimal(str(grid_count))
+        self.price_ratio: Optional[Decimal] = None
+        
+        # 层级较多且安装了 NumPy 时向量化计算，结果与逐层计算完全一致
+        if use_numpy is None:
+            use_numpy = grid_count + 1 >= NUMPY_MIN_LEVELS
+        self.vectorized = bool(use_numpy) and np is not None
+        
+        # 每个层级的价格（tick 数）和数量（lot 数）只与配置有关，预先用整数运算算好；
+        # 向量化时 tick_array / lot_array 保存同样内容的 int64 数组
+        self.tick_array = None
+        self.lot_array = None
+        self.level_ticks = self._calculate_level_ticks()
+        if self.level_ticks[0] <= 0:
+            raise ValueError(f"网格下限价格 {self.lower_price} 低于价格精度 {self.tick_size}")
+        self.level_lots = self._calculate_level_lots(self.level_ticks)
+        # level_value_prefix[i] 为前 i 个层级 tick * lot 之和，用于 O(log n) 计算订单摘要
+        self.level_value_prefix = self._calculate_value_prefix()
         
-        # 存储网格订单
+        # 层级簿：价格 -> 层级、层级 -> 当前订单、订单 ID -> 层级
+        self.book = LevelBook(self.level_ticks, self.tick_size)
+        
+        # 存储网格订单，以及按方向汇总的订单数和 tick * lot 之和（买单数, 卖单数, 买单合计, 卖单合计）
         self.grid_orders: List[GridOrder] = []
+        self.order_totals: Tuple[int, int, int, int] = (0, 0, 0, 0)
         
-        # 设置日志
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        # 网格生成代数（参与客户端订单 ID 的生成），以启动时间初始化，避免与上次运行的订单 ID 冲突
+        self.generation = int(time.time())
+        
+        # 每个层级的补单次数
+        self.level_rounds: List[int] = []
+        self.deferred_counters: Dict[int, str] = {}  # 层级 -> 待该层级空出后补挂的方向
+        
+        # 持仓与盈亏（由成交驱动，重新生成网格时保留）
+        self.tracker = PositionTracker()
+        
+        # 日志（处理器由程序入口的 logging_setup.setup_logging 配置）
         self.logger = logging.getLogger(__name__)
+    
+    @property
+    def grid_prices(self) -> List[Decimal]:
+        """每个层级的价格"""
+        return self.calculate_grid_prices()
         
+    def _calculate_level_ticks(self) -> List[int]:
+        """计算每个层级的价格（tick 数），层级价格单调不减"""
+        if self.grid_mode == GRID_GEOMETRIC:
+            level_ticks = self._geometric_level_ticks()
+            if self.vectorized and level_ticks[-1] < _INT64_SAFE:
+                self.tick_array = np.array(level_ticks, dtype=np.int64)
+            return level_ticks
+        return self._arithmetic_level_ticks()
+    
+    def _arithmetic_level_ticks(self) -> List[int]:
+        """
+        计算等差网格每个层级的价格（tick 数）
+        
+        第 i 层价格 = lower + (upper - lower) * i / grid_count，向下取整到 tick_size；
+        全部换算为同一精度的整数后用整数除法计算。价格间隔不能用 Decimal 精确表示时，
+        原先的 Decimal 算法在恰好落在 tick 上的层级会因舍入少一个 tick，这些层级仍按原公式计算以保持结果一致
+        """
+        exponent = min(self.lower_price.as_tuple().exponent, self.upper_price.as_tuple().exponent,
+                       self.tick_size.as_tuple().exponent, 0)
+        lower = _to_scaled_int(self.lower_price, exponent)
+        span = _to_scaled_int(self.upper_price, exponent) - lower
+        tick = _to_scaled_int(self.tick_size, exponent)
+        count = self.grid_count
+        divisor = count * tick
+        
+        with localcontext() as ctx:
+            ctx.clear_flags()
+            (self.upper_price - self.lower_price) / Decimal(str(count))
+            step_exact = not ctx.flags[Inexact]
+        
+        if self.vectorized and (lower + span) * count < _INT64_SAFE:
+            numerators = np.arange(count + 1, dtype=np.int64) * span + lower * count
+            ticks, remainders = np.divmod(numerators, divisor)
+            if not step_exact:
+                for i in np.flatnonzero(remainders == 0).tolist():
+                    ticks[i] = self._decimal_level_ticks(i)
+            self.tick_array = ticks
+            return ticks.tolist()
+        
+        level_ticks = []
+        for i in range(count + 1):
+            ticks, remainder = divmod(lower * count + span * i, divisor)
+            if remainder == 0 and not step_exact:
+                ticks = self._decimal_level_ticks(i)
+            level_ticks.append(ticks)
+        return level_ticks
+    
+    def _geometric_level_ticks(self) -> List[int]:
+        """
+        计算等比网格每个层级的价格（tick 数）
+        
+        第 i 层价格 = lower * ratio ** i，ratio = (upper / lower) ** (1 / grid_count)，向下取整到 tick_size；
+        用较高精度逐层累乘，最高层固定为 upper
+        """
+        with localcontext() as ctx:
+            ctx.prec = 40
+            self.price_ratio = (self.upper_price / self.lower_price) ** (Decimal(1) / Decimal(self.grid_count))
+            price = self.lower_price
+            level_ticks = []
+            for _ in range(self.grid_count):
+                level_ticks.append(int(price // self.tick_size))
+                price *= self.price_ratio
+            level_ticks.append(int(self.upper_price // self.tick_size))
+        return level_ticks
+    
+    def _decimal_level_ticks(self, level: int) -> int:
+        """按原先的 Decimal 公式计算单个层级的价格（tick 数）"""
+        return int((self.lower_price + self.price_step * Decimal(level)) // self.tick_size)
+    
+    def _calculate_level_lots(self, level_ticks: List[int]) -> List[int]:
+        """
+        计算每个层级的下单数量（lot 数）
+        
+        数量 = order_value / 价格，向下取整到 lot_size；
+        价格为 ticks * tick_size，因此 lot 数 = order_value / (ticks * tick_size * lot_size) 向下取整
+        """
+        value_exp = self.order_value.as_tuple().exponent
+        tick_exp = self.tick_size.as_tuple().exponent
+        lot_exp = self.lot_size.as_tuple().exponent
+        value = _to_scaled_int(self.order_value, value_exp)
+        unit = _to_scaled_int(self.tick_size, tick_exp) * _to_scaled_int(self.lot_size, lot_exp)
+        shift = value_exp - tick_exp - lot_exp
+        if shift >= 0:
+            value *= 10 ** shift
+        else:
+            unit *= 10 ** -shift
+        
+        if self.tick_array is not None and max(value, level_ticks[-1] * unit) < _INT64_SAFE:
+            self.lot_array = value // (self.tick_array * unit)
+            return self.lot_array.tolist()
+        return [value // (ticks * unit) for ticks in level_ticks]
+    
+    def _calculate_value_prefix(self) -> List[int]:
+        """计算各层级 tick * lot 的前缀和"""
+        if (self.tick_array is not None and self.lot_array is not None
+                and self.level_ticks[-1] * self.level_lots[0] * len(self.level_ticks) < _INT64_SAFE):
+            return [0] + np.cumsum(self.tick_array * self.lot_array).tolist()
+        return [0] + list(accumulate(t * q for t, q in zip(self.level_ticks, self.level_lots)))
+    
     def calculate_grid_prices(self) -> List[Decimal]:
         """计算所有网格价格点"""
-        prices = []
-        for i in range(self.grid_count + 1):
-            price = self.lower_price + self.price_step * Decimal(str(i))
-            prices.append(price.quantize(Decimal('0.01'), rounding=ROUND_DOWN))
-        return prices
+        return [Decimal(ticks) * self.tick_size for ticks in self.level_ticks]
+    
+    def level_at_price(self, price: float) -> int:
+        """
+        查找价格所在的网格层级（O(log n)）
+        
+        Args:
+            price: 价格
+            
+        Returns:
+            价格不低于其层级价格的最高层级，价格低于最低层级时返回 -1
+        """
+        return self.book.level_at_price(price)
+    
+    def grid_arrays(self, current_price: float) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        一次性计算所有层级的价格、数量和方向，不生成订单对象（需要 NumPy）
+        
+        Args:
+            current_price: 当前市场价格
+            
+        Returns:
+            (价格 tick 数, 数量 lot 数, 方向) 三个数组，方向为 SIDE_BUY / SIDE_SELL / SIDE_NONE
+        """
+        if np is None:
+            raise RuntimeError("grid_arrays 需要安装 NumPy")
+        ticks = self.tick_array
+        if ticks is None:
+            ticks = np.array(self.level_ticks, dtype=object)
+        lots = self.lot_array
+        if lots is None:
+            lots = np.array(self.level_lots, dtype=object)
+        buy_end, sell_start = self.book.side_ranges(current_price)
+        sides = np.zeros(len(ticks), dtype=np.int8)
+        sides[:buy_end] = SIDE_BUY
+        sides[sell_start:] = SIDE_SELL
+        return ticks, lots, sides
+    
+    def _side_totals(self, current_price: float) -> Tuple[int, int, int, int]:
+        """
+        按当前价格统计买卖单数和各自的 tick * lot 之和（O(log n)）
+        
+        Returns:
+            (买单数, 卖单数, 买单 tick * lot 之和, 卖单 tick * lot 之和)
+        """
+        buy_end, sell_start = self.book.side_ranges(current_price)
+        count = len(self.level_ticks)
+        prefix = self.level_value_prefix
+        return buy_end, count - sell_start, prefix[buy_end], prefix[count] - prefix[sell_start]
     
     def generate_grid_orders(self, current_price: float) -> List[GridOrder]:
         """
@@ -73,55 +558,207 @@ class GridTradingStrategy:
         Returns:
             网格订单列表
         """
-        current_price_decimal = Decimal(str(current_price))
-        grid_prices = self.calculate_grid_prices()
-        
-        orders = []
-        
-        for i, price in enumerate(grid_prices):
-            if price < current_price_decimal:
-                # 当前价格下方，设置买入订单
-                quantity = (self.order_value / price).quantize(
-                    Decimal('0.000001'), rounding=ROUND_DOWN
-                )
-                orders.append(GridOrder(
-                    price=price,
-                    quantity=quantity,
-                    side='buy',
-                    grid_level=i
-                ))
-            elif price > current_price_decimal:
-                # 当前价格上方，设置卖出订单
-                quantity = (self.order_value / price).quantize(
-                    Decimal('0.000001'), rounding=ROUND_DOWN
-                )
-                orders.append(GridOrder(
-                    price=price,
-                    quantity=quantity,
-                    side='sell',
-                    grid_level=i
-                ))
+        self.generation += 1
+        self.book.clear()
+        self.level_rounds = [0] * len(self.level_ticks)
+        self.deferred_counters = {}
+        
+        buy_end, sell_start = self.book.side_ranges(current_price)
+        # 当前价格下方，设置买入订单
+        orders = [self._build_order(i, 'buy') for i in range(buy_end)]
+        # 当前价格上方，设置卖出订单
+        orders.extend(self._build_order(i, 'sell') for i in range(sell_start, len(self.level_ticks)))
+        
+        for order in orders:
+            self.book.assign(order.grid_level, order)
         
         self.grid_orders = orders
-        self.logger.info(f"生成了 {len(orders)} 个网格订单")
+        self.order_totals = self._side_totals(current_price)
+        self.logger.info("生成了 %s 个网格订单", len(orders))
         return orders
     
+    def _build_order(self, level: int, side: str) -> GridOrder:
+        """按层级价格和每格开仓价值构造网格订单"""
+        return GridOrder(
+            price_ticks=self.level_ticks[level],
+            quantity_lots=self.level_lots[level],
+            side=side,
+            grid_level=level,
+            tick_size=self.tick_size,
+            lot_size=self.lot_size,
+            client_order_id=make_client_order_id(
+                self.symbol, level, self.generation, side, self.level_rounds[level]
+            )
+        )
+    
+    def reset_orders(self):
+        """撤销全部订单后清空各层级的订单状态"""
+        self.book.clear()
+        self.deferred_counters = {}
+    
+    def fingerprint(self) -> str:
+        """网格参数（交易对、各层级价格和数量）的摘要，参数变化后旧的层级状态不能再使用"""
+        digest = hashlib.sha256(
+            f"{self.symbol}|{self.tick_size}|{self.lot_size}|{self.level_ticks}|{self.level_lots}".encode()
+        )
+        return digest.hexdigest()[:16]
+    
+    def export_state(self) -> Dict:
+        """
+        导出层级状态和持仓统计（可序列化为 JSON，用于订单日志快照）
+        
+        Returns:
+            {'fingerprint', 'generation', 'level_rounds', 'deferred_counters',
+             'orders': [[层级, 方向, 客户端订单 ID, 交易所订单 ID（未确认时为 None）]], 'tracker'}
+        """
+        book = self.book
+        return {
+            'fingerprint': self.fingerprint(),
+            'generation': self.generation,
+            'level_rounds': list(self.level_rounds),
+            'deferred_counters': {str(level): side for level, side in self.deferred_counters.items()},
+            'orders': [
+                [level, order.side, order.client_order_id,
+                 order.order_id if book.state(level) == LevelBook.LIVE else None]
+                for level, order in enumerate(book.orders) if order is not None
+            ],
+            'tracker': asdict(self.tracker.snapshot())
+        }
+    
+    def restore_state(self, state: Dict):
+        """
+        从 export_state 导出的状态恢复
+        
+        Raises:
+            ValueError: 导出状态时的网格参数与当前不一致
+        """
+        if state.get('fingerprint') != self.fingerprint():
+            raise ValueError("网格参数已变化，无法恢复层级状态")
+        self.generation = state['generation']
+        self.level_rounds = list(state['level_rounds']) or [0] * len(self.level_ticks)
+        self.deferred_counters = {int(level): side for level, side in state['deferred_counters'].items()}
+        self.book.clear()
+        for level, side, client_order_id, order_id in state['orders']:
+            order = self.restore_order(level, side, client_order_id)
+            if order_id:
+                self.book.confirm(order, order_id)
+        self.tracker.restore(PositionSnapshot(**state['tracker']))
+    
+    def restore_order(self, level: int, side: str, client_order_id: str) -> GridOrder:
+        """按日志中的记录在层级上放置待确认的订单（沿用原来的客户端订单 ID）"""
+        order = self._build_order(level, side)
+        order.client_order_id = client_order_id
+        self.book.assign(level, order)
+        return order
+    
+    def on_order_placed(self, order: GridOrder, order_id: str, client_order_id: Optional[str] = None):
+        """
+        记录下单成功的订单
+        
+        Args:
+            order: 网格订单
+            order_id: 交易所订单 ID
+            client_order_id: 交易所记录的客户端订单 ID（与本地不同时以交易所为准）
+        """
+        self.book.confirm(order, order_id, client_order_id)
+    
+    def on_order_rejected(self, order: GridOrder):
+        """下单失败，释放该订单占用的层级"""
+        if self.book.release_order(order):
+            self.deferred_counters.pop(order.grid_level, None)
+    
+    def on_order_canceled(self, order_id: str, client_order_id: Optional[str] = None):
+        """订单被撤销，释放对应层级"""
+        level = self.book.find(order_id, client_order_id)
+        if level is not None:
+            self.book.release(level)
+            self.deferred_counters.pop(level, None)
+    
+    def on_fill(self, order_id: str, client_order_id: Optional[str] = None,
+                price: Optional[float] = None, fee: float = 0.0) -> List[GridOrder]:
+        """
+        处理订单成交，返回需要补挂的反向订单
+        
+        买单在第 i 层成交后在第 i+1 层挂卖单，卖单在第 i 层成交后在第 i-1 层挂买单。
+        目标层级已有同方向订单时无需补单；目标层级还挂着反方向订单时（价格一次穿过多层，
+        该订单的成交尚未处理），先记下，待该层级成交后再补挂。
+        成交同时记入持仓跟踪器。
+        
+        Args:
+            order_id: 成交订单的交易所订单 ID
+            client_order_id: 成交订单的客户端订单 ID（成交先于下单响应到达时用于定位层级）
+            price: 成交价格，默认为挂单价格
+            fee: 手续费（金额）
+            
+        Returns:
+            需要下单的反向订单列表（已占用目标层级）
+        """
+        level = self.book.find(order_id, client_order_id)
+        if level is None:
+            return []
+        filled = self.book.release(level)
+        self.tracker.on_fill(
+            filled.side, float(filled.price if price is None else price), float(filled.quantity), fee, level
+        )
+        
+        counters = []
+        deferred_side = self.deferred_counters.pop(level, None)
+        if deferred_side is not None:
+            counters.append(self._occupy_level(level, deferred_side))
+        
+        if filled.side == 'buy':
+            target, side = level + 1, 'sell'
+        else:
+            target, side = level - 1, 'buy'
+        if 0 <= target < len(self.book):
+            occupant = self.book.order_at(target)
+            if occupant is None:
+                counters.append(self._occupy_level(target, side))
+            elif occupant.side != side:
+                self.deferred_counters[target] = side
+        return counters
+    
+    def _occupy_level(self, level: int, side: str) -> GridOrder:
+        """在空闲层级上生成补单并占用该层级"""
+        self.level_rounds[level] += 1
+        order = self._build_order(level, side)
+        self.book.assign(level, order)
+        return order
+    
     def get_order_summary(self) -> Dict:
         """获取订单摘要信息"""
-        buy_orders = [o for o in self.grid_orders if o.side == 'buy']
-        sell_orders = [o for o in self.grid_orders if o.side == 'sell']
+        return self._build_summary(self.order_totals)
+    
+    def summarize_grid(self, current_price: float) -> Dict:
+        """
+        按给定价格计算订单摘要，不生成订单、不改变策略状态（用于预览和批量评估参数）
+        
+        Args:
+            current_price: 当前市场价格
+            
+        Returns:
+            与 get_order_summary 相同格式的摘要
+        """
+        return self._build_summary(self._side_totals(current_price))
+    
+    def _build_summary(self, totals: Tuple[int, int, int, int]) -> Dict:
+        """由按方向汇总的订单数和 tick * lot 之和构造摘要"""
+        buy_count, sell_count, buy_units, sell_units = totals
         
-        total_buy_value = sum(o.price * o.quantity for o in buy_orders)
-        total_sell_value = sum(o.price * o.quantity for o in sell_orders)
+        # 先按整数累加 tick * lot，最后乘一次精度
+        unit = self.tick_size * self.lot_size
+        total_buy_value = buy_units * unit
+        total_sell_value = sell_units * unit
         
         return {
             'symbol': self.symbol,
             'grid_range': f"{self.lower_price} - {self.upper_price}",
             'grid_count': self.grid_count,
+            'grid_mode': self.grid_mode,
             'leverage': self.leverage,
             'order_value': float(self.order_value),
-            'buy_orders_count': len(buy_orders),
-            'sell_orders_count': len(sell_orders),
+            'buy_orders_count': buy_count,
+            'sell_orders_count': sell_count,
             'total_buy_value': float(total_buy_value),
             'total_sell_value': float(total_sell_value),
             'total_capital_needed': float(total_buy_value / self.leverage)
@@ -136,6 +773,7 @@ class GridTradingStrategy:
         print(f"交易对: {summary['symbol']}")
         print(f"网格区间: {summary['grid_range']}")
         print(f"网格数量: {summary['grid_count']}")
+        print(f"网格模式: {GRID_MODES[summary['grid_mode']]}")
         print(f"杠杆倍数: {summary['leverage']}x")
         print(f"每网格开仓价值: {summary['order_value']} USDT (名义价值)")
         print(f"买入订单数: {summary['buy_orders_count']}")
@@ -7,11 +7,105 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import sys
-from grid_trading_strategy import GridTradingStrategy
+from grid_trading_strategy import GridTradingStrategy, GRID_ARITHMETIC, GRID_MODES
+from risk_simulator import RiskSimulator, np
 from lighter_api import LighterAPI
 from config import Config
+from logging_setup import setup_logging
 import logging
-from io import StringIO
+from collections import deque
+from typing import List, Optional, Tuple
+
+
+LOG_BUFFER_SIZE = 20000  # 内存中保留的日志条数（级别筛选和搜索的范围）
+LOG_DISPLAY_LINES = 2000  # 日志窗口最多显示的行数，超出后删除最早的行
+LOG_DRAIN_BATCH = 500  # 每次刷新最多取出的日志条数，其余留到下一次刷新
+LOG_LEVELS = {'全部': logging.NOTSET, 'DEBUG': logging.DEBUG, 'INFO': logging.INFO,
+              'WARNING': logging.WARNING, 'ERROR': logging.ERROR}
+
+
+class GuiLogHandler(logging.Handler):
+    """把格式化后的日志放入有界队列（在日志后台线程中调用），由界面定时分批取出"""
+    
+    def __init__(self, capacity: int = 5000):
+        super().__init__()
+        # deque 的 append / popleft 是线程安全的；界面来不及取出时丢弃最早的日志
+        self.queue = deque(maxlen=capacity)
+        self.dropped = 0  # 被丢弃的日志数（只用于显示，多线程写入时可能略少）
+    
+    def emit(self, record):
+        try:
+            self.put(record.levelno, self.format(record))
+        except Exception:
+            self.handleError(record)
+    
+    def put(self, levelno: int, text: str):
+        """放入一条日志（任意线程均可调用）"""
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append((levelno, text))
+    
+    def drain(self, limit: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        按先后顺序取出日志
+        
+        Args:
+            limit: 最多取出的条数，None 表示全部
+        
+        Returns:
+            (级别, 格式化后的日志) 列表
+        """
+        entries = []
+        while limit is None or len(entries) < limit:
+            try:
+                entries.append(self.queue.popleft())
+            except IndexError:
+                break
+        return entries
+
+
+class LogBuffer:
+    """界面日志的环形缓冲区：保留最近 capacity 条日志，按级别和关键字筛选"""
+    
+    def __init__(self, capacity: int = LOG_BUFFER_SIZE):
+        self.entries = deque(maxlen=capacity)
+        self.min_level = logging.NOTSET
+        self.search = ''  # 小写的搜索关键字，为空时不按关键字筛选
+    
+    def set_filter(self, min_level: int, search: str):
+        """设置显示的最低级别和搜索关键字（不区分大小写）"""
+        self.min_level = min_level
+        self.search = search.strip().lower()
+    
+    def matches(self, entry: Tuple[int, str]) -> bool:
+        """日志是否符合当前的筛选条件"""
+        levelno, text = entry
+        return levelno >= self.min_level and (not self.search or self.search in text.lower())
+    
+    def extend(self, entries: List[Tuple[int, str]]) -> List[str]:
+        """
+        追加日志
+        
+        Returns:
+            其中符合筛选条件的日志（需要追加到窗口的内容）
+        """
+        self.entries.extend(entries)
+        return [entry[1] for entry in entries if self.matches(entry)]
+    
+    def filtered(self, limit: int) -> List[str]:
+        """符合筛选条件的最近 limit 条日志（按先后顺序）"""
+        lines = []
+        for entry in reversed(self.entries):
+            if len(lines) >= limit:
+                break
+            if self.matches(entry):
+                lines.append(entry[1])
+        lines.reverse()
+        return lines
+    
+    def clear(self):
+        """清空缓冲区"""
+        self.entries.clear()
 
 
 class GridTradingGUI:
@@ -28,8 +122,11 @@ class GridTradingGUI:
         self.bot_thread = None
         self.is_running = False
         
-        # 日志处理器
-        self.log_stream = StringIO()
+        # 日志处理器（后台线程写入队列）和界面日志缓冲区（只在界面线程中访问）
+        self.log_handler = GuiLogHandler()
+        self.log_buffer = LogBuffer()
+        self.log_lines_shown = 0  # 日志窗口当前的行数
+        self._log_filter_job = None
         self.setup_logging()
         
         # 创建界面
@@ -39,12 +136,8 @@ class GridTradingGUI:
         self.load_config()
     
     def setup_logging(self):
-        """设置日志"""
-        handler = logging.StreamHandler(self.log_stream)
-        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logger = logging.getLogger()
-        logger.addHandler(handler)
-        logger.setLevel(logging.INFO)
+        """设置日志（日志由后台线程写入界面缓冲区，策略线程不等待界面刷新）"""
+        setup_logging(**Config.get_logging_config(), handlers=[self.log_handler])
     
     def create_widgets(self):
         """创建界面组件"""
@@ -141,37 +234,60 @@ class GridTradingGUI:
         )
         ttk.Label(frame, text="建议: 5-50").grid(row=3, column=2, sticky=tk.W, padx=5)
         
+        # 网格模式
+        ttk.Label(frame, text="网格模式:").grid(row=4, column=0, sticky=tk.W, padx=10, pady=10)
+        self.grid_mode_var = tk.StringVar(value=GRID_MODES[GRID_ARITHMETIC])
+        ttk.Combobox(
+            frame, textvariable=self.grid_mode_var, values=list(GRID_MODES.values()),
+            state="readonly", width=28
+        ).grid(row=4, column=1, padx=10, pady=10, sticky=tk.W)
+        ttk.Label(frame, text="等比: 相邻层级价格比例相同").grid(row=4, column=2, sticky=tk.W, padx=5)
+        
         # 杠杆倍数
-        ttk.Label(frame, text="杠杆倍数:").grid(row=4, column=0, sticky=tk.W, padx=10, pady=10)
+        ttk.Label(frame, text="杠杆倍数:").grid(row=5, column=0, sticky=tk.W, padx=10, pady=10)
         self.leverage_var = tk.StringVar(value="1")
         ttk.Entry(frame, textvariable=self.leverage_var, width=30).grid(
-            row=4, column=1, padx=10, pady=10, sticky=tk.W
+            row=5, column=1, padx=10, pady=10, sticky=tk.W
         )
-        ttk.Label(frame, text="1表示不使用杠杆").grid(row=4, column=2, sticky=tk.W, padx=5)
+        ttk.Label(frame, text="1表示不使用杠杆").grid(row=5, column=2, sticky=tk.W, padx=5)
         
         # 每网格开仓价值
         ttk.Label(frame, text="每网格开仓价值 (USDT):").grid(
-            row=5, column=0, sticky=tk.W, padx=10, pady=10
+            row=6, column=0, sticky=tk.W, padx=10, pady=10
         )
         self.order_value_var = tk.StringVar(value="100")
         ttk.Entry(frame, textvariable=self.order_value_var, width=30).grid(
-            row=5, column=1, padx=10, pady=10, sticky=tk.W
+            row=6, column=1, padx=10, pady=10, sticky=tk.W
         )
         ttk.Label(
             frame, 
             text="名义价值（未乘以杠杆）\n实际保证金 = 开仓价值 / 杠杆", 
             foreground="gray",
             font=("Arial", 8)
-        ).grid(row=5, column=2, sticky=tk.W, padx=5)
+        ).grid(row=6, column=2, sticky=tk.W, padx=5)
+        
+        # 风险模拟参数（仅用于预览，不保存到配置）
+        ttk.Label(frame, text="年化波动率 (%):").grid(row=7, column=0, sticky=tk.W, padx=10, pady=10)
+        self.volatility_var = tk.StringVar(value="60")
+        ttk.Entry(frame, textvariable=self.volatility_var, width=30).grid(
+            row=7, column=1, padx=10, pady=10, sticky=tk.W
+        )
+        ttk.Label(frame, text="预览时模拟价格路径，估算强平概率").grid(row=7, column=2, sticky=tk.W, padx=5)
+        
+        ttk.Label(frame, text="模拟天数:").grid(row=8, column=0, sticky=tk.W, padx=10, pady=10)
+        self.sim_days_var = tk.StringVar(value="30")
+        ttk.Entry(frame, textvariable=self.sim_days_var, width=30).grid(
+            row=8, column=1, padx=10, pady=10, sticky=tk.W
+        )
         
         # 策略预览按钮
         ttk.Button(frame, text="预览策略", command=self.preview_strategy).grid(
-            row=6, column=0, columnspan=2, pady=10
+            row=9, column=0, columnspan=2, pady=10
         )
         
         # 保存按钮
         ttk.Button(frame, text="保存交易配置", command=self.save_trading_config).grid(
-            row=7, column=0, columnspan=2, pady=20
+            row=10, column=0, columnspan=2, pady=20
         )
     
     def create_run_tab(self):
@@ -223,12 +339,27 @@ class GridTradingGUI:
         """创建日志标签页"""
         frame = self.log_frame
         
-        # 日志显示区域
-        self.log_text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, height=30)
+        # 筛选工具栏：级别和搜索关键字，修改后从缓冲区重新显示
+        toolbar = ttk.Frame(frame)
+        toolbar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(toolbar, text="级别:").pack(side=tk.LEFT)
+        self.log_level_var = tk.StringVar(value='全部')
+        level_combo = ttk.Combobox(toolbar, textvariable=self.log_level_var, values=list(LOG_LEVELS),
+                                   state='readonly', width=10)
+        level_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(toolbar, text="搜索:").pack(side=tk.LEFT, padx=(10, 0))
+        self.log_search_var = tk.StringVar()
+        ttk.Entry(toolbar, textvariable=self.log_search_var, width=30).pack(side=tk.LEFT, padx=5)
+        self.log_level_var.trace_add('write', self.on_log_filter_changed)
+        self.log_search_var.trace_add('write', self.on_log_filter_changed)
+        ttk.Button(toolbar, text="清空日志", command=self.clear_log).pack(side=tk.RIGHT)
+        
+        # 日志显示区域（只读，只在末尾追加）
+        self.log_text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, height=30, state=tk.DISABLED)
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # 清空日志按钮
-        ttk.Button(frame, text="清空日志", command=self.clear_log).pack(pady=5)
+        self.log_status_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.log_status_var).pack(anchor=tk.W, padx=10, pady=(0, 5))
         
         # 定期更新日志
         self.update_log()
@@ -252,10 +383,11 @@ class GridTradingGUI:
                 self.lower_price_var.set(str(trading_config.get('lower_price', '')))
                 self.upper_price_var.set(str(trading_config.get('upper_price', '')))
                 self.grid_count_var.set(str(trading_config.get('grid_count', '20')))
+                self.grid_mode_var.set(GRID_MODES.get(trading_config.get('grid_mode'), GRID_MODES[GRID_ARITHMETIC]))
                 self.leverage_var.set(str(trading_config.get('leverage', '1')))
                 self.order_value_var.set(str(trading_config.get('order_value', '100')))
         except Exception as e:
-            self.log_message(f"加载配置时出错: {e}")
+            self.log_message(f"加载配置时出错: {e}", logging.ERROR)
     
     def save_api_config(self):
         """保存 API 配置"""
@@ -273,7 +405,15 @@ class GridTradingGUI:
             self.log_message("API 配置已保存")
         except Exception as e:
             messagebox.showerror("错误", f"保存 API 配置失败: {e}")
-            self.log_message(f"保存 API 配置失败: {e}")
+            self.log_message(f"保存 API 配置失败: {e}", logging.ERROR)
+    
+    def get_grid_mode(self) -> str:
+        """把界面上选择的网格模式名称转换为配置值"""
+        label = self.grid_mode_var.get()
+        for mode, mode_label in GRID_MODES.items():
+            if mode_label == label:
+                return mode
+        return GRID_ARITHMETIC
     
     def save_trading_config(self):
         """保存交易配置"""
@@ -283,6 +423,7 @@ class GridTradingGUI:
             lower_price = float(self.lower_price_var.get())
             upper_price = float(self.upper_price_var.get())
             grid_count = int(self.grid_count_var.get())
+            grid_mode = self.get_grid_mode()
             leverage = int(self.leverage_var.get())
             order_value = float(self.order_value_var.get())
             
@@ -307,6 +448,7 @@ class GridTradingGUI:
                 'lower_price': lower_price,
                 'upper_price': upper_price,
                 'grid_count': grid_count,
+                'grid_mode': grid_mode,
                 'leverage': leverage,
                 'order_value': order_value
             }
@@ -318,7 +460,7 @@ class GridTradingGUI:
             messagebox.showerror("错误", "请输入有效的数字")
         except Exception as e:
             messagebox.showerror("错误", f"保存交易配置失败: {e}")
-            self.log_message(f"保存交易配置失败: {e}")
+            self.log_message(f"保存交易配置失败: {e}", logging.ERROR)
     
     def preview_strategy(self):
         """预览策略"""
@@ -328,6 +470,7 @@ class GridTradingGUI:
             lower_price = float(self.lower_price_var.get())
             upper_price = float(self.upper_price_var.get())
             grid_count = int(self.grid_count_var.get())
+            grid_mode = self.get_grid_mode()
             leverage = int(self.leverage_var.get())
             order_value = float(self.order_value_var.get())
             
@@ -335,12 +478,11 @@ class GridTradingGUI:
             current_price = (lower_price + upper_price) / 2
             strategy = GridTradingStrategy(
                 symbol, lower_price, upper_price, 
-                grid_count, leverage, order_value
+                grid_count, leverage, order_value, grid_mode
             )
             
-            # 生成订单
-            strategy.generate_grid_orders(current_price)
-            summary = strategy.get_order_summary()
+            # 计算订单摘要（不生成订单对象）
+            summary = strategy.summarize_grid(current_price)
             
             # 显示策略信息
             info = f"""
@@ -349,6 +491,7 @@ class GridTradingGUI:
 交易对: {summary['symbol']}
 网格区间: {summary['grid_range']}
 网格数量: {summary['grid_count']}
+网格模式: {GRID_MODES[summary['grid_mode']]}
 杠杆倍数: {summary['leverage']}x
 每网格开仓价值: {summary['order_value']} USDT (名义价值)
 
@@ -365,6 +508,7 @@ class GridTradingGUI:
   - 例如: 100 USDT 开仓价值，3x 杠杆 = 33.33 USDT 保证金
 {'='*50}
 """
+            info += self.simulate_risk(strategy, current_price)
             
             self.info_text.delete(1.0, tk.END)
             self.info_text.insert(1.0, info)
@@ -374,6 +518,26 @@ class GridTradingGUI:
         except Exception as e:
             messagebox.showerror("错误", f"预览策略失败: {e}")
     
+    def simulate_risk(self, strategy, current_price) -> str:
+        """
+        用蒙特卡洛模拟估算预览配置的风险（资金按所需保证金计算）
+        
+        Returns:
+            追加到预览信息中的文本
+        """
+        if np is None:
+            return "\n风险模拟: 安装 NumPy 后可显示持仓、保证金和强平概率的分布\n"
+        volatility = float(self.volatility_var.get()) / 100
+        days = float(self.sim_days_var.get())
+        # 预览时路径数较少，保证一秒内完成
+        report = RiskSimulator(strategy).simulate_gbm(current_price, volatility, days, paths=2000, steps=500)
+        return f"""
+风险模拟（以区间中点为起始价格，资金 = 所需保证金）
+{'='*50}
+{report.format_report()}
+{'='*50}
+"""
+    
     def start_strategy(self):
         """启动策略"""
         try:
@@ -400,10 +564,11 @@ class GridTradingGUI:
             self.bot_thread.start()
             
             self.log_message("策略启动中...")
+            self.update_book_view()
             
         except Exception as e:
             messagebox.showerror("错误", f"启动策略失败: {e}")
-            self.log_message(f"启动策略失败: {e}")
+            self.log_message(f"启动策略失败: {e}", logging.ERROR)
             self.start_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
             self.is_running = False
@@ -423,23 +588,50 @@ class GridTradingGUI:
             # 下单
             self.bot.place_grid_orders()
             
-            # 监控循环
-            import time
-            while self.bot.running and self.is_running:
-                time.sleep(60)
-                if self.bot.running and self.is_running:
-                    self.bot.monitor_orders()
+            # 监控循环（推送驱动或定时轮询，停止按钮会将 bot.running 置为 False）
+            self.bot.run_loop()
                     
         except KeyboardInterrupt:
             self.log_message("收到停止信号")
         except Exception as e:
-            self.log_message(f"策略运行出错: {e}")
+            self.log_message(f"策略运行出错: {e}", logging.ERROR)
         finally:
             if self.bot:
-                self.bot.stop()
+                self.log_message(f"正在撤销所有挂单（最多 {self.bot.shutdown_deadline} 秒）...")
+                report = self.bot.stop()
+                if report is not None and not report.clean:
+                    self.log_message(f"❌ {report.format()}，请到交易所手动处理", logging.ERROR)
+                elif report is not None:
+                    self.log_message(f"✅ {report.format()}")
             self.is_running = False
             self.root.after(0, self.on_strategy_stopped)
     
+    def update_book_view(self):
+        """策略运行时定期显示当前价格附近的层级状态"""
+        if not self.is_running:
+            return
+        
+        strategy = self.bot.strategy if self.bot else None
+        if strategy is not None:
+            book = strategy.book
+            price = self.bot.last_price
+            center = book.level_at_price(price) if price else len(book) // 2
+            counts = book.counts()
+            lines = [
+                f"当前价格: {price if price else '-'}  所在层级: {center}",
+                f"挂单: 买 {counts['buy']} / 卖 {counts['sell']}  待确认: {counts['pending']}",
+                strategy.tracker.snapshot(price).format(),
+                "",
+                f"{'层级':>6} {'价格':>14} {'状态':>8} {'方向':>5}  订单ID"
+            ]
+            for level, level_price, state, side, order_id in book.snapshot(center):
+                lines.append(f"{level:>6} {str(level_price):>14} {state:>8} {side:>5}  {order_id}")
+            self.info_text.delete(1.0, tk.END)
+            self.info_text.insert(1.0, "\n".join(lines))
+        
+        # 每秒刷新一次
+        self.root.after(1000, self.update_book_view)
+    
     def on_strategy_stopped(self):
         """策略停止后的回调"""
         self.start_button.config(state=tk.NORMAL)
@@ -453,33 +645,79 @@ class GridTradingGUI:
         self.is_running = False
         if self.bot:
             self.bot.running = False
+        # 撤单完成前不能再次启动，on_strategy_stopped 会恢复按钮
+        self.stop_button.config(state=tk.DISABLED)
+        self.status_var.set("停止中")
+        self.status_label.config(foreground="orange")
         self.log_message("正在停止策略...")
     
-    def log_message(self, message):
-        """添加日志消息"""
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
+    def log_message(self, message, level=logging.INFO):
+        """添加日志消息（可在策略线程中调用，由 update_log 在界面线程中显示）"""
+        self.log_handler.put(level, message)
     
     def update_log(self):
-        """更新日志显示"""
-        # 读取日志流
-        log_content = self.log_stream.getvalue()
-        if log_content:
-            current_content = self.log_text.get(1.0, tk.END)
-            if log_content not in current_content:
-                self.log_text.insert(tk.END, log_content)
-                self.log_text.see(tk.END)
-                self.log_stream.seek(0)
-                self.log_stream.truncate(0)
+        """
+        更新日志显示
+        
+        每次最多取出 LOG_DRAIN_BATCH 条追加到窗口末尾，窗口超过 LOG_DISPLAY_LINES 行时删除最早的行，
+        不读取窗口内容，耗时与运行时长无关
+        """
+        entries = self.log_handler.drain(LOG_DRAIN_BATCH)
+        if entries:
+            self.append_log_lines(self.log_buffer.extend(entries))
+            self.update_log_status()
         
         # 每500ms更新一次
         self.root.after(500, self.update_log)
     
+    def append_log_lines(self, lines):
+        """把日志追加到窗口末尾（查看历史日志时不自动滚动）"""
+        if not lines:
+            return
+        at_bottom = self.log_text.yview()[1] >= 0.999
+        text = "\n".join(lines) + "\n"
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.insert(tk.END, text)
+        self.log_lines_shown += text.count("\n")
+        excess = self.log_lines_shown - LOG_DISPLAY_LINES
+        if excess > 0:
+            self.log_text.delete(1.0, f"{excess + 1}.0")
+            self.log_lines_shown -= excess
+        self.log_text.config(state=tk.DISABLED)
+        if at_bottom:
+            self.log_text.see(tk.END)
+    
+    def on_log_filter_changed(self, *args):
+        """筛选条件修改后稍等再刷新（输入关键字时不逐字重建窗口）"""
+        if self._log_filter_job is not None:
+            self.root.after_cancel(self._log_filter_job)
+        self._log_filter_job = self.root.after(300, self.refresh_log_view)
+    
+    def refresh_log_view(self):
+        """按当前筛选条件从缓冲区重新显示日志"""
+        self._log_filter_job = None
+        self.log_buffer.set_filter(LOG_LEVELS.get(self.log_level_var.get(), logging.NOTSET),
+                                   self.log_search_var.get())
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.delete(1.0, tk.END)
+        self.log_text.config(state=tk.DISABLED)
+        self.log_lines_shown = 0
+        self.append_log_lines(self.log_buffer.filtered(LOG_DISPLAY_LINES))
+        self.log_text.see(tk.END)
+        self.update_log_status()
+    
+    def update_log_status(self):
+        """显示缓冲区中的日志数和丢弃数"""
+        status = f"缓冲 {len(self.log_buffer.entries)}/{self.log_buffer.entries.maxlen} 条"
+        if self.log_handler.dropped:
+            status += f"，界面来不及显示而丢弃 {self.log_handler.dropped} 条"
+        self.log_status_var.set(status)
+    
     def clear_log(self):
         """清空日志"""
-        self.log_text.delete(1.0, tk.END)
-        self.log_stream.seek(0)
-        self.log_stream.truncate(0)
+        self.log_handler.drain()
+        self.log_buffer.clear()
+        self.refresh_log_view()
 
 
 def main():
@@ -5,7 +5,7 @@
 
 import sys
 from typing import Dict, Optional
-from grid_trading_strategy import GridTradingStrategy
+from grid_trading_strategy import GridTradingStrategy, GRID_ARITHMETIC, GRID_GEOMETRIC, GRID_MODES
 from lighter_api import LighterAPI
 from config import Config
 
@@ -87,6 +87,20 @@ class InteractiveSetup:
             except ValueError:
                 print("❌ 请输入有效的整数")
     
+    def get_grid_mode(self) -> str:
+        """获取网格模式"""
+        print("\n请选择网格模式:")
+        print("  1. 等差网格（相邻层级价差相同）")
+        print("  2. 等比网格（相邻层级价格比例相同，适合较宽的价格区间）")
+        
+        while True:
+            choice = input("请选择 (1-2，直接回车使用等差网格): ").strip()
+            if choice in ('', '1'):
+                return GRID_ARITHMETIC
+            if choice == '2':
+                return GRID_GEOMETRIC
+            print("❌ 无效的选择，请重新输入")
+    
     def get_leverage(self) -> int:
         """获取杠杆倍数"""
         print("\n请设置杠杆倍数:")
@@ -145,6 +159,7 @@ class InteractiveSetup:
         print(f"交易对: {config['symbol']}")
         print(f"网格区间: {config['lower_price']} - {config['upper_price']}")
         print(f"网格数量: {config['grid_count']}")
+        print(f"网格模式: {GRID_MODES[config['grid_mode']]}")
         print(f"杠杆倍数: {config['leverage']}x")
         print(f"每网格开仓价值: {config['order_value']} USDT")
         print("="*60)
@@ -174,6 +189,7 @@ class InteractiveSetup:
         symbol = self.get_symbol()
         lower_price, upper_price = self.get_grid_range()
         grid_count = self.get_grid_count()
+        grid_mode = self.get_grid_mode()
         leverage = self.get_leverage()
         order_value = self.get_order_value()
         
@@ -182,6 +198,7 @@ class InteractiveSetup:
             'lower_price': lower_price,
             'upper_price': upper_price,
             'grid_count': grid_count,
+            'grid_mode': grid_mode,
             'leverage': leverage,
             'order_value': order_value
         }
@@ -1,34 +1,56 @@
 """
 Lighter 交易所 API 封装
 注意：需要根据 Lighter 交易所的实际 API 文档进行调整
+
+核心实现为基于 asyncio/aiohttp 的 AsyncLighterAPI，
+LighterAPI 是在后台事件循环线程上运行的同步薄封装，供 main.py 和 gui.py 使用。
+MarketStream 通过 WebSocket 订阅行情和订单成交推送。
 """
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import asyncio
+import concurrent.futures
+import threading
+import aiohttp
+import json
+import random
 import time
 import hmac
 import hashlib
 import logging
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from decimal import Decimal
+from rate_limiter import RateLimiter, ORDERS, CANCELS, READS
+from retry_policy import RetryPolicy, RetryBudget, build_retry_policies
 
 
-class LighterAPI:
-    """Lighter 交易所 API 封装类"""
+class AsyncLighterAPI:
+    """Lighter 交易所异步 API 封装类"""
     
     def __init__(self, api_key: str, api_secret: str, base_url: str = "https://api.lighter.xyz",
-                 timeout: int = 30, max_retries: int = 3, retry_backoff: float = 0.5):
+                 timeout: int = 30, max_retries: int = 3, retry_backoff: float = 0.5,
+                 pool_size: int = 20, rate_limits: Optional[Dict[str, Dict]] = None,
+                 batch_size: int = 20, max_concurrency: int = 10, deadline: float = 60.0,
+                 retry_policies: Optional[Dict[str, Dict]] = None, retry_budget_ratio: float = 0.2,
+                 shared_rate_state: Optional[Dict] = None):
         """
-        初始化 API 客户端
+        初始化异步 API 客户端
         
         Args:
             api_key: API 密钥
             api_secret: API 密钥
             base_url: API 基础 URL（需要根据实际 API 地址调整）
-            timeout: 请求超时时间（秒）
+            timeout: 单次请求超时时间（秒）
             max_retries: 最大重试次数
-            retry_backoff: 重试退避系数（指数退避）
+            retry_backoff: 重试退避系数（带随机抖动的指数退避）
+            pool_size: 连接池大小（同时打开的最大连接数）
+            rate_limits: 各接口类别（orders / cancels / reads）的限流参数
+            batch_size: 批量下单/撤单时每个请求包含的订单数
+            max_concurrency: 批量操作时同时进行中的请求数上限
+            deadline: 单次 API 调用（含排队和重试）的总截止时间（秒）
+            retry_policies: 按类别覆盖的重试策略参数，如 {'orders': {'max_retries': 1}}
+            retry_budget_ratio: 共享重试预算中允许的重试/请求比例
+            shared_rate_state: 多进程共用的限流状态（rate_limiter.create_shared_state），
+                               设置后所有进程从同一组令牌桶中取令牌
         """
         self.api_key = api_key
         self.api_secret = api_secret
@@ -36,32 +58,59 @@ class LighterAPI:
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_backoff = retry_backoff
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
         
-        # 创建带重试机制的 Session
-        self.session = requests.Session()
+        # 交易所是否支持批量接口（None 表示尚未探测）
+        self.batch_supported: Optional[bool] = None
         
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=max_retries,
-            backoff_factor=retry_backoff,
-            status_forcelist=[429, 500, 502, 503, 504],  # 需要重试的 HTTP 状态码
-            allowed_methods=["GET", "POST"],  # 允许重试的 HTTP 方法
-            raise_on_status=False
-        )
+        # 客户端订单 ID -> 交易所订单 ID
+        self.client_order_map: Dict[str, str] = {}
         
-        # 配置 HTTP 适配器
-        adapter = HTTPAdapter(
-            max_retries=retry_strategy,
-            pool_connections=10,  # 连接池大小
-            pool_maxsize=20
-        )
+        # 交易对 -> 价格/数量精度（交易对参数不会变化，只查询一次）
+        self.market_info_cache: Dict[str, Dict] = {}
+        
+        # 客户端限流器（按接口类别）
+        self.rate_limiter = RateLimiter(rate_limits, shared_rate_state)
         
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # 按接口类别的重试策略，以及整个客户端共享的重试预算
+        self.retry_policies = build_retry_policies(max_retries, retry_backoff, deadline, retry_policies)
+        self.retry_budget = RetryBudget(retry_budget_ratio)
+        self.latency_stats: Dict[str, Dict] = {}
+        
+        # Session 必须在事件循环中创建，首次请求时延迟初始化
+        self._session: Optional[aiohttp.ClientSession] = None
         
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取（必要时创建）复用连接池的 Session"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'Content-Type': 'application/json',
+                    'X-API-KEY': self.api_key,
+                    'User-Agent': 'LighterGridTrading/1.0'
+                }
+            )
+        return self._session
+    
+    async def close(self):
+        """关闭 Session 及其连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "AsyncLighterAPI":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
     def _generate_signature(self, params: Dict) -> str:
         """
         生成签名（需要根据 Lighter 的实际签名算法调整）
@@ -82,30 +131,33 @@ class LighterAPI:
         ).hexdigest()
         return signature
     
-    def _request(self, method: str, endpoint: str, params: Optional[Dict] = None, 
-                 signed: bool = False, retry_count: int = 0) -> Dict:
+    def get_rate_limit_stats(self) -> Dict[str, Dict]:
+        """获取各接口类别的当前限流速率和排队深度"""
+        return self.rate_limiter.stats()
+    
+    async def _request(self, method: str, endpoint: str, params: Optional[Dict] = None, 
+                       signed: bool = False, rate_class: str = READS, idempotent: bool = False) -> Any:
         """
-        发送 API 请求（带重试机制）
+        发送 API 请求（带限流和重试机制）
+        
+        整个调用（限流排队、每次尝试、退避等待）受 rate_class 对应重试策略的
+        总截止时间约束，超过截止时间不再重试。
         
         Args:
             method: HTTP 方法
             endpoint: API 端点
             params: 请求参数
             signed: 是否需要签名
-            retry_count: 当前重试次数（内部使用）
+            rate_class: 限流类别（orders / cancels / reads），同时决定重试策略
+            idempotent: 请求是否幂等（如携带客户端订单 ID 的下单），幂等请求超时后也可重试
             
         Returns:
             API 响应
             
         Raises:
-            requests.exceptions.RequestException: 请求失败异常
+            aiohttp.ClientError: 请求失败异常
         """
         url = f"{self.base_url}{endpoint}"
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-KEY': self.api_key,
-            'User-Agent': 'LighterGridTrading/1.0'
-        }
         
         if params is None:
             params = {}
@@ -114,94 +166,129 @@ class LighterAPI:
             params['timestamp'] = int(time.time() * 1000)
             params['signature'] = self._generate_signature(params)
         
-        last_exception = None
+        method = method.upper()
+        if method not in ('GET', 'POST'):
+            raise ValueError(f"不支持的 HTTP 方法: {method}")
         
-        # 手动重试逻辑（配合 urllib3 的自动重试）
-        for attempt in range(self.max_retries + 1):
-            try:
-                if method.upper() == 'GET':
-                    response = self.session.get(
-                        url, 
-                        params=params, 
-                        headers=headers,
-                        timeout=self.timeout
-                    )
-                elif method.upper() == 'POST':
-                    response = self.session.post(
-                        url, 
-                        json=params, 
-                        headers=headers,
-                        timeout=self.timeout
-                    )
-                else:
-                    raise ValueError(f"不支持的 HTTP 方法: {method}")
+        policy = self.retry_policies[rate_class]
+        if idempotent:
+            policy = policy.as_idempotent()
+        session = await self._get_session()
+        started = time.monotonic()
+        deadline = started + policy.deadline
+        attempts = policy.max_retries + 1
+        
+        try:
+            for attempt in range(attempts):
+                self.retry_budget.on_request()
+                result, last_exception, retryable, wait_time = await self._attempt(
+                    session, method, url, endpoint, params, rate_class, policy, deadline
+                )
+                if last_exception is None:
+                    return result
                 
-                # 检查响应状态
-                response.raise_for_status()
-                return response.json()
+                remaining = deadline - time.monotonic()
+                if not retryable or attempt + 1 >= attempts:
+                    break
+                if wait_time is None:
+                    wait_time = policy.backoff(attempt)
+                if remaining <= wait_time:
+                    self.logger.warning("请求已接近截止时间，不再重试: %s %s", method, endpoint)
+                    break
+                if not self.retry_budget.try_spend():
+                    self.logger.warning("重试预算已耗尽，不再重试: %s %s", method, endpoint)
+                    break
                 
-            except requests.exceptions.Timeout as e:
-                last_exception = e
-                wait_time = self.retry_backoff * (2 ** attempt)
-                self.logger.warning(
-                    f"请求超时 (尝试 {attempt + 1}/{self.max_retries + 1}): {e}. "
-                    f"{wait_time:.1f}秒后重试..."
-                )
-                if attempt < self.max_retries:
-                    time.sleep(wait_time)
-                else:
-                    self.logger.error(f"请求超时，已达到最大重试次数")
-                    raise
-                    
-            except requests.exceptions.ConnectionError as e:
-                last_exception = e
-                wait_time = self.retry_backoff * (2 ** attempt)
                 self.logger.warning(
-                    f"连接错误 (尝试 {attempt + 1}/{self.max_retries + 1}): {e}. "
-                    f"{wait_time:.1f}秒后重试..."
+                    "请求失败 (尝试 %s/%s): %s. "
+                    "%.1f秒后重试...",
+                    attempt + 1, attempts, last_exception, wait_time
                 )
-                if attempt < self.max_retries:
-                    time.sleep(wait_time)
-                else:
-                    self.logger.error(f"连接错误，已达到最大重试次数")
-                    raise
-                    
-            except requests.exceptions.HTTPError as e:
-                # 某些 HTTP 错误不应该重试（如 400, 401, 403）
-                if e.response.status_code in [400, 401, 403, 404]:
-                    self.logger.error(f"HTTP 错误（不重试）: {e.response.status_code} - {e}")
-                    raise
-                else:
-                    last_exception = e
-                    wait_time = self.retry_backoff * (2 ** attempt)
-                    self.logger.warning(
-                        f"HTTP 错误 (尝试 {attempt + 1}/{self.max_retries + 1}): "
-                        f"{e.response.status_code} - {e}. {wait_time:.1f}秒后重试..."
-                    )
-                    if attempt < self.max_retries:
-                        time.sleep(wait_time)
-                    else:
-                        self.logger.error(f"HTTP 错误，已达到最大重试次数")
-                        raise
-                        
-            except requests.exceptions.RequestException as e:
-                last_exception = e
-                wait_time = self.retry_backoff * (2 ** attempt)
-                self.logger.warning(
-                    f"请求异常 (尝试 {attempt + 1}/{self.max_retries + 1}): {e}. "
-                    f"{wait_time:.1f}秒后重试..."
-                )
-                if attempt < self.max_retries:
-                    time.sleep(wait_time)
-                else:
-                    self.logger.error(f"请求异常，已达到最大重试次数")
-                    raise
-        
-        # 如果所有重试都失败
-        if last_exception:
+                await asyncio.sleep(wait_time)
+            
+            self.logger.error("请求失败: %s %s: %s", method, endpoint, last_exception)
             raise last_exception
+        finally:
+            self._record_latency(rate_class, time.monotonic() - started)
     
-    def get_ticker(self, symbol: str) -> Dict:
+    async def _attempt(self, session: aiohttp.ClientSession, method: str, url: str, endpoint: str,
+                       params: Dict, rate_class: str, policy: RetryPolicy, deadline: float):
+        """
+        执行一次请求尝试
+        
+        Returns:
+            (响应结果, 异常, 是否可重试, 建议的等待时间)；成功时异常为 None，
+            建议的等待时间为 None 时按重试策略退避
+        """
+        remaining = deadline - time.monotonic()
+        try:
+            await asyncio.wait_for(self.rate_limiter.acquire(rate_class), remaining)
+        except asyncio.TimeoutError:
+            return None, aiohttp.ServerTimeoutError(f"限流排队超过截止时间: {method} {endpoint}"), False, None
+        
+        # 单次尝试的超时不超过剩余的截止时间
+        timeout = aiohttp.ClientTimeout(total=max(0.001, min(self.timeout, deadline - time.monotonic())))
+        try:
+            if method == 'GET':
+                request = session.get(url, params=params, timeout=timeout)
+            else:
+                request = session.post(url, json=params, timeout=timeout)
+            
+            async with request as response:
+                self.rate_limiter.observe(rate_class, response.status, response.headers)
+                # 检查响应状态
+                response.raise_for_status()
+                return await response.json(content_type=None), None, False, None
+            
+        except asyncio.TimeoutError as e:
+            error = aiohttp.ServerTimeoutError(f"请求超时: {method} {endpoint}")
+            error.__cause__ = e
+            return None, error, policy.retry_ambiguous, None
+            
+        except aiohttp.ClientConnectorError as e:
+            # 连接未建立，请求一定没有到达交易所，可以安全重试
+            return None, e, True, None
+            
+        except aiohttp.ClientResponseError as e:
+            if e.status not in policy.retry_statuses:
+                self.logger.error("HTTP 错误（不重试）: %s - %s", e.status, e.message)
+                return None, e, False, None
+            if e.status == 429:
+                # 限流器已按 Retry-After 暂停发放令牌，无需额外退避
+                return None, e, True, 0.0
+            return None, e, True, None
+            
+        except aiohttp.ClientError as e:
+            # 连接中断等情况下请求可能已被处理
+            return None, e, policy.retry_ambiguous, None
+    
+    def _record_latency(self, rate_class: str, elapsed: float):
+        """记录调用耗时"""
+        stats = self.latency_stats.setdefault(rate_class, {'count': 0, 'max': 0.0, 'total': 0.0})
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+    
+    def get_retry_stats(self) -> Dict:
+        """
+        获取重试统计
+        
+        Returns:
+            重试预算使用情况，以及各类别的耗时上限（deadline）、
+            实际最大耗时和平均耗时
+        """
+        latency = {}
+        for name, policy in self.retry_policies.items():
+            stats = self.latency_stats.get(name, {'count': 0, 'max': 0.0, 'total': 0.0})
+            latency[name] = {
+                'deadline': policy.deadline,
+                'max': round(stats['max'], 3),
+                'avg': round(stats['total'] / stats['count'], 3) if stats['count'] else 0.0,
+                'count': stats['count']
+            }
+        return {'budget': self.retry_budget.stats(), 'latency': latency}
+    
+    async def get_ticker(self, symbol: str) -> Dict:
         """
         获取交易对价格信息
         
@@ -214,9 +301,9 @@ class LighterAPI:
         # 需要根据实际 API 调整
         endpoint = f"/api/v1/ticker"
         params = {'symbol': symbol}
-        return self._request('GET', endpoint, params)
+        return await self._request('GET', endpoint, params)
     
-    def get_current_price(self, symbol: str) -> float:
+    async def get_current_price(self, symbol: str) -> float:
         """
         获取当前价格
         
@@ -226,27 +313,57 @@ class LighterAPI:
         Returns:
             当前价格
         """
-        ticker = self.get_ticker(symbol)
+        ticker = await self.get_ticker(symbol)
         # 需要根据实际 API 响应结构调整
         return float(ticker.get('price', 0))
     
-    def place_order(self, symbol: str, side: str, price: float, 
-                   quantity: float, leverage: int = 1) -> Dict:
+    async def get_market_info(self, symbol: str) -> Dict:
+        """
+        获取交易对的价格精度（tick_size）和数量精度（lot_size），结果缓存
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            交易对信息
+        """
+        if symbol not in self.market_info_cache:
+            # 需要根据实际 API 调整
+            endpoint = "/api/v1/market"
+            params = {'symbol': symbol}
+            self.market_info_cache[symbol] = await self._request('GET', endpoint, params)
+        return self.market_info_cache[symbol]
+    
+    async def place_order(self, symbol: str, side: str, price: float, 
+                          quantity: float, leverage: int = 1,
+                          client_order_id: Optional[str] = None) -> Dict:
         """
         下单
         
         Args:
             symbol: 交易对符号
             side: 买卖方向 ('buy' 或 'sell')
-            price: 价格
-            quantity: 数量
+            price: 价格（Decimal 按原有精度转为字符串）
+            quantity: 数量（Decimal 按原有精度转为字符串）
             leverage: 杠杆倍数
+            client_order_id: 客户端订单 ID，提供时交易所据此去重，超时后可以安全重试
             
         Returns:
             订单信息
         """
         # 需要根据实际 API 调整
         endpoint = "/api/v1/order"
+        params = self._order_params(symbol, side, price, quantity, leverage, client_order_id)
+        result = await self._request('POST', endpoint, params, signed=True, rate_class=ORDERS,
+                                     idempotent=client_order_id is not None)
+        self._remember_client_order(client_order_id, result)
+        return result
+    
+    @staticmethod
+    def _order_params(symbol: str, side: str, price: float, 
+                      quantity: float, leverage: int = 1,
+                      client_order_id: Optional[str] = None) -> Dict:
+        """构造单个限价单的请求参数"""
         params = {
             'symbol': symbol,
             'side': side,
@@ -255,9 +372,145 @@ class LighterAPI:
             'leverage': leverage,
             'type': 'limit'  # 限价单
         }
-        return self._request('POST', endpoint, params, signed=True)
+        if client_order_id is not None:
+            params['client_order_id'] = client_order_id
+        return params
     
-    def cancel_order(self, order_id: str) -> Dict:
+    def _remember_client_order(self, client_order_id: Optional[str], result: Optional[Dict]):
+        """记录客户端订单 ID 与交易所订单 ID 的对应关系"""
+        if client_order_id and result and result.get('order_id'):
+            self.client_order_map[client_order_id] = result['order_id']
+    
+    def match_client_orders(self, open_orders: List[Dict]) -> List[str]:
+        """
+        用一次 get_open_orders 的结果校准客户端订单 ID 映射并找出重复订单
+        
+        下单响应丢失（如超时）但订单实际已挂出时，从挂单中补全映射；
+        同一客户端订单 ID 出现多笔挂单时，保留已记录的那笔，其余视为重复。
+        
+        Args:
+            open_orders: get_open_orders 返回的挂单列表
+            
+        Returns:
+            需要撤销的重复订单的交易所订单 ID 列表
+        """
+        by_client_id: Dict[str, List[str]] = {}
+        for order in open_orders:
+            client_order_id = order.get('client_order_id')
+            if client_order_id and order.get('order_id'):
+                by_client_id.setdefault(client_order_id, []).append(order['order_id'])
+        
+        duplicates = []
+        for client_order_id, order_ids in by_client_id.items():
+            keep = self.client_order_map.get(client_order_id)
+            if keep not in order_ids:
+                keep = order_ids[0]
+                self.client_order_map[client_order_id] = keep
+            duplicates.extend(order_id for order_id in order_ids if order_id != keep)
+        return duplicates
+    
+    async def _run_batched(self, items: List, batch_call, single_call) -> List[Dict]:
+        """
+        分块执行批量操作，交易所不支持批量接口时自动回退为并发单笔请求
+        
+        Args:
+            items: 待处理的订单参数或订单 ID
+            batch_call: 处理一个分块的协程函数，返回与分块等长的结果列表
+            single_call: 处理单个元素的协程函数
+            
+        Returns:
+            与输入顺序一致的结果列表，失败项为 {'error': 错误信息}
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run_single(index: int):
+            async with semaphore:
+                try:
+                    results[index] = await single_call(items[index])
+                except Exception as e:
+                    results[index] = {'error': str(e)}
+        
+        async def run_chunk(start: int):
+            chunk = items[start:start + self.batch_size]
+            if self.batch_supported is not False:
+                async with semaphore:
+                    try:
+                        chunk_results = await batch_call(chunk)
+                        self.batch_supported = True
+                        for offset in range(len(chunk)):
+                            result = chunk_results[offset] if offset < len(chunk_results) else None
+                            results[start + offset] = result or {'error': '批量响应缺少该订单结果'}
+                        return
+                    except aiohttp.ClientResponseError as e:
+                        if e.status not in (404, 405, 501):
+                            for offset in range(len(chunk)):
+                                results[start + offset] = {'error': str(e)}
+                            return
+                        if self.batch_supported is not False:
+                            self.logger.info("交易所不支持批量接口 (%s)，回退为并发单笔请求", e.status)
+                        self.batch_supported = False
+                    except Exception as e:
+                        for offset in range(len(chunk)):
+                            results[start + offset] = {'error': str(e)}
+                        return
+            await asyncio.gather(*(run_single(start + offset) for offset in range(len(chunk))))
+        
+        starts = list(range(0, len(items), self.batch_size))
+        if self.batch_supported is None and starts:
+            # 先用第一个分块探测交易所是否支持批量接口
+            await run_chunk(starts.pop(0))
+        await asyncio.gather(*(run_chunk(start) for start in starts))
+        return results
+    
+    async def place_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        批量下单
+        
+        Args:
+            orders: 订单列表，每项包含 symbol、side、price、quantity、leverage，
+                    以及可选的 client_order_id
+            
+        Returns:
+            与输入顺序一致的订单信息列表，失败项为 {'error': 错误信息}
+        """
+        async def batch_call(chunk: List[Dict]) -> List[Dict]:
+            # 需要根据实际 API 调整
+            endpoint = "/api/v1/orders/batch"
+            params = {'orders': [self._order_params(**order) for order in chunk]}
+            idempotent = all(order.get('client_order_id') for order in chunk)
+            response = await self._request('POST', endpoint, params, signed=True, rate_class=ORDERS,
+                                           idempotent=idempotent)
+            results = response.get('orders', [])
+            for order, result in zip(chunk, results):
+                self._remember_client_order(order.get('client_order_id'), result)
+            return results
+        
+        async def single_call(order: Dict) -> Dict:
+            return await self.place_order(**order)
+        
+        return await self._run_batched(orders, batch_call, single_call)
+    
+    async def cancel_orders(self, order_ids: List[str]) -> List[Dict]:
+        """
+        批量撤单
+        
+        Args:
+            order_ids: 订单 ID 列表
+            
+        Returns:
+            与输入顺序一致的撤单结果列表，失败项为 {'error': 错误信息}
+        """
+        async def batch_call(chunk: List[str]) -> List[Dict]:
+            # 需要根据实际 API 调整
+            endpoint = "/api/v1/orders/cancel-batch"
+            params = {'order_ids': list(chunk)}
+            response = await self._request('POST', endpoint, params, signed=True, rate_class=CANCELS)
+            return response.get('results', [])
+        
+        return await self._run_batched(order_ids, batch_call, self.cancel_order)
+    
+    async def cancel_order(self, order_id: str) -> Dict:
         """
         取消订单
         
@@ -268,9 +521,9 @@ class LighterAPI:
             取消结果
         """
         endpoint = f"/api/v1/order/{order_id}"
-        return self._request('POST', endpoint, signed=True)
+        return await self._request('POST', endpoint, signed=True, rate_class=CANCELS)
     
-    def get_open_orders(self, symbol: str) -> List[Dict]:
+    async def get_open_orders(self, symbol: str) -> List[Dict]:
         """
         获取未成交订单列表
         
@@ -282,9 +535,9 @@ class LighterAPI:
         """
         endpoint = "/api/v1/orders"
         params = {'symbol': symbol, 'status': 'open'}
-        return self._request('GET', endpoint, params, signed=True)
+        return await self._request('GET', endpoint, params, signed=True)
     
-    def cancel_all_orders(self, symbol: str) -> Dict:
+    async def cancel_all_orders(self, symbol: str) -> Dict:
         """
         取消所有订单
         
@@ -296,9 +549,9 @@ class LighterAPI:
         """
         endpoint = f"/api/v1/orders/cancel-all"
         params = {'symbol': symbol}
-        return self._request('POST', endpoint, params, signed=True)
+        return await self._request('POST', endpoint, params, signed=True, rate_class=CANCELS)
     
-    def get_balance(self) -> Dict:
+    async def get_balance(self) -> Dict:
         """
         获取账户余额
         
@@ -306,5 +559,290 @@ class LighterAPI:
             余额信息
         """
         endpoint = "/api/v1/account/balance"
-        return self._request('GET', endpoint, signed=True)
+        return await self._request('GET', endpoint, signed=True)
+
+
+class MarketStream:
+    """
+    行情与订单推送订阅（WebSocket）
+    
+    推送 ticker 和订单状态事件给回调；断线后按指数退避自动重连，
+    每次（重新）连接后调用 on_resync，由调用方用一次 get_open_orders 补齐断线期间错过的订单变化。
+    """
+    
+    def __init__(self, api: AsyncLighterAPI, url: str, symbol: str,
+                 on_ticker: Optional[Callable] = None, on_order: Optional[Callable] = None,
+                 on_resync: Optional[Callable] = None, heartbeat: float = 15.0,
+                 reconnect_backoff: float = 1.0, max_reconnect_backoff: float = 30.0):
+        """
+        初始化推送订阅
+        
+        Args:
+            api: 异步 API 客户端（复用其 Session 和签名）
+            url: WebSocket 地址（需要根据实际 API 地址调整）
+            symbol: 交易对符号
+            on_ticker: 收到行情推送时的回调，参数为推送消息（可以是协程函数）
+            on_order: 收到订单状态推送时的回调，参数为推送消息（可以是协程函数）
+            on_resync: （重新）连接后的回调（无参数），用于通过 get_open_orders 补齐状态
+            heartbeat: WebSocket 心跳间隔（秒）
+            reconnect_backoff: 重连退避基数（秒）
+            max_reconnect_backoff: 重连退避上限（秒）
+        """
+        self.api = api
+        self.url = url
+        self.symbol = symbol
+        self.on_ticker = on_ticker
+        self.on_order = on_order
+        self.on_resync = on_resync
+        self.heartbeat = heartbeat
+        self.reconnect_backoff = reconnect_backoff
+        self.max_reconnect_backoff = max_reconnect_backoff
+        
+        self.connected = False
+        self.reconnects = 0
+        self.messages = 0
+        self.last_message_at: Optional[float] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._stopped = False
+        self._stop_event: Optional[asyncio.Event] = None
+        self.logger = logging.getLogger(__name__)
+    
+    def _subscribe_message(self) -> Dict:
+        """构造订阅消息（需要根据实际 API 调整）"""
+        params = {
+            'symbol': self.symbol,
+            'timestamp': int(time.time() * 1000)
+        }
+        return {
+            'op': 'subscribe',
+            'channels': [f"ticker:{self.symbol}", f"orders:{self.symbol}"],
+            'api_key': self.api.api_key,
+            'timestamp': params['timestamp'],
+            'signature': self.api._generate_signature(params)
+        }
+    
+    @staticmethod
+    async def _call(callback: Optional[Callable], *args):
+        """调用回调，兼容普通函数和协程函数"""
+        if callback is None:
+            return
+        result = callback(*args)
+        if asyncio.iscoroutine(result):
+            await result
+    
+    async def _dispatch(self, message: Dict):
+        """按消息类型分发推送"""
+        self.messages += 1
+        self.last_message_at = time.time()
+        # 需要根据实际推送格式调整
+        msg_type = message.get('type')
+        if msg_type == 'ticker':
+            await self._call(self.on_ticker, message)
+        elif msg_type == 'order':
+            await self._call(self.on_order, message)
+    
+    async def run(self):
+        """连接并持续接收推送，直到调用 stop()"""
+        self._stop_event = asyncio.Event()
+        attempt = 0
+        while not self._stopped:
+            try:
+                session = await self.api._get_session()
+                async with session.ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+                    self._ws = ws
+                    await ws.send_json(self._subscribe_message())
+                    self.connected = True
+                    attempt = 0
+                    self.logger.info("✅ 推送已连接: %s", self.url)
+                    await self._call(self.on_resync)
+                    
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            await self._dispatch(json.loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("⚠️  推送连接异常: %s", e)
+            finally:
+                self.connected = False
+                self._ws = None
+            
+            if self._stopped:
+                break
+            
+            self.reconnects += 1
+            wait_time = random.uniform(0.5, 1.0) * min(
+                self.max_reconnect_backoff, self.reconnect_backoff * (2 ** attempt)
+            )
+            attempt += 1
+            self.logger.warning("推送连接已断开，%.1f秒后重连...", wait_time)
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), wait_time)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def stop(self):
+        """停止订阅并关闭连接"""
+        self._stopped = True
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._ws is not None:
+            await self._ws.close()
+    
+    def stats(self) -> Dict:
+        """连接状态、重连次数和消息计数"""
+        return {
+            'connected': self.connected,
+            'reconnects': self.reconnects,
+            'messages': self.messages,
+            'last_message_at': self.last_message_at
+        }
+
 
+class LighterAPI:
+    """
+    Lighter 交易所 API 同步封装类
+    
+    在独立的后台线程中运行一个事件循环，所有调用转发给 AsyncLighterAPI，
+    因此可以在任意线程（包括 GUI 工作线程）中以阻塞方式调用。
+    """
+    
+    def __init__(self, api_key: str, api_secret: str, base_url: str = "https://api.lighter.xyz",
+                 timeout: int = 30, max_retries: int = 3, retry_backoff: float = 0.5,
+                 pool_size: int = 20, rate_limits: Optional[Dict[str, Dict]] = None,
+                 batch_size: int = 20, max_concurrency: int = 10, deadline: float = 60.0,
+                 retry_policies: Optional[Dict[str, Dict]] = None, retry_budget_ratio: float = 0.2,
+                 shared_rate_state: Optional[Dict] = None):
+        """
+        初始化 API 客户端
+        
+        Args:
+            api_key: API 密钥
+            api_secret: API 密钥
+            base_url: API 基础 URL（需要根据实际 API 地址调整）
+            timeout: 单次请求超时时间（秒）
+            max_retries: 最大重试次数
+            retry_backoff: 重试退避系数（带随机抖动的指数退避）
+            pool_size: 连接池大小（同时打开的最大连接数）
+            rate_limits: 各接口类别（orders / cancels / reads）的限流参数
+            batch_size: 批量下单/撤单时每个请求包含的订单数
+            max_concurrency: 批量操作时同时进行中的请求数上限
+            deadline: 单次 API 调用（含排队和重试）的总截止时间（秒）
+            retry_policies: 按类别覆盖的重试策略参数，如 {'orders': {'max_retries': 1}}
+            retry_budget_ratio: 共享重试预算中允许的重试/请求比例
+            shared_rate_state: 多进程共用的限流状态（rate_limiter.create_shared_state），
+                               设置后所有进程从同一组令牌桶中取令牌
+        """
+        self.async_api = AsyncLighterAPI(
+            api_key=api_key,
+            api_secret=api_secret,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=max_retries,
+            retry_backoff=retry_backoff,
+            pool_size=pool_size,
+            rate_limits=rate_limits,
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+            deadline=deadline,
+            retry_policies=retry_policies,
+            retry_budget_ratio=retry_budget_ratio,
+            shared_rate_state=shared_rate_state
+        )
+        self.logger = self.async_api.logger
+        
+        # 后台事件循环线程
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="LighterAPI-loop",
+            daemon=True
+        )
+        self._loop_thread.start()
+    
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环"""
+        return self._loop
+    
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        在后台事件循环中执行协程并阻塞等待结果
+        
+        Args:
+            coro: 要执行的协程
+            timeout: 最长等待时间（秒），超时后取消协程并抛出 concurrent.futures.TimeoutError
+            
+        Returns:
+            协程的返回值
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+    
+    def close(self):
+        """关闭连接池并停止后台事件循环"""
+        if self._loop.is_closed():
+            return
+        if self._loop.is_running():
+            self.run(self.async_api.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+        self._loop.close()
+    
+    def get_rate_limit_stats(self) -> Dict[str, Dict]:
+        """获取各接口类别的当前限流速率和排队深度"""
+        return self.async_api.get_rate_limit_stats()
+    
+    def get_retry_stats(self) -> Dict:
+        """获取重试预算和各类别的耗时统计"""
+        return self.async_api.get_retry_stats()
+    
+    def get_ticker(self, symbol: str) -> Dict:
+        """获取交易对价格信息"""
+        return self.run(self.async_api.get_ticker(symbol))
+    
+    def get_current_price(self, symbol: str) -> float:
+        """获取当前价格"""
+        return self.run(self.async_api.get_current_price(symbol))
+    
+    def get_market_info(self, symbol: str) -> Dict:
+        """获取交易对的价格精度和数量精度"""
+        return self.run(self.async_api.get_market_info(symbol))
+    
+    def place_order(self, symbol: str, side: str, price: float, 
+                   quantity: float, leverage: int = 1,
+                   client_order_id: Optional[str] = None) -> Dict:
+        """下单"""
+        return self.run(self.async_api.place_order(
+            symbol, side, price, quantity, leverage, client_order_id
+        ))
+    
+    def place_orders(self, orders: List[Dict]) -> List[Dict]:
+        """批量下单"""
+        return self.run(self.async_api.place_orders(orders))
+    
+    def cancel_order(self, order_id: str) -> Dict:
+        """取消订单"""
+        return self.run(self.async_api.cancel_order(order_id))
+    
+    def cancel_orders(self, order_ids: List[str]) -> List[Dict]:
+        """批量撤单"""
+        return self.run(self.async_api.cancel_orders(order_ids))
+    
+    def get_open_orders(self, symbol: str) -> List[Dict]:
+        """获取未成交订单列表"""
+        return self.run(self.async_api.get_open_orders(symbol))
+    
+    def cancel_all_orders(self, symbol: str) -> Dict:
+        """取消所有订单"""
+        return self.run(self.async_api.cancel_all_orders(symbol))
+    
+    def get_balance(self) -> Dict:
+        """获取账户余额"""
+        return self.run(self.async_api.get_balance())
@@ -0,0 +1,174 @@
+"""
+日志配置模块
+所有日志先放入有界内存队列，由后台 QueueListener 线程统一格式化并写入控制台、文件、
+JSON Lines 文件或图形界面：下单和成交处理的线程只做一次入队，不等待磁盘或界面。
+
+日志调用使用 %-格式（logger.info("下单成功: %s", order_id)），参数在后台线程格式化，
+级别被过滤掉的日志不会格式化。队列已满时丢弃新日志并计数，不阻塞调用方。
+
+在程序入口调用一次 setup_logging（main.py、multi_grid_runner.py、grid_supervisor.py、gui.py），
+库模块只通过 logging.getLogger(__name__) 记录日志，不配置处理器
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Dict, Iterable, Optional
+
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 写入 JSON Lines 时忽略的 LogRecord 标准字段，其余字段（如 extra 传入的 grid）原样输出
+_STANDARD_FIELDS = set(logging.makeLogRecord({}).__dict__) | {'message', 'asctime'}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志一行紧凑 JSON（ts, level, logger, msg, 以及 extra 字段）"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if record.processName != 'MainProcess':
+            entry['process'] = record.processName
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    写入有界队列的日志处理器
+    
+    不在调用方线程格式化（同一进程内由 QueueListener 取出后再格式化），队列满时丢弃日志并计数，
+    队列有空余后补上一条丢弃提示
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 队列只在本进程内使用，记录无需序列化，格式化留给后台线程
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            # 队列回落到一半以下才补丢弃提示，持续过载时累计计数，避免提示本身占满队列
+            if self.dropped and self.queue.qsize() < self.queue.maxsize // 2:
+                with self._lock:
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    self.queue.put_nowait(logging.makeLogRecord({
+                        'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                        'msg': "⚠️  日志队列已满，丢弃了 %d 条日志", 'args': (dropped,)
+                    }))
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+def setup_logging(level='INFO', format: str = DEFAULT_FORMAT, file: Optional[str] = None,
+                  file_max_bytes: int = 10 * 1024 * 1024, file_backups: int = 3,
+                  json_file: Optional[str] = None, queue_size: int = 10000, console: bool = True,
+                  levels: Optional[Dict[str, str]] = None, file_suffix: Optional[str] = None,
+                  handlers: Iterable[logging.Handler] = ()) -> logging.handlers.QueueListener:
+    """
+    配置根日志记录器：只保留一个写入有界队列的处理器，由后台线程写出
+    
+    重复调用时替换之前的配置（多进程运行时工作进程启动后重新调用，使用自己的后台线程）
+    
+    Args:
+        level: 根日志级别
+        format: 控制台和日志文件的格式
+        file: 日志文件路径（按大小轮转），不设置则不写文件
+        file_max_bytes: 单个日志文件的大小上限
+        file_backups: 保留的轮转文件数
+        json_file: JSON Lines 日志文件路径（按大小轮转，参数同 file），不设置则不写
+        queue_size: 队列容量，队列满时丢弃新日志
+        console: 是否输出到控制台（stderr）
+        levels: 按日志记录器名称单独设置的级别，如 {"lighter_api": "WARNING"}
+        file_suffix: 加在日志文件名（扩展名之前）的后缀，多进程运行时各进程写自己的文件，避免轮转冲突
+        handlers: 额外的处理器（如图形界面的日志窗口），同样在后台线程中调用
+    
+    Returns:
+        已启动的 QueueListener
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+    
+    if file_suffix:
+        file = _with_suffix(file, file_suffix)
+        json_file = _with_suffix(json_file, file_suffix)
+    formatter = logging.Formatter(format)
+    outputs = []
+    if console:
+        outputs.append(logging.StreamHandler())
+    if file:
+        outputs.append(logging.handlers.RotatingFileHandler(
+            file, maxBytes=file_max_bytes, backupCount=file_backups, encoding='utf-8'
+        ))
+    for handler in outputs:
+        handler.setFormatter(formatter)
+    if json_file:
+        handler = logging.handlers.RotatingFileHandler(
+            json_file, maxBytes=file_max_bytes, backupCount=file_backups, encoding='utf-8'
+        )
+        handler.setFormatter(JsonLinesFormatter())
+        outputs.append(handler)
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(formatter)
+        outputs.append(handler)
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    log_queue = queue.Queue(maxsize=queue_size)
+    root.addHandler(BoundedQueueHandler(log_queue))
+    root.setLevel(level)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+    
+    # respect_handler_level: 额外处理器（如界面）可以设置自己的级别
+    _listener = logging.handlers.QueueListener(log_queue, *outputs, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    return _listener
+
+
+def _with_suffix(path: Optional[str], suffix: str) -> Optional[str]:
+    """在文件名的扩展名之前加上后缀"""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{suffix}{ext}"
+
+
+def stop_logging():
+    """写出队列中剩余的日志并停止后台线程（进程退出时自动调用）"""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+
+atexit.register(stop_logging)
@@ -2,23 +2,81 @@
 网格交易策略主程序
 """
 
+import asyncio
+import concurrent.futures
+import contextlib
+import os
 import time
 import sys
+from dataclasses import dataclass, field
+from typing import Dict, List
 from grid_trading_strategy import GridTradingStrategy, GridOrder
-from lighter_api import LighterAPI
+from lighter_api import LighterAPI, MarketStream
+from grid_reconciler import reconcile_orders
+from order_journal import OrderJournal, replay_journal
+from poll_scheduler import AdaptivePollScheduler
+from rate_limiter import READS
 from config import Config
+from logging_setup import setup_logging
 import logging
 
 
+@dataclass
+class ShutdownReport:
+    """停止时撤单的结果"""
+    remaining: List[Dict] = field(default_factory=list)  # 最后一次查询时仍未撤销的挂单（未能查询时为本地记录的挂单）
+    verified: bool = False  # 是否已用 get_open_orders 确认过交易所的挂单
+    rounds: int = 0  # 撤单并查询挂单的轮数
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    
+    @property
+    def clean(self) -> bool:
+        """已确认交易所上没有剩余挂单"""
+        return self.verified and not self.remaining
+    
+    def format(self) -> str:
+        """一行摘要"""
+        if self.clean:
+            return f"已撤销全部挂单（{self.rounds} 轮，{self.elapsed:.1f}s）"
+        orders = ", ".join(
+            f"{o.get('order_id')} {o.get('side', '')} {o.get('quantity', '')}@{o.get('price', '')}"
+            for o in self.remaining
+        )
+        if not self.verified:
+            text = f"未能确认挂单是否已全部撤销（{self.elapsed:.1f}s）: {'; '.join(self.errors[-3:])}"
+            return text + (f"；本地记录的 {len(self.remaining)} 笔挂单可能仍在: {orders}" if self.remaining else "")
+        return f"仍有 {len(self.remaining)} 笔挂单未撤销（{self.rounds} 轮，{self.elapsed:.1f}s）: {orders}"
+
+
 class GridTradingBot:
     """网格交易机器人"""
     
-    def __init__(self):
+    def __init__(self, name=None):
+        """
+        Args:
+            name: 网格名称（多网格运行时用于调度和日志，默认为交易对）
+        """
         self.logger = logging.getLogger(__name__)
+        self.name = name
         self.api = None
+        self.owns_api = True  # 多网格共用 API 时由运行器负责关闭
+        self.scheduler = None  # 多网格共用的请求调度器（FairScheduler）
         self.strategy = None
         self.running = False
-        self.placed_orders = []  # 已下单的订单ID列表
+        self.last_price = None  # 最新推送价格
+        self.poll_scheduler = None  # 自适应轮询间隔（未配置推送时使用）
+        self.journal = None  # 订单日志（进程异常退出后恢复层级状态）
+        self.stream_url = None  # 推送地址，未配置时退回定时轮询
+        self.poll_interval = 60  # 轮询间隔（秒）
+        self.shutdown_deadline = 20.0  # 停止时撤单（含确认）的总时限（秒）
+        self.trading_config = None  # 当前生效的交易配置
+        self.hot_reload = True  # 配置文件中的交易参数变化时自动应用
+        self.config_version = None  # 当前交易配置对应的配置文件版本（Config.file_version）
+        # 热更新替换策略期间，成交推送和挂单校准需要等待（都在事件循环中运行）
+        self.state_lock = asyncio.Lock()
+        self.stream = None
+        self._stream_future = None
     
     def initialize(self):
         """初始化"""
@@ -39,96 +97,728 @@ class GridTradingBot:
         # 获取网络配置（可选）
         network_config = Config.load_config().get('network', {})
         
-        self.api = LighterAPI(
+        self.api = self.create_api(api_creds, network_config)
+        self.configure_network(network_config)
+        self.strategy = self.create_strategy(trading_config)
+        self.open_journal(network_config)
+        self.strategy.print_strategy_info()
+    
+    @staticmethod
+    def create_api(api_creds, network_config, shared_rate_state=None) -> LighterAPI:
+        """
+        按 API 凭证和网络配置创建 API 客户端
+        
+        Args:
+            shared_rate_state: 多进程共用的限流状态（由 grid_supervisor 创建）
+        """
+        return LighterAPI(
             api_key=api_creds['api_key'],
             api_secret=api_creds['api_secret'],
             base_url=api_creds.get('base_url', 'https://api.lighter.xyz'),
             timeout=network_config.get('timeout', 30),
             max_retries=network_config.get('max_retries', 3),
-            retry_backoff=network_config.get('retry_backoff', 0.5)
+            retry_backoff=network_config.get('retry_backoff', 0.5),
+            pool_size=network_config.get('pool_size', 20),
+            rate_limits=network_config.get('rate_limits'),
+            batch_size=network_config.get('batch_size', 20),
+            max_concurrency=network_config.get('order_concurrency', 10),
+            deadline=network_config.get('deadline', 60),
+            retry_policies=network_config.get('retry_policies'),
+            shared_rate_state=shared_rate_state
         )
+    
+    def configure_network(self, network_config):
+        """读取推送地址和轮询间隔"""
+        self.stream_url = network_config.get('stream_url')
+        self.poll_interval = network_config.get('poll_interval', 60)
+        self.shutdown_deadline = network_config.get('shutdown_deadline', 20)
+        self.hot_reload = network_config.get('hot_reload', True)
+        # adaptive_polling 设为 false 时按固定的 poll_interval 轮询
+        adaptive_polling = network_config.get('adaptive_polling', {})
+        if adaptive_polling is not False:
+            self.poll_scheduler = AdaptivePollScheduler.from_config(adaptive_polling)
+    
+    def create_strategy(self, trading_config) -> GridTradingStrategy:
+        """按交易配置和交易对精度创建策略"""
+        # 获取交易对的价格/数量精度（失败时使用默认精度）
+        precision = {}
+        try:
+            market = self.api.get_market_info(trading_config['symbol'])
+            precision = {'tick_size': market['tick_size'], 'lot_size': market['lot_size']}
+        except Exception as e:
+            self.logger.warning("⚠️  获取交易对精度失败，使用默认精度: %s", e)
         
-        # 初始化策略
-        self.strategy = GridTradingStrategy(**trading_config)
-        self.strategy.print_strategy_info()
+        strategy = GridTradingStrategy(**trading_config, **precision)
+        if self.name is None:
+            self.name = strategy.symbol
+        self.trading_config = dict(trading_config)
+        self.config_version = Config.file_version()
+        return strategy
+    
+    def open_journal(self, network_config):
+        """按 network.journal_dir 打开本网格的订单日志（设为 null 时不记录）"""
+        journal_dir = network_config.get('journal_dir', 'journal')
+        if not journal_dir:
+            return
+        tag = ''.join(c for c in self.strategy.symbol if c.isalnum())
+        self.journal = OrderJournal(
+            os.path.join(journal_dir, f"{tag}.jsonl"),
+            snapshot_every=network_config.get('journal_snapshot_every', 1000)
+        )
+    
+    def _journal(self, *records):
+        """写入订单日志，距上次快照的记录数达到阈值时压缩"""
+        if self.journal is None or not records:
+            return
+        try:
+            self.journal.append(*records)
+            if self.journal.snapshot_due:
+                self.journal.write_snapshot(self.strategy.export_state())
+        except OSError as e:
+            self.logger.error("❌ 写入订单日志失败: %s", e)
+    
+    def _compact_journal(self):
+        """把当前层级状态写为快照，替换已有的日志"""
+        if self.journal is None:
+            return
+        try:
+            self.journal.write_snapshot(self.strategy.export_state())
+        except OSError as e:
+            self.logger.error("❌ 写入订单日志失败: %s", e)
+    
+    def _turn(self):
+        """
+        一次 API 操作的请求时隙
+        
+        多网格运行时由共享调度器按网格轮流分配，单独运行时不限制
+        """
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(self.name)
+    
+    @property
+    def placed_orders(self):
+        """当前挂单的交易所订单 ID 列表"""
+        if self.strategy is None:
+            return []
+        return self.strategy.book.live_order_ids()
     
     def place_grid_orders(self):
-        """下单网格订单"""
+        """下单网格订单（同步入口，在 API 的事件循环中执行）"""
+        self.api.run(self.place_grid_orders_async())
+    
+    async def place_grid_orders_async(self):
+        """
+        按当前价格布置网格
+        
+        与交易所现有挂单对账，只撤销不在网格中的挂单、补下缺少的订单，
+        已经正确的挂单保持不动（重启时挂单完好则几乎不产生请求）。
+        有订单日志时先尝试按日志恢复（见 recover_async），恢复成功则不重新生成网格
+        """
+        api = self.api.async_api
         try:
-            # 获取当前价格
-            current_price = self.api.get_current_price(self.strategy.symbol)
-            self.logger.info(f"当前价格: {current_price}")
+            if self.journal is not None and await self.recover_async():
+                return
             
-            # 生成网格订单
-            grid_orders = self.strategy.generate_grid_orders(current_price)
+            # 获取当前价格和当前挂单
+            async with self._turn():
+                current_price = await api.get_current_price(self.strategy.symbol)
+            self.on_price(current_price)
+            self.logger.info("当前价格: %s", current_price)
+            async with self._turn():
+                open_orders = await api.get_open_orders(self.strategy.symbol)
+            await self.deploy_grid_async(current_price, open_orders)
             
-            # 取消之前的订单
-            self.cancel_all_orders()
+        except Exception as e:
+            self.logger.error("❌ 下单过程出错: %s", e)
+            raise
+    
+    async def deploy_grid_async(self, current_price, open_orders):
+        """
+        按价格生成网格，并与给定的挂单列表对账：保留匹配的挂单，撤销多余的，补下缺少的
+        
+        Args:
+            current_price: 当前价格
+            open_orders: get_open_orders 返回的挂单列表
+        """
+        api = self.api.async_api
+        grid_orders = self.strategy.generate_grid_orders(current_price)
+        self._journal({'t': 'grid', 'price': current_price, 'generation': self.strategy.generation})
+        
+        api.match_client_orders(open_orders)
+        plan = reconcile_orders(self.strategy.book, open_orders)
+        self.logger.info(
+            "对账结果: 保留 %s 笔, 撤销 %s 笔, 新下 %s 笔",
+            len(plan.keep), len(plan.cancel), len(plan.place)
+        )
+        
+        # 先撤销多余的挂单，释放保证金
+        if plan.cancel:
+            self._journal({'t': 'cancel', 'order_ids': plan.cancel})
+            async with self._turn():
+                results = await api.cancel_orders(plan.cancel)
+            failed = [r for r in results if r.get('error')]
+            if failed:
+                self.logger.warning("⚠️  %s 笔挂单撤销失败: %s", len(failed), failed[0]['error'])
+        
+        acks = []
+        for order, open_order in plan.keep:
+            acks.append({
+                't': 'ack', 'level': order.grid_level, 'cid': order.client_order_id,
+                'order_id': open_order['order_id'], 'ecid': open_order.get('client_order_id')
+            })
+            self.strategy.on_order_placed(order, open_order['order_id'], open_order.get('client_order_id'))
+        self._journal(*acks)
+        
+        placed_count = await self.place_orders_async(plan.place) if plan.place else 0
+        self.logger.info(
+            "✅ 网格就绪: %s/%s 个订单"
+            "（新下 %s/%s）",
+            len(plan.keep) + placed_count, len(grid_orders), placed_count, len(plan.place)
+        )
+    
+    def config_changed(self) -> bool:
+        """配置文件在当前交易配置生效后被修改过（关闭热更新时总是 False）"""
+        return bool(self.hot_reload) and self.strategy is not None and Config.file_version() != self.config_version
+    
+    async def check_config_async(self):
+        """配置文件变化后读取本网格（交易对相同）的交易配置，参数有变化时热更新"""
+        if not self.config_changed():
+            return
+        self.config_version = Config.file_version()
+        try:
+            trading_configs = Config.get_trading_configs()
+        except (OSError, ValueError) as e:
+            self.logger.warning("⚠️  配置文件无法读取，继续使用当前参数: %s", e)
+            return
+        symbol = self.strategy.symbol
+        trading_config = next((c for c in trading_configs if c.get('symbol') == symbol), None)
+        if trading_config is None:
+            self.logger.warning("⚠️  配置中已没有 %s 的网格（增删网格或修改交易对需要重启后生效）", symbol)
+            return
+        if trading_config == self.trading_config:
+            return
+        try:
+            await self.apply_trading_config_async(trading_config)
+        except Exception as e:
+            self.logger.error("❌ 应用新的交易配置时出错: %s", e)
+    
+    async def apply_trading_config_async(self, trading_config) -> bool:
+        """
+        运行中应用新的交易参数，不撤销全部挂单
+        
+        用新参数创建策略（沿用交易对精度、持仓统计和生成代数），再与一次 get_open_orders 的结果对账：
+        新网格中价格、方向和数量都不变的挂单保留，其余撤销，缺少的补下。
+        上次查询之后已成交的订单先按旧网格记账
+        
+        Args:
+            trading_config: 新的交易配置（交易对与当前相同）
+        
+        Returns:
+            是否已应用（参数无效时返回 False，继续使用当前参数）
+        """
+        old = self.strategy
+        try:
+            strategy = GridTradingStrategy(**trading_config, tick_size=old.tick_size, lot_size=old.lot_size)
+        except (TypeError, ValueError) as e:
+            self.logger.error("❌ 新的交易配置无效，继续使用当前参数: %s", e)
+            return False
+        changes = ", ".join(
+            f"{key} {self.trading_config.get(key)} -> {trading_config.get(key)}"
+            for key in sorted(set(self.trading_config) | set(trading_config))
+            if self.trading_config.get(key) != trading_config.get(key)
+        )
+        self.logger.info("交易配置已修改，正在应用: %s", changes)
+        
+        api = self.api.async_api
+        async with self.state_lock:
+            async with self._turn():
+                current_price, open_orders = await asyncio.gather(
+                    api.get_current_price(old.symbol),
+                    api.get_open_orders(old.symbol)
+                )
+            self.on_price(current_price)
+            filled = set(old.book.live_order_ids()) - {o.get('order_id') for o in open_orders}
+            self._journal(*({'t': 'fill', 'order_id': order_id} for order_id in filled))
+            for order_id in filled:
+                # 只记账，反向订单由新网格的对账决定
+                old.on_fill(order_id)
             
-            # 下单
-            placed_count = 0
-            for order in grid_orders:
-                try:
-                    result = self.api.place_order(
-                        symbol=self.strategy.symbol,
-                        side=order.side,
-                        price=float(order.price),
-                        quantity=float(order.quantity),
-                        leverage=self.strategy.leverage
-                    )
-                    
-                    if result.get('order_id'):
-                        self.placed_orders.append(result['order_id'])
-                        placed_count += 1
-                        self.logger.info(
-                            f"✅ 下单成功: {order.side} {order.quantity} @ {order.price} "
-                            f"(订单ID: {result['order_id']})"
-                        )
-                    else:
-                        self.logger.warning(f"⚠️  下单失败: {order.side} @ {order.price}")
-                    
-                    # 避免请求过快
-                    time.sleep(0.1)
-                    
-                except Exception as e:
-                    self.logger.error(f"❌ 下单异常: {e}")
-                    # 网络错误时等待更长时间
-                    if "timeout" in str(e).lower() or "connection" in str(e).lower():
-                        self.logger.info("网络不稳定，等待5秒后继续...")
-                        time.sleep(5)
-                    continue
+            strategy.tracker = old.tracker
+            strategy.generation = old.generation
+            self.strategy = strategy
+            self.trading_config = dict(trading_config)
+            # 旧日志中的层级状态与新参数不兼容，先写入新策略的快照（持仓统计随之保留）
+            self._compact_journal()
+            await self.deploy_grid_async(current_price, open_orders)
+        self.logger.info("✅ 已应用新的交易配置")
+        return True
+    
+    async def recover_async(self) -> bool:
+        """
+        按订单日志恢复层级状态，并用一次 get_open_orders 与交易所对账
+        
+        日志中已确认且仍在挂单列表中的订单保持不动；已确认但不在挂单列表中的视为停机期间成交，
+        补挂反向订单；只有下单意图的订单，交易所已有相同客户端订单 ID 的挂单时直接确认，
+        否则以原客户端订单 ID 重新下单；不属于网格的挂单撤销
+        
+        Returns:
+            是否已恢复（没有日志、日志中没有挂单或网格参数已变化时返回 False，由调用方重新布置网格）
+        """
+        try:
+            state, records = self.journal.load()
+            replay_journal(self.strategy, state, records)
+        except (ValueError, KeyError, TypeError) as e:
+            self.logger.warning("⚠️  订单日志无法使用，重新布置网格: %s", e)
+            self.strategy.reset_orders()
+            self.strategy.tracker.reset()
+            return False
+        book = self.strategy.book
+        if not any(order is not None for order in book.orders):
+            return False
+        
+        api = self.api.async_api
+        async with self._turn():
+            open_orders = await api.get_open_orders(self.strategy.symbol)
+        api.match_client_orders(open_orders)
+        
+        # 请求已发出但没有记录到确认的订单
+        by_client_id = {o['client_order_id']: o for o in open_orders if o.get('client_order_id') and o.get('order_id')}
+        acks = []
+        for order in book.pending_orders():
+            open_order = by_client_id.get(order.client_order_id)
+            if open_order is not None:
+                acks.append({
+                    't': 'ack', 'level': order.grid_level, 'cid': order.client_order_id,
+                    'order_id': open_order['order_id']
+                })
+                self.strategy.on_order_placed(order, open_order['order_id'])
+        self._journal(*acks)
+        resend = book.pending_orders()
+        known_order_ids = set(book.live_order_ids())
+        
+        # 不属于网格的挂单（如撤单请求未完成的订单）；与网格订单客户端订单 ID 相同的重复挂单由 sync_open_orders 撤销
+        stray = [
+            o['order_id'] for o in open_orders
+            if o.get('order_id') and book.level_of(o['order_id']) is None
+            and o.get('client_order_id') not in book.client_ids
+        ]
+        if stray:
+            self._journal({'t': 'cancel', 'order_ids': stray})
+            async with self._turn():
+                await api.cancel_orders(stray)
+        
+        # 停机期间成交的订单按成交处理并补挂反向订单
+        filled = len(known_order_ids - {o.get('order_id') for o in open_orders})
+        await self.sync_open_orders(open_orders, known_order_ids)
+        resend = [order for order in resend if book.order_at(order.grid_level) is order]
+        placed_count = await self.place_orders_async(resend) if resend else 0
+        
+        self.logger.info(
+            "✅ 已从订单日志恢复: 保留 %s 笔挂单, 停机期间成交 %s 笔, "
+            "撤销 %s 笔, 重新下单 %s/%s 笔",
+            len(known_order_ids) - filled, filled, len(stray), placed_count, len(resend)
+        )
+        self._compact_journal()
+        return True
+    
+    async def place_orders_async(self, orders) -> int:
+        """
+        批量下单并把结果回写到策略的层级状态
+        
+        Args:
+            orders: 网格订单列表
             
-            self.logger.info(f"✅ 共下单 {placed_count}/{len(grid_orders)} 个订单")
+        Returns:
+            下单成功的数量
+        """
+        if self.scheduler is None:
+            return await self._submit_orders(orders)
+        
+        # 共用调度器时按批次分片，每片单独排队，与其他网格轮流发送
+        size = self.api.async_api.batch_size
+        placed_count = 0
+        for start in range(0, len(orders), size):
+            async with self._turn():
+                placed_count += await self._submit_orders(orders[start:start + size])
+        return placed_count
+    
+    async def _submit_orders(self, orders) -> int:
+        """发送一组订单并回写结果，返回下单成功的数量"""
+        # 先记录下单意图：请求发出后进程退出时，重启后按客户端订单 ID 在挂单中查找
+        self._journal(*(
+            {'t': 'place', 'level': order.grid_level, 'side': order.side, 'cid': order.client_order_id}
+            for order in orders
+        ))
+        # 批量下单（不支持批量接口时自动回退为并发单笔下单）
+        results = await self.api.async_api.place_orders([
+            {
+                'symbol': self.strategy.symbol,
+                'side': order.side,
+                'price': order.price,
+                'quantity': order.quantity,
+                'leverage': self.strategy.leverage,
+                'client_order_id': order.client_order_id
+            }
+            for order in orders
+        ])
+        
+        placed_count = 0
+        records = []
+        for order, result in zip(orders, results):
+            record = {'level': order.grid_level, 'cid': order.client_order_id}
+            if result.get('order_id'):
+                records.append(dict(record, t='ack', order_id=result['order_id']))
+                self.strategy.on_order_placed(order, result['order_id'])
+                placed_count += 1
+                self.logger.info(
+                    "✅ 下单成功: %s %s @ %s "
+                    "(订单ID: %s)",
+                    order.side, order.quantity, order.price, result['order_id']
+                )
+                continue
             
-        except Exception as e:
-            self.logger.error(f"❌ 下单过程出错: {e}")
-            raise
+            records.append(dict(record, t='reject'))
+            self.strategy.on_order_rejected(order)
+            if result.get('error'):
+                self.logger.error("❌ 下单异常: %s @ %s: %s", order.side, order.price, result['error'])
+            else:
+                self.logger.warning("⚠️  下单失败: %s @ %s", order.side, order.price)
+        self._journal(*records)
+        return placed_count
     
     def cancel_all_orders(self):
         """取消所有订单"""
+        self.api.run(self.cancel_all_orders_async())
+    
+    async def cancel_all_orders_async(self):
+        """取消所有订单（异步）"""
         try:
-            self.api.cancel_all_orders(self.strategy.symbol)
-            self.placed_orders = []
+            async with self._turn():
+                await self.api.async_api.cancel_all_orders(self.strategy.symbol)
+            self.strategy.reset_orders()
+            self._journal({'t': 'reset'})
+            self._compact_journal()
             self.logger.info("✅ 已取消所有订单")
         except Exception as e:
-            self.logger.warning(f"⚠️  取消订单时出错: {e}")
+            self.logger.warning("⚠️  取消订单时出错: %s", e)
     
-    def monitor_orders(self):
-        """监控订单状态"""
+    def shutdown(self, deadline=None) -> ShutdownReport:
+        """停止时撤销所有挂单（同步入口），最多等待 deadline 秒，见 shutdown_async"""
+        deadline = self.shutdown_deadline if deadline is None else deadline
         try:
-            open_orders = self.api.get_open_orders(self.strategy.symbol)
-            self.logger.info(f"当前未成交订单数: {len(open_orders)}")
-            
-            # 检查是否需要重新下单
-            if len(open_orders) < len(self.strategy.grid_orders) * 0.5:
-                self.logger.info("订单数量不足，重新下单...")
-                self.place_grid_orders()
+            # 多等几秒：正常情况下 shutdown_async 自己会在时限内返回，这里只防事件循环卡住
+            return self.api.run(self.shutdown_async(deadline), timeout=deadline + 5)
+        except concurrent.futures.TimeoutError:
+            report = ShutdownReport(
+                remaining=[{'order_id': order_id} for order_id in self.placed_orders],
+                elapsed=deadline + 5, errors=["事件循环无响应"]
+            )
+            self.logger.error("❌ %s", report.format())
+            return report
+    
+    async def shutdown_async(self, deadline=None) -> ShutdownReport:
+        """
+        在时限内撤销本网格的所有挂单，并用 get_open_orders 确认结果
+        
+        cancel-all 在后台发送，同时按已知订单 ID 撤单（任意一个成功即可），之后查询挂单列表，
+        对仍在列表中的订单逐笔撤单，直到列表为空或到达时限。每个请求都受剩余时限约束，
+        不会因为重试而超时；停止时不经过多网格调度器排队
+        
+        Args:
+            deadline: 总时限（秒），默认为 network.shutdown_deadline
+        
+        Returns:
+            撤单结果，remaining 为最后一次查询时仍未撤销的挂单
+        """
+        deadline = self.shutdown_deadline if deadline is None else deadline
+        started = time.monotonic()
+        expires = started + deadline
+        # 撤单最多用到时限的 3/4，留出时间做最后一次确认
+        cancel_expires = started + deadline * 0.75
+        api = self.api.async_api
+        symbol = self.strategy.symbol
+        report = ShutdownReport()
+        
+        async def bounded(coro, until=expires):
+            """在 until 之前等待请求，到时后取消"""
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                coro.close()
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(coro, remaining)
+        
+        async def cancel_each(order_ids):
+            """按订单 ID 撤单，返回失败的订单数"""
+            if not order_ids:
+                return 0
+            results = await bounded(api.cancel_orders(order_ids), cancel_expires)
+            return sum(1 for result in results if isinstance(result, dict) and result.get('error'))
+        
+        def describe(e):
+            if isinstance(e, asyncio.TimeoutError):
+                return "超时"
+            return str(e) or type(e).__name__
+        
+        # cancel-all 在后台进行，卡住时不影响逐笔撤单和确认；本地没有已知订单时先等它一会儿
+        cancel_all = asyncio.ensure_future(bounded(api.cancel_all_orders(symbol), cancel_expires))
+        order_ids = list(self.placed_orders)
+        if not order_ids:
+            await asyncio.wait([cancel_all], timeout=deadline / 2)
+        try:
+            while True:
+                report.rounds += 1
+                try:
+                    failed = await cancel_each(order_ids)
+                    if failed:
+                        report.errors.append(f"撤单: {failed} 笔失败")
+                except Exception as e:
+                    report.errors.append(f"撤单: {describe(e)}")
+                try:
+                    open_orders = await bounded(api.get_open_orders(symbol))
+                except Exception as e:
+                    report.errors.append(f"查询挂单: {describe(e)}")
+                    if not report.verified:
+                        # 从未查询成功时，以本地记录的挂单作为可能未撤销的订单
+                        report.remaining = [
+                            {'order_id': o.order_id, 'side': o.side, 'quantity': str(o.quantity), 'price': str(o.price)}
+                            for o in self.strategy.book.orders if o is not None and o.order_id
+                        ]
+                    report.verified = False
+                    break
+                report.verified = True
+                report.remaining = [o for o in open_orders if o.get('order_id')]
+                order_ids = [o['order_id'] for o in report.remaining]
+                if not order_ids or time.monotonic() >= cancel_expires:
+                    break
+                self.logger.warning(
+                    "⚠️  仍有 %s 笔挂单，逐笔撤单（第 %s 轮）", len(order_ids), report.rounds + 1
+                )
+                # 给交易所处理上一轮撤单的时间，也避免撤单持续失败时空转
+                await asyncio.sleep(min(0.5, max(0.0, cancel_expires - time.monotonic())))
+        finally:
+            if cancel_all.done():
+                if not cancel_all.cancelled() and cancel_all.exception() is not None:
+                    report.errors.append(f"cancel-all: {describe(cancel_all.exception())}")
+            else:
+                cancel_all.cancel()
+        report.elapsed = round(time.monotonic() - started, 3)
+        
+        if report.clean:
+            self.strategy.reset_orders()
+            self._journal({'t': 'reset'})
+            self._compact_journal()
+            self.logger.info("✅ %s", report.format())
+        else:
+            # 未确认撤销时保留订单日志，下次启动时按日志与交易所挂单对账
+            self.logger.error("❌ %s", report.format())
+        return report
+    
+    def monitor_orders(self, refresh_price=False):
+        """监控订单状态"""
+        self.api.run(self.monitor_orders_async(refresh_price))
+    
+    async def monitor_orders_async(self, refresh_price=False):
+        """
+        监控订单状态（异步）
+        
+        Args:
+            refresh_price: 同时查询最新价格（轮询模式下用于计算持仓盈亏和下一次轮询间隔）
+        """
+        # 热更新替换策略期间不校准，避免把旧网格的挂单记到新网格上
+        async with self.state_lock:
+            api = self.api.async_api
+            try:
+                # 只有查询前已确认的订单才可能被判定为已成交，避免与进行中的下单竞争
+                known_order_ids = set(self.strategy.book.live_order_ids())
+                async with self._turn():
+                    if refresh_price:
+                        price, open_orders = await asyncio.gather(
+                            api.get_current_price(self.strategy.symbol),
+                            api.get_open_orders(self.strategy.symbol)
+                        )
+                        self.on_price(price)
+                    else:
+                        open_orders = await api.get_open_orders(self.strategy.symbol)
+                self.logger.info("当前未成交订单数: %s", len(open_orders))
+                if self.owns_api:
+                    # 多网格共用 API 时由运行器统一记录
+                    self.log_api_stats()
+                self.log_position()
+                if refresh_price:
+                    self.log_poll_stats()
+                await self.sync_open_orders(open_orders, known_order_ids)
                 
-        except Exception as e:
-            self.logger.error(f"❌ 监控订单时出错: {e}")
-            # 网络错误时不立即退出，等待下次循环
-            if "timeout" in str(e).lower() or "connection" in str(e).lower():
-                self.logger.warning("网络不稳定，将在下次循环时重试")
+            except Exception as e:
+                self.logger.error("❌ 监控订单时出错: %s", e)
+                # 网络错误时不立即退出，等待下次循环
+                if "timeout" in str(e).lower() or "connection" in str(e).lower():
+                    self.logger.warning("网络不稳定，将在下次循环时重试")
+    
+    async def sync_open_orders(self, open_orders, known_order_ids):
+        """
+        用交易所的挂单列表校准本地状态（轮询和推送重连后共用）
+        
+        查询前已确认、但不在挂单列表中的订单视为已成交，按成交补挂反向订单
+        
+        Args:
+            open_orders: get_open_orders 返回的挂单列表
+            known_order_ids: 查询挂单前已确认的订单 ID
+        """
+        api = self.api.async_api
+        
+        # 按客户端订单 ID 找出重复挂单（如超时重发导致），只撤销重复的那几笔
+        duplicates = api.match_client_orders(open_orders)
+        if duplicates:
+            self.logger.warning("⚠️  发现 %s 笔重复订单，正在撤销...", len(duplicates))
+            async with self._turn():
+                await api.cancel_orders(duplicates)
+        
+        open_order_ids = {o.get('order_id') for o in open_orders}
+        filled_order_ids = list(known_order_ids - open_order_ids)
+        self._journal(*({'t': 'fill', 'order_id': order_id} for order_id in filled_order_ids))
+        counters = []
+        for order_id in filled_order_ids:
+            counters.extend(self.strategy.on_fill(order_id))
+        if counters:
+            self.logger.info("检测到 %s 笔成交，补挂 %s 笔反向订单", len(filled_order_ids), len(counters))
+            await self.place_orders_async(counters)
+    
+    def on_ticker(self, message):
+        """行情推送回调"""
+        price = message.get('price')
+        if price is not None:
+            self.on_price(float(price))
+    
+    def on_price(self, price):
+        """记录最新价格"""
+        self.last_price = price
+        self.strategy.tracker.mark(price)
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.observe(price)
+    
+    def next_poll_interval(self):
+        """
+        下一次轮询前的等待时间
+        
+        启用自适应轮询时按最新价格到两侧最近挂单的距离、波动率和查询配额计算，否则为 poll_interval
+        """
+        if self.poll_scheduler is None or self.last_price is None:
+            return self.poll_interval
+        book = self.strategy.book
+        levels = [
+            float(book.level_ticks[level] * book.tick_size)
+            for level in book.nearest_live_levels(self.last_price) if level is not None
+        ]
+        rate_stats = self.api.get_rate_limit_stats().get(READS)
+        return self.poll_scheduler.next_interval(self.last_price, levels, rate_stats)
+    
+    async def on_order_event(self, message):
+        """订单状态推送回调：成交时补挂反向订单，撤销时释放层级"""
+        # 热更新替换策略期间等待，替换完成后按新网格处理（被新网格保留的挂单已转到新网格上）
+        async with self.state_lock:
+            # 需要根据实际推送格式调整
+            order_id = message.get('order_id')
+            client_order_id = message.get('client_order_id')
+            status = message.get('status')
+            if status in ('canceled', 'cancelled'):
+                if self.strategy.book.find(order_id, client_order_id) is not None:
+                    self._journal({'t': 'canceled', 'order_id': order_id, 'cid': client_order_id})
+                self.strategy.on_order_canceled(order_id, client_order_id)
+                return
+            if status != 'filled' or self.strategy.book.find(order_id, client_order_id) is None:
+                return
+        
+            self.logger.info(
+                "✅ 订单成交: %s %s @ %s "
+                "(订单ID: %s)",
+                message.get('side'), message.get('quantity'), message.get('price'), order_id
+            )
+            # 推送中带有成交价和手续费时按实际值记账，否则按挂单价格记账
+            fill_price = float(message['price']) if message.get('price') is not None else None
+            fee = float(message.get('fee') or 0)
+            self._journal({
+                't': 'fill', 'order_id': order_id, 'cid': client_order_id, 'price': fill_price, 'fee': fee
+            })
+            counters = self.strategy.on_fill(order_id, client_order_id, price=fill_price, fee=fee)
+            self.log_position()
+            if counters:
+                await self.place_orders_async(counters)
+    
+    async def run_stream_async(self):
+        """由推送驱动运行，直到 running 被置为 False"""
+        self.stream = MarketStream(
+            self.api.async_api,
+            self.stream_url,
+            self.strategy.symbol,
+            on_ticker=self.on_ticker,
+            on_order=self.on_order_event,
+            on_resync=self.monitor_orders_async
+        )
+        stream_task = asyncio.ensure_future(self.stream.run())
+        try:
+            while self.running and not stream_task.done():
+                await asyncio.sleep(0.5)
+                await self.check_config_async()
+        finally:
+            await self.stream.stop()
+            await stream_task
+    
+    def run_loop(self):
+        """
+        监控循环（阻塞直到 running 被置为 False）
+        
+        配置了 stream_url 时由行情和成交推送驱动，否则轮询（间隔见 next_poll_interval）
+        """
+        if self.stream_url:
+            self._stream_future = asyncio.run_coroutine_threadsafe(
+                self.run_stream_async(), self.api.loop
+            )
+            self._stream_future.result()
+            return
+        
+        interval = self.next_poll_interval()
+        while self.running:
+            deadline = time.monotonic() + interval
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+                if self.running and self.config_changed():
+                    self.api.run(self.check_config_async())
+            if self.running:
+                self.monitor_orders(refresh_price=self.poll_scheduler is not None)
+                interval = self.next_poll_interval()
+    
+    def log_position(self):
+        """记录当前持仓和盈亏（按最新价格计算未实现盈亏）"""
+        self.logger.info("持仓: %s", self.strategy.tracker.snapshot(self.last_price).format())
+    
+    def log_poll_stats(self):
+        """记录近期选择的轮询间隔"""
+        stats = self.poll_scheduler.stats()
+        if stats['count']:
+            volatility = f"{stats['volatility'] * 100:.4f}%/√s" if stats['volatility'] is not None else "-"
+            self.logger.info(
+                "轮询间隔: 上次 %ss 平均 %ss 范围 %s-%ss "
+                "波动率 %s 依据 %s",
+                stats['last'], stats['mean'], stats['min'], stats['max'], volatility, stats['reasons']
+            )
+    
+    def log_api_stats(self):
+        """记录各接口类别的限流状态、重试预算和调用耗时"""
+        rate_stats = self.api.get_rate_limit_stats()
+        self.logger.info("限流状态: %s", ", ".join(
+            f"{name} {s['rate']}/s 排队{s['queue_depth']}" for name, s in rate_stats.items()
+        ))
+        retry_stats = self.api.get_retry_stats()
+        budget = retry_stats['budget']
+        self.logger.info(
+            "重试预算: 剩余%s 已重试%s 已放弃%s; 耗时: %s",
+            budget['tokens'], budget['retries'], budget['rejected'],
+            ", ".join(
+                f"{name} 最大{s['max']}s/上限{s['deadline']}s"
+                for name, s in retry_stats['latency'].items()
+            )
+        )
     
     def run(self):
         """运行策略"""
@@ -146,26 +836,56 @@ class GridTradingBot:
             self.place_grid_orders()
             
             # 循环监控
-            while self.running:
-                time.sleep(60)  # 每60秒检查一次
-                self.monitor_orders()
+            self.run_loop()
                 
         except KeyboardInterrupt:
             print("\n\n⚠️  收到停止信号...")
             self.stop()
         except Exception as e:
-            self.logger.error(f"❌ 运行出错: {e}")
+            self.logger.error("❌ 运行出错: %s", e)
             self.stop()
     
-    def stop(self):
-        """停止策略"""
+    def stop(self) -> ShutdownReport:
+        """
+        停止策略：在 shutdown_deadline 内撤销所有挂单并确认
+        
+        Returns:
+            撤单结果（未初始化时为 None）
+        """
         self.running = False
-        print("\n正在取消所有订单...")
-        self.cancel_all_orders()
-        print("✅ 策略已停止")
+        if self.api is None:
+            return None
+        if self._stream_future is not None and not self._stream_future.done():
+            # 等待推送订阅退出
+            try:
+                self._stream_future.result(timeout=5)
+            except Exception as e:
+                self.logger.warning("⚠️  停止推送订阅时出错: %s", e)
+        if self.strategy is None:
+            # 初始化未完成，还没有下过单
+            if self.owns_api:
+                self.api.close()
+            self.api = None
+            return None
+        print(f"\n正在取消所有订单（最多 {self.shutdown_deadline} 秒）...")
+        report = self.shutdown()
+        if self.owns_api:
+            self.api.close()
+        self.api = None
+        if report.clean:
+            print("✅ 策略已停止")
+        else:
+            print(f"❌ 策略已停止，但{report.format()}，请到交易所手动处理")
+        return report
 
 
 if __name__ == "__main__":
-    bot = GridTradingBot()
-    bot.run()
+    setup_logging(**Config.get_logging_config())
+    if len(Config.get_trading_configs()) > 1:
+        # trading 配置为多个网格时，在同一进程中共用 API 客户端运行
+        from multi_grid_runner import MultiGridRunner
+        MultiGridRunner().run()
+    else:
+        bot = GridTradingBot()
+        bot.run()
 
@@ -0,0 +1,208 @@
+"""
+本地模拟行情与订单推送服务器
+用于离线测试：提供与 lighter_api.py 相同的 REST 接口和 WebSocket 推送，
+价格按随机游走变化，穿过挂单价格时撮合成交并推送订单事件
+
+使用方法:
+    python mock_feed_server.py --port 8765 --price 45000
+然后在 config.json 中设置:
+    "base_url": "http://127.0.0.1:8765",
+    "network": {"stream_url": "ws://127.0.0.1:8765/stream"}
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+from typing import Dict, Optional, Set
+
+from aiohttp import web
+
+
+class MockFeedServer:
+    """模拟交易所（REST + WebSocket 推送）"""
+    
+    def __init__(self, price: float = 45000.0, volatility: float = 0.001,
+                 tick_interval: float = 1.0, seed: Optional[int] = None):
+        """
+        初始化模拟服务器
+        
+        Args:
+            price: 初始价格
+            volatility: 每次价格更新的相对波动幅度
+            tick_interval: 价格更新间隔（秒）
+            seed: 随机数种子（便于复现）
+        """
+        self.price = price
+        self.volatility = volatility
+        self.tick_interval = tick_interval
+        self.random = random.Random(seed)
+        
+        self.orders: Dict[str, Dict] = {}  # 挂单: 订单 ID -> 订单
+        self.order_ids = itertools.count(1)
+        self.clients: Set[web.WebSocketResponse] = set()
+        self._ticker_task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+    
+    def create_app(self) -> web.Application:
+        """创建 aiohttp 应用"""
+        app = web.Application()
+        app.router.add_get('/api/v1/ticker', self.handle_ticker)
+        app.router.add_get('/api/v1/market', self.handle_market)
+        app.router.add_post('/api/v1/order', self.handle_place_order)
+        app.router.add_post('/api/v1/orders/batch', self.handle_place_orders)
+        app.router.add_post('/api/v1/orders/cancel-batch', self.handle_cancel_orders)
+        app.router.add_post('/api/v1/orders/cancel-all', self.handle_cancel_all)
+        app.router.add_post('/api/v1/order/{order_id}', self.handle_cancel_order)
+        app.router.add_get('/api/v1/orders', self.handle_open_orders)
+        app.router.add_get('/api/v1/account/balance', self.handle_balance)
+        app.router.add_get('/stream', self.handle_stream)
+        app.on_startup.append(self._start_ticker)
+        app.on_cleanup.append(self._stop_ticker)
+        return app
+    
+    def _add_order(self, params: Dict) -> Dict:
+        """挂单，携带相同客户端订单 ID 的重复请求返回已有订单"""
+        client_order_id = params.get('client_order_id')
+        if client_order_id:
+            for order in self.orders.values():
+                if order.get('client_order_id') == client_order_id:
+                    return order
+        order = {
+            'order_id': str(next(self.order_ids)),
+            'client_order_id': client_order_id,
+            'symbol': params.get('symbol'),
+            'side': params.get('side'),
+            'price': params.get('price'),
+            'quantity': params.get('quantity'),
+            'status': 'open'
+        }
+        self.orders[order['order_id']] = order
+        return order
+    
+    async def handle_ticker(self, request: web.Request) -> web.Response:
+        """获取价格"""
+        return web.json_response({'symbol': request.query.get('symbol'), 'price': self.price})
+    
+    async def handle_market(self, request: web.Request) -> web.Response:
+        """获取交易对精度"""
+        return web.json_response({'symbol': request.query.get('symbol'), 'tick_size': '0.01', 'lot_size': '0.000001'})
+    
+    async def handle_place_order(self, request: web.Request) -> web.Response:
+        """下单"""
+        return web.json_response(self._add_order(await request.json()))
+    
+    async def handle_place_orders(self, request: web.Request) -> web.Response:
+        """批量下单"""
+        body = await request.json()
+        return web.json_response({'orders': [self._add_order(o) for o in body.get('orders', [])]})
+    
+    async def handle_cancel_order(self, request: web.Request) -> web.Response:
+        """取消订单"""
+        order_id = request.match_info['order_id']
+        return web.json_response({'order_id': order_id, 'success': self.orders.pop(order_id, None) is not None})
+    
+    async def handle_cancel_orders(self, request: web.Request) -> web.Response:
+        """批量撤单"""
+        body = await request.json()
+        return web.json_response({'results': [
+            {'order_id': order_id, 'success': self.orders.pop(order_id, None) is not None}
+            for order_id in body.get('order_ids', [])
+        ]})
+    
+    async def handle_cancel_all(self, request: web.Request) -> web.Response:
+        """取消所有订单（指定交易对时只取消该交易对的订单）"""
+        symbol = (await request.json()).get('symbol') if request.can_read_body else None
+        for order_id in [i for i, o in self.orders.items() if not symbol or o.get('symbol') == symbol]:
+            del self.orders[order_id]
+        return web.json_response({'success': True})
+    
+    async def handle_open_orders(self, request: web.Request) -> web.Response:
+        """获取挂单列表（指定交易对时只返回该交易对的订单）"""
+        symbol = request.query.get('symbol')
+        return web.json_response([o for o in self.orders.values() if not symbol or o.get('symbol') == symbol])
+    
+    async def handle_balance(self, request: web.Request) -> web.Response:
+        """获取账户余额"""
+        return web.json_response({'USDT': 10000})
+    
+    async def handle_stream(self, request: web.Request) -> web.WebSocketResponse:
+        """WebSocket 推送连接"""
+        ws = web.WebSocketResponse(heartbeat=15)
+        await ws.prepare(request)
+        self.clients.add(ws)
+        try:
+            async for _ in ws:
+                # 订阅消息无需处理，所有客户端都收到全部推送
+                pass
+        finally:
+            self.clients.discard(ws)
+        return ws
+    
+    async def broadcast(self, message: Dict):
+        """向所有订阅者推送消息"""
+        data = json.dumps(message)
+        for ws in list(self.clients):
+            try:
+                await ws.send_str(data)
+            except ConnectionError:
+                self.clients.discard(ws)
+    
+    async def drop_connections(self):
+        """断开所有推送连接（用于测试断线重连）"""
+        for ws in list(self.clients):
+            await ws.close()
+    
+    async def step(self):
+        """价格随机游走一步，撮合被穿过的挂单并推送"""
+        self.price = round(self.price * (1 + self.random.gauss(0, self.volatility)), 2)
+        await self.broadcast({'type': 'ticker', 'price': self.price})
+        
+        filled = [
+            order for order in self.orders.values()
+            if (order['side'] == 'buy' and self.price <= float(order['price']))
+            or (order['side'] == 'sell' and self.price >= float(order['price']))
+        ]
+        for order in filled:
+            del self.orders[order['order_id']]
+            await self.broadcast(dict(
+                order, type='order', status='filled', filled_quantity=order['quantity']
+            ))
+    
+    async def _ticker_loop(self):
+        """定时更新价格"""
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            await self.step()
+    
+    async def _start_ticker(self, app: web.Application):
+        """应用启动时开始更新价格"""
+        if self.tick_interval > 0:
+            self._ticker_task = asyncio.ensure_future(self._ticker_loop())
+    
+    async def _stop_ticker(self, app: web.Application):
+        """应用关闭时停止更新价格"""
+        if self._ticker_task is not None:
+            self._ticker_task.cancel()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地模拟行情与订单推送服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--price', type=float, default=45000.0, help="初始价格")
+    parser.add_argument('--volatility', type=float, default=0.001, help="每次更新的相对波动幅度")
+    parser.add_argument('--interval', type=float, default=1.0, help="价格更新间隔（秒）")
+    parser.add_argument('--seed', type=int, default=None, help="随机数种子")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    server = MockFeedServer(args.price, args.volatility, args.interval, args.seed)
+    web.run_app(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
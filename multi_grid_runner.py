@@ -0,0 +1,314 @@
+"""
+多网格运行模块
+在一个进程中运行 config.json 中 trading 列表里的多个网格：共用一个 LighterAPI
+（同一个连接池、同一套限流令牌桶和重试预算），由 FairScheduler 按网格轮流分配请求时隙，
+轮询模式下各网格的监控在轮询间隔内错开进行
+
+使用方法:
+    python multi_grid_runner.py
+    （trading 配置为多个网格时，python main.py 也会使用本模块）
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from grid_scheduler import FairScheduler
+from logging_setup import setup_logging
+from main import GridTradingBot, ShutdownReport
+
+
+CONFIG_CHECK_INTERVAL = 2.0  # 轮询模式下检查配置文件是否修改的间隔（秒）
+
+
+def duplicate_symbols(trading_configs: List[Dict]) -> List[str]:
+    """配置中重复出现的交易对"""
+    symbols = [config.get('symbol') for config in trading_configs]
+    return sorted({symbol for symbol in symbols if symbols.count(symbol) > 1})
+
+
+class GridLogAdapter(logging.LoggerAdapter):
+    """在日志前加上网格名称，并作为 grid 字段写入结构化日志"""
+    
+    def process(self, msg, kwargs):
+        kwargs['extra'] = dict(kwargs.get('extra') or {}, **self.extra)
+        # 日志参数在后台线程按 % 格式化，名称中的 % 需要转义
+        grid = str(self.extra['grid']).replace('%', '%%')
+        return f"[{grid}] {msg}", kwargs
+
+
+class MultiGridRunner:
+    """多网格运行器"""
+    
+    def __init__(self, trading_configs: Optional[List[Dict]] = None, shared_rate_state: Optional[Dict] = None,
+                 snapshots: Optional[Dict] = None, on_status: Optional[Callable[[Dict], None]] = None,
+                 status_interval: float = 5.0):
+        """
+        Args:
+            trading_configs: 要运行的网格配置，默认为 config.json 中的全部网格
+            shared_rate_state: 多进程共用的限流状态（由 grid_supervisor 创建）
+            snapshots: 网格名称 -> 持仓快照，用于进程重启后恢复统计
+            on_status: 定期接收运行状态（status() 的返回值）的回调，在事件循环线程中调用
+            status_interval: 调用 on_status 的间隔（秒）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.trading_configs = trading_configs
+        self.shared_rate_state = shared_rate_state
+        self.snapshots = snapshots or {}
+        self.on_status = on_status
+        self.status_interval = status_interval
+        self.api = None
+        self.scheduler = None
+        self.bots: List[GridTradingBot] = []
+        self.running = False
+        self.stream_url = None
+        self.poll_interval = 60
+        self.unstarted = set()  # 初始布置失败、等待重试的网格
+        self.next_poll: Dict[str, float] = {}  # 轮询模式下各网格下一次轮询的时刻
+        self._future = None
+    
+    def initialize(self):
+        """加载配置，创建共享的 API 客户端、调度器和各网格的策略"""
+        trading_configs = self.trading_configs
+        if trading_configs is None:
+            trading_configs = Config.get_trading_configs()
+        if not trading_configs:
+            print("❌ 未找到交易配置，请先运行交互式配置脚本:")
+            print("   python interactive_setup.py")
+            sys.exit(1)
+        duplicates = duplicate_symbols(trading_configs)
+        if duplicates:
+            # 同一交易对的挂单无法区分属于哪个网格，对账时会互相撤单
+            print(f"❌ 交易对不能重复: {', '.join(duplicates)}")
+            sys.exit(1)
+        
+        api_creds = Config.get_api_credentials()
+        if not api_creds.get('api_key') or not api_creds.get('api_secret'):
+            print("❌ 未找到 API 凭证，请先运行交互式配置脚本:")
+            print("   python interactive_setup.py")
+            sys.exit(1)
+        
+        network_config = Config.load_config().get('network', {})
+        self.api = GridTradingBot.create_api(api_creds, network_config, self.shared_rate_state)
+        self.scheduler = FairScheduler(network_config.get('scheduler_concurrency', 4))
+        self.stream_url = network_config.get('stream_url')
+        self.poll_interval = network_config.get('poll_interval', 60)
+        
+        for trading_config in trading_configs:
+            self.bots.append(self.create_bot(trading_config, network_config))
+    
+    def create_bot(self, trading_config, network_config) -> GridTradingBot:
+        """创建共用 API 客户端和调度器的网格"""
+        name = trading_config['symbol']
+        bot = GridTradingBot(name=name)
+        bot.api = self.api
+        bot.owns_api = False
+        bot.scheduler = self.scheduler
+        bot.logger = GridLogAdapter(logging.getLogger(GridTradingBot.__module__), {'grid': name})
+        bot.configure_network(network_config)
+        bot.strategy = bot.create_strategy(trading_config)
+        bot.open_journal(network_config)
+        if name in self.snapshots:
+            bot.strategy.tracker.restore(self.snapshots[name])
+        bot.strategy.print_strategy_info()
+        return bot
+    
+    async def start_grid(self, bot: GridTradingBot):
+        """布置一个网格，失败时留待下一轮重试"""
+        try:
+            await bot.place_grid_orders_async()
+            self.unstarted.discard(bot.name)
+        except Exception as e:
+            self.unstarted.add(bot.name)
+            bot.logger.error("❌ 网格布置失败，稍后重试: %s", e)
+    
+    async def tick(self, bot: GridTradingBot):
+        """轮到某个网格时：尚未布置成功的重新布置，否则（先应用修改过的配置）监控订单，然后安排下一次轮询"""
+        if bot.name not in self.unstarted and bot.config_changed():
+            await bot.check_config_async()
+        if bot.name in self.unstarted:
+            await self.start_grid(bot)
+        else:
+            await bot.monitor_orders_async(refresh_price=bot.poll_scheduler is not None)
+        if bot.name in self.unstarted:
+            interval = self.poll_interval
+        else:
+            interval = bot.next_poll_interval()
+        self.next_poll[bot.name] = time.monotonic() + interval
+    
+    async def run_async(self):
+        """布置所有网格并运行监控，直到 running 被置为 False"""
+        reporter = asyncio.ensure_future(self.report_status()) if self.on_status else None
+        try:
+            await self.run_grids()
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+    
+    async def run_grids(self):
+        """初始布置后按推送或轮询方式监控各网格"""
+        # 所有网格同时布置，各自的请求由调度器轮流发送
+        await asyncio.gather(*(self.start_grid(bot) for bot in self.bots))
+        
+        if self.stream_url:
+            await asyncio.gather(*(self.run_stream(bot) for bot in self.bots))
+            return
+        
+        # 轮询：各网格按各自的间隔轮询（见 GridTradingBot.next_poll_interval），首轮均匀错开；
+        # 查询配额按网格数分摊，监控结束后才计算该网格的下一次轮询时间
+        now = time.monotonic()
+        for index, bot in enumerate(self.bots):
+            if bot.poll_scheduler is not None:
+                bot.poll_scheduler.share = 1 / len(self.bots)
+            self.next_poll[bot.name] = now + bot.next_poll_interval() * (index + 1) / len(self.bots)
+        tasks = {}
+        next_report = now + self.poll_interval
+        while self.running:
+            now = time.monotonic()
+            for bot in self.bots:
+                if bot.config_changed():
+                    # 配置文件修改后不等到下一次轮询
+                    self.next_poll[bot.name] = min(self.next_poll[bot.name], now)
+                task = tasks.get(bot.name)
+                if (task is None or task.done()) and self.next_poll[bot.name] <= now:
+                    tasks[bot.name] = asyncio.ensure_future(self.tick(bot))
+            if now >= next_report:
+                self.log_stats()
+                next_report = now + self.poll_interval
+            idle = [self.next_poll[name] for name, task in tasks.items() if task.done()]
+            idle += [self.next_poll[bot.name] for bot in self.bots if bot.name not in tasks]
+            # 最多睡眠 CONFIG_CHECK_INTERVAL 秒，以便及时发现配置文件的修改
+            await self._sleep(min([next_report, now + CONFIG_CHECK_INTERVAL] + idle) - now)
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    
+    async def run_stream(self, bot: GridTradingBot):
+        """推送模式：先等待网格布置成功，再订阅推送"""
+        while self.running and bot.name in self.unstarted:
+            await self._sleep(self.poll_interval)
+            if self.running:
+                await self.start_grid(bot)
+        if self.running:
+            await bot.run_stream_async()
+    
+    async def report_status(self):
+        """定期把运行状态交给 on_status（在事件循环中运行，事件循环卡住时状态随之停止更新）"""
+        while self.running:
+            try:
+                self.on_status(self.status())
+            except Exception as e:
+                self.logger.warning("⚠️  上报运行状态失败: %s", e)
+            await self._sleep(self.status_interval)
+    
+    def status(self) -> Dict:
+        """各网格的持仓快照、挂单数和调度统计（可序列化，用于跨进程上报）"""
+        return {
+            'time': time.time(),
+            'grids': {
+                bot.name: {
+                    'snapshot': bot.strategy.tracker.snapshot(bot.last_price),
+                    'open_orders': len(bot.placed_orders),
+                    'started': bot.name not in self.unstarted
+                }
+                for bot in self.bots
+            },
+            'scheduler': self.scheduler.stats()
+        }
+    
+    async def _sleep(self, seconds: float):
+        """分段睡眠，running 被置为 False 后尽快返回"""
+        deadline = time.monotonic() + seconds
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(0.5, remaining))
+    
+    def log_stats(self):
+        """记录共享限流状态和各网格获得的请求时隙"""
+        rate_stats = self.api.get_rate_limit_stats()
+        self.logger.info("限流状态: %s", ", ".join(
+            f"{name} {s['rate']}/s 排队{s['queue_depth']}" for name, s in rate_stats.items()
+        ))
+        self.logger.info("调度: %s", ", ".join(
+            f"{name} 时隙{s['granted']} 排队{s['waiting']} 平均等待{s['wait_avg']}s"
+            for name, s in self.scheduler.stats().items()
+        ))
+        for bot in self.bots:
+            bot.log_position()
+    
+    def run(self):
+        """运行所有网格（阻塞直到 Ctrl+C）"""
+        self.initialize()
+        
+        print("\n" + "="*60)
+        print(f"多网格交易启动（{len(self.bots)} 个网格）")
+        print("="*60)
+        print("按 Ctrl+C 停止策略\n")
+        
+        self.running = True
+        for bot in self.bots:
+            bot.running = True
+        try:
+            self._future = asyncio.run_coroutine_threadsafe(self.run_async(), self.api.loop)
+            self._future.result()
+        except KeyboardInterrupt:
+            print("\n\n⚠️  收到停止信号...")
+        except Exception as e:
+            self.logger.error("❌ 运行出错: %s", e)
+        finally:
+            self.stop()
+    
+    def stop(self) -> Dict[str, ShutdownReport]:
+        """
+        停止所有网格：各网格同时在 shutdown_deadline 内撤单并确认，然后关闭共享的 API 客户端
+        
+        Returns:
+            网格名称 -> 撤单结果
+        """
+        self.running = False
+        for bot in self.bots:
+            bot.running = False
+        if self.api is None:
+            return {}
+        if self._future is not None and not self._future.done():
+            try:
+                self._future.result(timeout=10)
+            except Exception as e:
+                self.logger.warning("⚠️  等待网格退出时出错: %s", e)
+        
+        deadline = max((bot.shutdown_deadline for bot in self.bots), default=0)
+        print(f"\n正在取消所有网格的订单（最多 {deadline} 秒）...")
+        
+        async def shutdown_all():
+            reports = await asyncio.gather(*(bot.shutdown_async() for bot in self.bots))
+            return dict(zip((bot.name for bot in self.bots), reports))
+        
+        try:
+            reports = self.api.run(shutdown_all(), timeout=deadline + 5)
+        except concurrent.futures.TimeoutError:
+            reports = {
+                bot.name: ShutdownReport(
+                    remaining=[{'order_id': order_id} for order_id in bot.placed_orders],
+                    elapsed=deadline + 5, errors=["事件循环无响应"]
+                )
+                for bot in self.bots
+            }
+        self.api.close()
+        self.api = None
+        failed = {name: report for name, report in reports.items() if not report.clean}
+        if failed:
+            print(f"❌ 所有网格已停止，但以下 {len(failed)} 个网格的挂单未能确认撤销，请到交易所手动处理:")
+            for name, report in failed.items():
+                print(f"   {name}: {report.format()}")
+        else:
+            print("✅ 所有网格已停止")
+        return reports
+
+
+if __name__ == "__main__":
+    setup_logging(**Config.get_logging_config())
+    MultiGridRunner().run()
@@ -0,0 +1,164 @@
+"""
+订单日志模块
+以追加方式（JSON Lines）记录每一次下单/撤单意图、交易所确认和成交，并定期把整个层级状态
+压缩为一条快照。进程异常退出后，用最近的快照加其后的记录重放出退出前的层级状态，
+再与一次 get_open_orders 的结果对账即可继续运行，不需要撤销全部挂单后重新布置
+
+记录类型（字段 t）:
+    snapshot  层级状态快照（GridTradingStrategy.export_state），日志压缩后位于文件开头
+    grid      按价格重新生成网格（price, generation）
+    place     下单意图（level, side, cid），在请求发出前写入
+    ack       下单成功（level, cid, order_id, ecid 为交易所记录的客户端订单 ID）
+    reject    下单失败（level, cid）
+    cancel    撤单意图（order_ids）
+    canceled  订单已撤销（order_id, cid）
+    fill      订单成交（order_id, cid, price, fee）
+    reset     已撤销全部挂单
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class OrderJournal:
+    """追加写入的订单日志（单个网格一个文件）"""
+    
+    def __init__(self, path: str, snapshot_every: int = 1000, fsync: bool = True):
+        """
+        Args:
+            path: 日志文件路径
+            snapshot_every: 距上次快照累计多少条记录后压缩日志
+            fsync: 每次写入后是否 fsync（关闭后进程崩溃不会丢记录，但断电可能丢失最后几条）
+        """
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.records_since_snapshot = 0
+        self._file = None
+        self.logger = logging.getLogger(__name__)
+    
+    def load(self) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        读取日志
+        
+        Returns:
+            (最近一次快照的状态, 快照之后的记录)，没有日志文件时为 (None, [])
+        """
+        state, records = None, []
+        if not os.path.exists(self.path):
+            return state, records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if number == len(lines):
+                    # 写入最后一行时进程退出，该记录的操作尚未发生
+                    self.logger.warning("⚠️  订单日志最后一行不完整，已忽略: %s", self.path)
+                    break
+                raise ValueError(f"订单日志第 {number} 行损坏: {self.path}")
+            if record.get('t') == 'snapshot':
+                state, records = record['state'], []
+            else:
+                records.append(record)
+        self.records_since_snapshot = len(records)
+        return state, records
+    
+    def append(self, *records: Dict):
+        """追加记录（一次写入、一次 fsync）"""
+        if not records:
+            return
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        now = round(time.time(), 3)
+        self._file.write(''.join(
+            json.dumps(dict(record, ts=now), ensure_ascii=False) + '\n' for record in records
+        ))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records_since_snapshot += len(records)
+    
+    @property
+    def snapshot_due(self) -> bool:
+        """距上次快照的记录数已达到 snapshot_every"""
+        return self.records_since_snapshot >= self.snapshot_every
+    
+    def write_snapshot(self, state: Dict):
+        """
+        压缩日志：写入只包含一条快照的新文件后原子替换旧文件
+        
+        Args:
+            state: GridTradingStrategy.export_state() 的返回值
+        """
+        self.close()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'t': 'snapshot', 'ts': round(time.time(), 3), 'state': state},
+                               ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.records_since_snapshot = 0
+    
+    def close(self):
+        """关闭文件（之后的写入会重新打开）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def replay_journal(strategy, state: Optional[Dict], records: List[Dict]):
+    """
+    用快照和其后的记录重建策略的层级状态和持仓统计
+    
+    成交按 strategy.on_fill 重放，补单占用的层级和补单序号与运行时完全一致；
+    只有意图而没有确认的下单恢复为待确认（PENDING）状态，由调用方与交易所挂单对账
+    
+    Args:
+        strategy: GridTradingStrategy（参数需与写入日志时一致）
+        state: 快照状态，None 表示从空状态开始
+        records: 快照之后的记录
+    
+    Raises:
+        ValueError: 快照与当前网格参数不一致
+    """
+    if state is not None:
+        strategy.restore_state(state)
+    book = strategy.book
+    for record in records:
+        kind = record.get('t')
+        if kind == 'grid':
+            strategy.generation = record['generation'] - 1
+            strategy.generate_grid_orders(record['price'])
+        elif kind == 'place':
+            order = book.order_at(record['level'])
+            if order is None or order.client_order_id != record['cid']:
+                strategy.restore_order(record['level'], record['side'], record['cid'])
+        elif kind in ('ack', 'reject'):
+            order = book.order_at(record['level'])
+            if order is None or order.client_order_id != record['cid']:
+                continue
+            if kind == 'ack':
+                strategy.on_order_placed(order, record['order_id'], record.get('ecid'))
+            else:
+                strategy.on_order_rejected(order)
+        elif kind == 'fill':
+            strategy.on_fill(record['order_id'], record.get('cid'), price=record.get('price'),
+                             fee=record.get('fee', 0.0))
+        elif kind == 'canceled':
+            strategy.on_order_canceled(record['order_id'], record.get('cid'))
+        elif kind == 'reset':
+            strategy.reset_orders()
@@ -0,0 +1,307 @@
+"""
+网格参数扫描模块
+在进程池中用历史数据批量回测网格参数组合（笛卡尔积或随机抽样），输出按指标排序的结果表
+
+价格序列只读取一次，写成连续的 float64 文件后由各工作进程以只读 mmap 方式共享，
+任务只传递参数字典，不会为每个任务序列化整段价格数据；tick_store 列式存储的价格列
+本身就是这种格式，直接映射而无需转换
+
+使用方法:
+    python parameter_sweep.py trades.csv --lower 38000 40000 --upper 50000 52000 \\
+        --grid-count 10 20 50 --leverage 1 3 --workers 32
+"""
+
+import argparse
+import array
+import csv
+import itertools
+import logging
+import mmap
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional
+
+from backtester import Backtester, read_price_path
+from grid_trading_strategy import GridTradingStrategy
+from tick_store import TickStore, is_tick_store
+
+
+# 可扫描的策略参数
+SWEEP_PARAMS = ('lower_price', 'upper_price', 'grid_count', 'leverage', 'order_value', 'grid_mode')
+
+# 结果表的列（参数列之后）
+RESULT_COLUMNS = ('total_pnl', 'return_pct', 'realized_pnl', 'fees', 'fills', 'max_drawdown',
+                  'max_margin_used', 'liquidations', 'final_equity', 'elapsed')
+
+# 工作进程中共享的价格序列（只读 mmap 上的 float64 视图）
+_prices: Optional[memoryview] = None
+
+
+def write_price_file(data_path: str, price_path: str, chunk_size: int = 65536) -> int:
+    """
+    把历史数据的价格序列写成连续的 float64 二进制文件（流式处理，不整体载入内存）
+    
+    Args:
+        data_path: 历史数据文件（格式见 backtester.read_price_path）
+        price_path: 输出文件路径
+        chunk_size: 每次写入的价格数
+    
+    Returns:
+        价格数
+    """
+    count = 0
+    with open(price_path, 'wb') as f:
+        chunk = array.array('d')
+        for _, price in read_price_path(data_path):
+            chunk.append(price)
+            if len(chunk) >= chunk_size:
+                chunk.tofile(f)
+                count += len(chunk)
+                chunk = array.array('d')
+        chunk.tofile(f)
+        count += len(chunk)
+    return count
+
+
+def _map_prices(price_path: str) -> memoryview:
+    """以只读 mmap 打开价格文件，返回 float64 视图"""
+    with open(price_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast('d')
+
+
+def _init_worker(price_path: str, begin: int = 0, end: Optional[int] = None):
+    """工作进程初始化：映射价格文件（只取 [begin, end) 行），关闭策略的逐次生成日志"""
+    global _prices
+    _prices = _map_prices(price_path)[begin:end]
+    logging.getLogger('grid_trading_strategy').setLevel(logging.WARNING)
+    logging.getLogger('backtester').setLevel(logging.ERROR)
+
+
+def _run_task(task: Dict) -> Dict:
+    """在工作进程中回测一组参数"""
+    params, base_config, backtest_options = task['params'], task['base_config'], task['backtest_options']
+    row = dict(params)
+    started = time.perf_counter()
+    try:
+        strategy = GridTradingStrategy(**dict(base_config, **params))
+        result = Backtester(strategy, **backtest_options).run(enumerate(_prices))
+    except Exception as e:
+        row['error'] = str(e)
+        return row
+    
+    capital = backtest_options.get('initial_capital', 10000.0)
+    row.update({
+        'total_pnl': round(result.total_pnl, 4),
+        'return_pct': round(result.total_pnl / capital * 100, 4) if capital else 0.0,
+        'realized_pnl': round(result.realized_pnl, 4),
+        'fees': round(result.fees, 4),
+        'fills': result.fills,
+        'max_drawdown': round(result.max_drawdown, 6),
+        'max_margin_used': round(result.max_margin_used, 4),
+        'liquidations': len(result.liquidations),
+        'final_equity': round(result.final_equity, 4),
+        'elapsed': round(time.perf_counter() - started, 3)
+    })
+    return row
+
+
+def build_param_grid(space: Dict[str, List], samples: Optional[int] = None,
+                     seed: Optional[int] = None) -> List[Dict]:
+    """
+    由每个参数的候选值生成参数组合
+    
+    Args:
+        space: 参数名 -> 候选值列表
+        samples: 随机抽取的组合数；为 None 时返回全部笛卡尔积
+        seed: 随机数种子
+    
+    Returns:
+        参数组合列表（已去掉下限不低于上限的组合）
+    """
+    names = list(space)
+    
+    def valid(params: Dict) -> bool:
+        lower, upper = params.get('lower_price'), params.get('upper_price')
+        return lower is None or upper is None or lower < upper
+    
+    if samples is None:
+        combos = (dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names)))
+        return [params for params in combos if valid(params)]
+    
+    rnd = random.Random(seed)
+    total = 1
+    for name in names:
+        total *= len(space[name])
+    combos, seen = [], set()
+    # 最多尝试若干倍的次数，避免合法组合不足时死循环
+    for _ in range(samples * 20):
+        if len(combos) >= min(samples, total):
+            break
+        values = tuple(rnd.choice(space[name]) for name in names)
+        params = dict(zip(names, values))
+        if values in seen or not valid(params):
+            seen.add(values)
+            continue
+        seen.add(values)
+        combos.append(params)
+    return combos
+
+
+def run_sweep(data_path: str, param_grid: Iterable[Dict], base_config: Dict,
+              backtest_options: Optional[Dict] = None, workers: Optional[int] = None,
+              sort_by: str = 'total_pnl', descending: bool = True,
+              start=None, end=None) -> List[Dict]:
+    """
+    在进程池中回测所有参数组合
+    
+    Args:
+        data_path: 历史数据文件或 tick_store 列式存储目录
+        param_grid: 参数组合（覆盖 base_config 中的同名参数）
+        base_config: 策略的基础参数（如 config.json 的 trading 配置）
+        backtest_options: 传给 Backtester 的参数
+        workers: 进程数，默认为 CPU 核数
+        sort_by: 排序指标
+        descending: 是否按降序排列
+        start: 开始时间（含），仅列式存储支持
+        end: 结束时间（不含），仅列式存储支持
+    
+    Returns:
+        按指标排序的结果列表（出错的组合排在最后，带 error 字段）
+    """
+    logger = logging.getLogger(__name__)
+    tasks = [
+        {'params': params, 'base_config': base_config, 'backtest_options': backtest_options or {}}
+        for params in param_grid
+    ]
+    workers = workers or os.cpu_count() or 1
+    
+    temp_path = None
+    if is_tick_store(data_path):
+        # 列式存储的价格列直接映射，按时间范围换算为行号
+        with TickStore(data_path) as store:
+            price_path = store.column_path('price')
+            begin, stop = store.bounds(start, end)
+    else:
+        if start is not None or end is not None:
+            raise ValueError("按时间范围截取需要先用 tick_store.py 转换为列式存储")
+        fd, temp_path = tempfile.mkstemp(prefix='grid_sweep_', suffix='.f64')
+        os.close(fd)
+        price_path = temp_path
+    try:
+        if temp_path is not None:
+            begin, stop = 0, write_price_file(data_path, temp_path)
+        if stop <= begin:
+            raise ValueError(f"没有可回测的价格数据: {data_path}")
+        logger.info("已载入 %s 个价格，使用 %s 个进程回测 %s 组参数", stop - begin, workers, len(tasks))
+        
+        results = []
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(price_path, begin, stop)) as pool:
+            for row in pool.imap_unordered(_run_task, tasks):
+                results.append(row)
+                if len(results) % max(1, len(tasks) // 20) == 0:
+                    logger.info("进度: %s/%s", len(results), len(tasks))
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+    
+    ok = [row for row in results if 'error' not in row]
+    failed = [row for row in results if 'error' in row]
+    ok.sort(key=lambda row: row[sort_by], reverse=descending)
+    return ok + failed
+
+
+def write_results(results: List[Dict], path: str):
+    """把结果写为 CSV（第一列为名次）"""
+    param_columns = [name for name in SWEEP_PARAMS if any(name in row for row in results)]
+    columns = ['rank'] + param_columns + list(RESULT_COLUMNS) + ['error']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for rank, row in enumerate(results, 1):
+            writer.writerow(dict(row, rank=rank))
+
+
+def print_results(results: List[Dict], top: int = 10):
+    """打印排名靠前的结果"""
+    param_columns = [name for name in SWEEP_PARAMS if any(name in row for row in results)]
+    print("\n" + "="*60)
+    print(f"参数扫描结果（前 {min(top, len(results))} 名）")
+    print("="*60)
+    for rank, row in enumerate(results[:top], 1):
+        params = " ".join(f"{name}={row[name]}" for name in param_columns)
+        if 'error' in row:
+            print(f"{rank:>3}. {params}  出错: {row['error']}")
+            continue
+        print(
+            f"{rank:>3}. {params}  盈亏 {row['total_pnl']:.2f} ({row['return_pct']:.2f}%) "
+            f"回撤 {row['max_drawdown'] * 100:.2f}% 成交 {row['fills']} 强平 {row['liquidations']}"
+        )
+    print("="*60 + "\n")
+
+
+def main():
+    """主函数：以 config.json 的交易配置为基础扫描参数"""
+    from config import Config
+    
+    parser = argparse.ArgumentParser(description="网格参数扫描")
+    parser.add_argument('data', help="历史成交或 K 线 CSV 文件（支持 .gz），或 tick_store 列式存储目录")
+    parser.add_argument('--start', default=None, help="开始时间（仅列式存储，毫秒时间戳或 ISO 时间）")
+    parser.add_argument('--end', default=None, help="结束时间（仅列式存储，不含）")
+    parser.add_argument('--lower', type=float, nargs='+', help="网格下限价格候选值")
+    parser.add_argument('--upper', type=float, nargs='+', help="网格上限价格候选值")
+    parser.add_argument('--grid-count', type=int, nargs='+', help="网格数量候选值")
+    parser.add_argument('--leverage', type=int, nargs='+', help="杠杆倍数候选值")
+    parser.add_argument('--order-value', type=float, nargs='+', help="每网格开仓价值候选值")
+    parser.add_argument('--grid-mode', nargs='+', choices=['arithmetic', 'geometric'], help="网格模式候选值")
+    parser.add_argument('--random', type=int, default=None, help="随机抽取的组合数（默认遍历全部组合）")
+    parser.add_argument('--seed', type=int, default=None, help="随机数种子")
+    parser.add_argument('--workers', type=int, default=None, help="进程数（默认为 CPU 核数）")
+    parser.add_argument('--capital', type=float, default=10000.0, help="初始资金（USDT）")
+    parser.add_argument('--maker-fee', type=float, default=0.0002, help="挂单手续费率")
+    parser.add_argument('--taker-fee', type=float, default=0.0005, help="吃单手续费率")
+    parser.add_argument('--sort-by', default='total_pnl', choices=RESULT_COLUMNS, help="排序指标")
+    parser.add_argument('--ascending', action='store_true', help="按升序排列（如按回撤排序）")
+    parser.add_argument('--output', default='sweep_results.csv', help="结果表输出路径")
+    parser.add_argument('--top', type=int, default=10, help="打印的名次数")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    base_config = Config.get_trading_config() or {'symbol': 'BTC/USDT', 'leverage': 1, 'order_value': 100}
+    
+    space = {}
+    for name, values in (('lower_price', args.lower), ('upper_price', args.upper),
+                         ('grid_count', args.grid_count), ('leverage', args.leverage),
+                         ('order_value', args.order_value), ('grid_mode', args.grid_mode)):
+        if values:
+            space[name] = values
+        elif name in base_config:
+            space[name] = [base_config[name]]
+    missing = [name for name in ('lower_price', 'upper_price', 'grid_count') if name not in space]
+    if missing:
+        parser.error(f"缺少参数: {', '.join(missing)}（可在命令行或 config.json 中指定）")
+    
+    param_grid = build_param_grid(space, args.random, args.seed)
+    results = run_sweep(
+        args.data, param_grid, base_config,
+        backtest_options={
+            'initial_capital': args.capital,
+            'maker_fee': args.maker_fee,
+            'taker_fee': args.taker_fee
+        },
+        workers=args.workers,
+        sort_by=args.sort_by,
+        descending=not args.ascending,
+        start=args.start,
+        end=args.end
+    )
+    write_results(results, args.output)
+    print_results(results, args.top)
+    print(f"✅ 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+自适应轮询调度模块
+未配置推送时，按当前价格到最近挂单层级的距离、近期波动率和剩余限流配额计算下一次轮询的间隔：
+价格贴近挂单、可能即将成交时亚秒级轮询，远离所有挂单时逐步放宽到数分钟。
+
+价格按布朗运动估计：波动率为 σ（对数收益率每秒的标准差）时，价格在 t 秒内触及相对距离为 d 的
+挂单的概率约为 2·(1 - Φ(d / (σ·√t)))。轮询间隔取该概率等于 fill_probability 时的 t，
+即两次轮询之间发生成交的概率大致固定
+"""
+
+import csv
+import logging
+import math
+import os
+import time
+from collections import Counter, deque
+from dataclasses import astuple, dataclass, fields
+from statistics import NormalDist
+from typing import Deque, Dict, Iterable, Optional
+
+
+@dataclass(frozen=True)
+class PollRecord:
+    """一次轮询间隔的选择"""
+    time: float  # Unix 时间戳
+    price: float
+    distance: Optional[float]  # 到最近挂单的相对距离（对数），没有挂单时为 None
+    volatility: Optional[float]  # 对数收益率每秒的标准差，尚未估计出时为 None
+    interval: float
+    reason: str  # 决定间隔的因素：proximity / warmup / idle / flat / budget / min / max
+
+
+class AdaptivePollScheduler:
+    """按价格距离、波动率和限流配额计算轮询间隔"""
+    
+    def __init__(self, min_interval: float = 0.5, max_interval: float = 300.0,
+                 fill_probability: float = 0.2, warmup_interval: float = 5.0, warmup_samples: int = 5,
+                 volatility_halflife: float = 300.0, budget_fraction: float = 0.5,
+                 requests_per_poll: int = 2, history: int = 1000, log_path: Optional[str] = None):
+        """
+        Args:
+            min_interval: 最短轮询间隔（秒）
+            max_interval: 最长轮询间隔（秒）
+            fill_probability: 两次轮询之间允许的成交概率，越小轮询越频繁
+            warmup_interval: 波动率估计出来之前的轮询间隔（秒）
+            warmup_samples: 开始按波动率计算间隔前需要的价格样本数
+            volatility_halflife: 波动率估计（指数加权）的半衰期（秒）
+            budget_fraction: 轮询最多使用的查询类限流速率比例（其余留给下单后的对账等）
+            requests_per_poll: 每次轮询消耗的查询请求数
+            history: 内存中保留的间隔记录数
+            log_path: 记录每次选择的 CSV 文件路径（用于离线调参），不设置则只保留在内存中
+        """
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.fill_probability = float(fill_probability)
+        self.warmup_interval = float(warmup_interval)
+        self.warmup_samples = int(warmup_samples)
+        self.volatility_halflife = float(volatility_halflife)
+        self.budget_fraction = float(budget_fraction)
+        self.requests_per_poll = int(requests_per_poll)
+        self.log_path = log_path
+        self.share = 1.0  # 本调度器可用的配额比例（多个网格共用一个 API 客户端时按网格数分摊）
+        
+        # 触及概率为 fill_probability 时对应的标准化距离
+        self._z = NormalDist().inv_cdf(1 - self.fill_probability / 2)
+        self.variance: Optional[float] = None  # 对数收益率每秒方差的指数加权估计
+        self.samples = 0
+        self._last_sample: Optional[tuple] = None  # (时刻, 价格)
+        self.history: Deque[PollRecord] = deque(maxlen=history)
+        self.logger = logging.getLogger(__name__)
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "AdaptivePollScheduler":
+        """按 network.adaptive_polling 配置创建"""
+        return cls(**(config or {}))
+    
+    @property
+    def volatility(self) -> Optional[float]:
+        """对数收益率每秒的标准差"""
+        return math.sqrt(self.variance) if self.variance is not None else None
+    
+    def observe(self, price: float, now: Optional[float] = None):
+        """
+        记录一次价格样本，更新波动率估计
+        
+        Args:
+            price: 最新价格
+            now: 采样时刻（time.monotonic()），默认为当前时刻
+        """
+        now = time.monotonic() if now is None else now
+        if price <= 0:
+            return
+        last = self._last_sample
+        self._last_sample = (now, price)
+        self.samples += 1
+        if last is None:
+            return
+        elapsed = now - last[0]
+        if elapsed <= 0:
+            return
+        # 按经过的时间衰减：轮询间隔差别很大，按样本数加权会偏向密集轮询的时段
+        rate = math.log(price / last[1]) ** 2 / elapsed
+        weight = 1 - 0.5 ** (elapsed / self.volatility_halflife)
+        self.variance = rate if self.variance is None else self.variance + weight * (rate - self.variance)
+    
+    def next_interval(self, price: float, levels: Iterable[float],
+                      rate_stats: Optional[Dict] = None) -> float:
+        """
+        计算下一次轮询的间隔并记录
+        
+        Args:
+            price: 最新价格
+            levels: 尚未成交的挂单价格（只需要价格两侧最近的挂单）
+            rate_stats: 查询类令牌桶的状态（TokenBucket.stats() 的返回值）
+        
+        Returns:
+            轮询间隔（秒）
+        """
+        distances = [abs(math.log(level / price)) for level in levels if level > 0] if price > 0 else []
+        distance = min(distances) if distances else None
+        volatility = self.volatility
+        
+        if distance is None:
+            interval, reason = self.max_interval, 'idle'
+        elif self.samples < self.warmup_samples or volatility is None:
+            interval, reason = self.warmup_interval, 'warmup'
+        elif volatility == 0:
+            interval, reason = self.max_interval, 'flat'
+        else:
+            interval, reason = (distance / (self._z * volatility)) ** 2, 'proximity'
+        
+        if interval < self.min_interval:
+            interval, reason = self.min_interval, 'min'
+        elif interval > self.max_interval:
+            interval, reason = self.max_interval, 'max'
+        
+        budget_interval = self._budget_interval(rate_stats)
+        if interval < budget_interval:
+            interval, reason = budget_interval, 'budget'
+        
+        self._record(PollRecord(time.time(), price, distance, volatility, interval, reason))
+        return interval
+    
+    def _budget_interval(self, rate_stats: Optional[Dict]) -> float:
+        """限流配额允许的最短间隔；令牌已耗尽或有请求排队时加倍"""
+        if not rate_stats or not rate_stats.get('rate'):
+            return 0.0
+        interval = self.requests_per_poll / (rate_stats['rate'] * self.budget_fraction * self.share)
+        if rate_stats.get('queue_depth') or rate_stats.get('tokens', self.requests_per_poll) < self.requests_per_poll:
+            interval *= 2
+        return min(interval, self.max_interval)
+    
+    def _record(self, record: PollRecord):
+        """保存一次选择，配置了 log_path 时追加到 CSV"""
+        self.history.append(record)
+        self.logger.debug(
+            "下次轮询 %.2fs (%s) 价格 %s "
+            "距离 %s 波动率 %s",
+            record.interval, record.reason, record.price, record.distance, record.volatility
+        )
+        if not self.log_path:
+            return
+        try:
+            write_header = not os.path.exists(self.log_path)
+            with open(self.log_path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow([field.name for field in fields(PollRecord)])
+                writer.writerow(astuple(record))
+        except OSError as e:
+            self.logger.warning("⚠️  写入轮询记录失败: %s", e)
+            self.log_path = None
+    
+    def stats(self) -> Dict:
+        """近期选择的间隔统计（用于日志和调参）"""
+        intervals = [record.interval for record in self.history]
+        if not intervals:
+            return {'count': 0}
+        return {
+            'count': len(intervals),
+            'mean': round(sum(intervals) / len(intervals), 3),
+            'min': round(min(intervals), 3),
+            'max': round(max(intervals), 3),
+            'last': round(intervals[-1], 3),
+            'reasons': dict(Counter(record.reason for record in self.history)),
+            'volatility': self.volatility
+        }
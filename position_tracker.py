@@ -0,0 +1,210 @@
+"""
+持仓与盈亏跟踪模块
+按成交事件增量更新净持仓、持仓均价、已实现/未实现盈亏、手续费和每个网格区间的往返利润，
+每笔成交 O(1)，快照只复制几个数值，可以随时用于界面显示和日志
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class PositionSnapshot:
+    """持仓快照"""
+    position: float  # 净持仓数量（正为多，负为空）
+    entry_price: float  # 持仓均价
+    mark_price: Optional[float]  # 计算未实现盈亏所用的价格
+    realized_pnl: float
+    unrealized_pnl: float
+    fees: float
+    volume: float  # 累计成交额
+    fills: int
+    buy_fills: int
+    sell_fills: int
+    round_trips: int  # 完成的网格往返次数
+    round_trip_profit: float  # 网格往返的累计利润（已扣手续费）
+    
+    @property
+    def total_pnl(self) -> float:
+        """总盈亏（已实现 + 未实现 - 手续费）"""
+        return self.realized_pnl + self.unrealized_pnl - self.fees
+    
+    def format(self) -> str:
+        """格式化为一行文本（用于日志和界面）"""
+        mark = f"{self.mark_price:.2f}" if self.mark_price is not None else "-"
+        return (
+            f"持仓 {self.position:.6f} 均价 {self.entry_price:.2f} "
+            f"已实现 {self.realized_pnl:.2f} 未实现 {self.unrealized_pnl:.2f} (按 {mark}) 手续费 {self.fees:.2f} "
+            f"成交 {self.fills} 笔 往返 {self.round_trips} 次 往返利润 {self.round_trip_profit:.2f}"
+        )
+
+
+class PositionTracker:
+    """
+    由成交驱动的持仓与盈亏跟踪器
+    
+    持仓均价按成交额加权：开仓或加仓时更新均价，减仓时按均价结算已实现盈亏，
+    反向开仓时超出部分以成交价为新均价。
+    
+    网格往返按相邻两层之间的区间统计：买单在第 i 层成交后的反向卖单挂在第 i+1 层，
+    两笔成交同属区间 i；区间内先后出现一买一卖即记为一次往返，利润为两笔成交的差价减去手续费
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """清空所有统计"""
+        self.position = 0.0
+        self.entry_price = 0.0
+        self.mark_price: Optional[float] = None
+        self.realized_pnl = 0.0
+        self.fees = 0.0
+        self.volume = 0.0
+        self.fills = 0
+        self.buy_fills = 0
+        self.sell_fills = 0
+        self.round_trips = 0
+        self.round_trip_profit = 0.0
+        # 区间 -> 尚未配对的一腿 (方向, 价格, 数量, 手续费)
+        self.open_legs: Dict[int, Tuple[str, float, float, float]] = {}
+        # 区间 -> [往返次数, 往返利润]
+        self.level_profit: Dict[int, list] = {}
+    
+    def restore(self, snapshot: PositionSnapshot):
+        """
+        从快照恢复统计（如进程重启后）
+        
+        快照不包含各区间尚未配对的一腿和分区间统计，恢复后从新的成交重新开始配对
+        """
+        self.reset()
+        self.position = snapshot.position
+        self.entry_price = snapshot.entry_price
+        self.mark_price = snapshot.mark_price
+        self.realized_pnl = snapshot.realized_pnl
+        self.fees = snapshot.fees
+        self.volume = snapshot.volume
+        self.fills = snapshot.fills
+        self.buy_fills = snapshot.buy_fills
+        self.sell_fills = snapshot.sell_fills
+        self.round_trips = snapshot.round_trips
+        self.round_trip_profit = snapshot.round_trip_profit
+    
+    def on_fill(self, side: str, price: float, quantity: float, fee: float = 0.0,
+                level: Optional[int] = None) -> float:
+        """
+        记录一笔成交
+        
+        Args:
+            side: 'buy' 或 'sell'
+            price: 成交价格
+            quantity: 成交数量
+            fee: 手续费（金额）
+            level: 成交订单所在的网格层级，用于统计往返利润
+        
+        Returns:
+            本笔成交产生的已实现盈亏（不含手续费）
+        """
+        self.fills += 1
+        if side == 'buy':
+            self.buy_fills += 1
+            signed = quantity
+        else:
+            self.sell_fills += 1
+            signed = -quantity
+        notional = price * quantity
+        self.volume += notional
+        self.fees += fee
+        if level is not None:
+            self._match_leg(level, side, price, quantity, fee)
+        
+        position = self.position
+        if position == 0 or (position > 0) == (signed > 0):
+            # 开仓或加仓
+            self.entry_price = (self.entry_price * abs(position) + notional) / (abs(position) + quantity)
+            self.position = position + signed
+            return 0.0
+        
+        # 减仓（数量超过持仓时反向开仓）
+        closed = min(quantity, abs(position))
+        realized = closed * (price - self.entry_price) * (1 if position > 0 else -1)
+        self.realized_pnl += realized
+        self.position = position + signed
+        if abs(self.position) < 1e-12:
+            self.position = 0.0
+            self.entry_price = 0.0
+        elif quantity > closed:
+            self.entry_price = price
+        return realized
+    
+    def _match_leg(self, level: int, side: str, price: float, quantity: float, fee: float):
+        """把成交与同一区间内方向相反的上一腿配对"""
+        pair = level if side == 'buy' else level - 1
+        leg = self.open_legs.pop(pair, None)
+        if leg is None or leg[0] == side:
+            self.open_legs[pair] = (side, price, quantity, fee)
+            return
+        
+        _, leg_price, leg_quantity, leg_fee = leg
+        matched = min(quantity, leg_quantity)
+        sell_price, buy_price = (price, leg_price) if side == 'sell' else (leg_price, price)
+        profit = (sell_price - buy_price) * matched - fee - leg_fee
+        self.round_trips += 1
+        self.round_trip_profit += profit
+        stats = self.level_profit.setdefault(pair, [0, 0.0])
+        stats[0] += 1
+        stats[1] += profit
+    
+    def close_position(self, price: float) -> float:
+        """
+        按给定价格结算全部持仓（如强平），不计为成交
+        
+        Returns:
+            结算的已实现盈亏
+        """
+        realized = (price - self.entry_price) * self.position
+        self.realized_pnl += realized
+        self.position = 0.0
+        self.entry_price = 0.0
+        self.open_legs.clear()
+        return realized
+    
+    def mark(self, price: float):
+        """更新计算未实现盈亏所用的价格"""
+        self.mark_price = price
+    
+    def unrealized_pnl(self, price: Optional[float] = None) -> float:
+        """按给定价格（默认为最近一次 mark 的价格）计算未实现盈亏"""
+        if price is None:
+            price = self.mark_price
+        if price is None or not self.position:
+            return 0.0
+        return (price - self.entry_price) * self.position
+    
+    def snapshot(self, price: Optional[float] = None) -> PositionSnapshot:
+        """
+        生成当前状态的快照（O(1)）
+        
+        Args:
+            price: 计算未实现盈亏的价格，默认为最近一次 mark 的价格
+        """
+        if price is None:
+            price = self.mark_price
+        return PositionSnapshot(
+            position=self.position,
+            entry_price=self.entry_price,
+            mark_price=price,
+            realized_pnl=self.realized_pnl,
+            unrealized_pnl=self.unrealized_pnl(price),
+            fees=self.fees,
+            volume=self.volume,
+            fills=self.fills,
+            buy_fills=self.buy_fills,
+            sell_fills=self.sell_fills,
+            round_trips=self.round_trips,
+            round_trip_profit=self.round_trip_profit
+        )
+    
+    def level_stats(self) -> Dict[int, Tuple[int, float]]:
+        """各区间的 (往返次数, 往返利润)，区间 i 指第 i 层与第 i+1 层之间"""
+        return {pair: (stats[0], stats[1]) for pair, stats in sorted(self.level_profit.items())}
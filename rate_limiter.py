@@ -0,0 +1,317 @@
+"""
+客户端限流模块
+按接口类别（下单 / 撤单 / 查询）维护令牌桶，并根据交易所返回的
+Retry-After 与限流响应头自适应调整补充速率（AIMD：成功时线性加速，被限流时减半）
+"""
+
+import asyncio
+import multiprocessing
+import time
+import logging
+from typing import Dict, Mapping, Optional
+
+
+# 接口类别
+ORDERS = 'orders'
+CANCELS = 'cancels'
+READS = 'reads'
+
+# 默认限流参数（每秒请求数 / 突发容量 / 自适应上限）
+DEFAULT_RATE_LIMITS = {
+    ORDERS: {'rate': 10.0, 'burst': 20, 'max_rate': 50.0},
+    CANCELS: {'rate': 10.0, 'burst': 20, 'max_rate': 50.0},
+    READS: {'rate': 20.0, 'burst': 40, 'max_rate': 100.0},
+}
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    """解析响应头中的数值，无法解析时返回 None"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶（仅在单个事件循环内使用）"""
+    
+    def __init__(self, rate: float, burst: int, max_rate: Optional[float] = None,
+                 min_rate: float = 0.5, increase_step: float = 0.5):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate: 初始补充速率（令牌/秒）
+            burst: 桶容量（允许的突发请求数）
+            max_rate: 自适应加速的速率上限，默认为初始速率的 5 倍
+            min_rate: 被限流后减速的速率下限
+            increase_step: 每次成功请求后增加的速率
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_rate = float(max_rate) if max_rate else self.rate * 5
+        self.min_rate = float(min_rate)
+        self.increase_step = float(increase_step)
+        
+        self.tokens = self.burst
+        self.waiting = 0  # 正在等待令牌的请求数
+        self.throttled_count = 0  # 被交易所限流的次数
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self._updated_at = now
+    
+    async def acquire(self, tokens: float = 1.0):
+        """
+        获取令牌，令牌不足时按先来先得的顺序等待
+        
+        Args:
+            tokens: 需要的令牌数
+        """
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return
+                    await asyncio.sleep((tokens - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+    
+    def on_success(self):
+        """请求成功，线性提高速率"""
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+    
+    def on_throttled(self, retry_after: Optional[float] = None):
+        """
+        被交易所限流（HTTP 429），速率减半并在 retry_after 秒内暂停发放令牌
+        
+        Args:
+            retry_after: 交易所要求的等待秒数
+        """
+        self.throttled_count += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        if retry_after and retry_after > 0:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+    
+    def sync_remaining(self, remaining: float, reset_after: Optional[float] = None):
+        """
+        按交易所报告的剩余配额校准本地令牌数
+        
+        Args:
+            remaining: 当前窗口内剩余的请求数
+            reset_after: 距窗口重置的秒数
+        """
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, max(0.0, remaining))
+        if reset_after and reset_after > 0:
+            # 剩余配额需要在窗口重置前均匀使用
+            self.rate = max(self.min_rate, min(self.rate, max(remaining, 1.0) / reset_after))
+            if remaining <= 0:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + reset_after)
+    
+    def stats(self) -> Dict:
+        """当前速率、令牌数和排队深度（只读，可在其他线程中调用）"""
+        now = time.monotonic()
+        tokens = min(self.burst, self.tokens + max(0.0, now - self._updated_at) * self.rate)
+        return {
+            'rate': round(self.rate, 3),
+            'tokens': round(tokens, 3),
+            'queue_depth': self.waiting,
+            'throttled_count': self.throttled_count,
+            'blocked_for': round(max(0.0, self._blocked_until - now), 3)
+        }
+
+
+def _shared_field(index: int) -> property:
+    """把共享数组中的一个元素映射为属性"""
+    def getter(self):
+        return self.state[index]
+    
+    def setter(self, value):
+        self.state[index] = value
+    
+    return property(getter, setter)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    跨进程共享的令牌桶
+    
+    令牌数、补充速率和暂停时刻保存在共享内存（multiprocessing.Array）中，
+    所有进程从同一个桶中取令牌，任一进程被交易所限流后所有进程一起减速。
+    进程内仍按先来先得排队，进程之间不保证顺序
+    """
+    
+    tokens = _shared_field(0)
+    _updated_at = _shared_field(1)
+    rate = _shared_field(2)
+    _blocked_until = _shared_field(3)
+    throttled_count = _shared_field(4)
+    
+    def __init__(self, state, rate: float, burst: int, max_rate: Optional[float] = None,
+                 min_rate: float = 0.5, increase_step: float = 0.5):
+        """
+        初始化共享令牌桶（不修改共享状态，进程重启后沿用其他进程的速率和令牌）
+        
+        Args:
+            state: create_shared_state 创建的共享数组
+            其余参数同 TokenBucket，当前速率以共享数组中的值为准
+        """
+        self.state = state
+        self.burst = float(burst)
+        self.max_rate = float(max_rate) if max_rate else float(rate) * 5
+        self.min_rate = float(min_rate)
+        self.increase_step = float(increase_step)
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: float = 1.0):
+        """获取令牌，只在读写共享状态时持有跨进程锁，等待期间不占用"""
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    with self.state.get_lock():
+                        now = time.monotonic()
+                        self._refill(now)
+                        if now < self._blocked_until:
+                            delay = self._blocked_until - now
+                        elif self.tokens >= tokens:
+                            self.tokens -= tokens
+                            return
+                        else:
+                            delay = (tokens - self.tokens) / self.rate
+                    await asyncio.sleep(delay)
+        finally:
+            self.waiting -= 1
+    
+    def on_success(self):
+        """同 TokenBucket，在跨进程锁内修改共享状态"""
+        with self.state.get_lock():
+            super().on_success()
+    
+    def on_throttled(self, retry_after: Optional[float] = None):
+        """同 TokenBucket，在跨进程锁内修改共享状态"""
+        with self.state.get_lock():
+            super().on_throttled(retry_after)
+    
+    def sync_remaining(self, remaining: float, reset_after: Optional[float] = None):
+        """同 TokenBucket，在跨进程锁内修改共享状态"""
+        with self.state.get_lock():
+            super().sync_remaining(remaining, reset_after)
+    
+    def stats(self) -> Dict:
+        """当前速率、令牌数（所有进程共用）和本进程的排队深度"""
+        with self.state.get_lock():
+            stats = super().stats()
+        stats['throttled_count'] = int(stats['throttled_count'])
+        return stats
+
+
+def _bucket_params(limits: Optional[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """合并默认值和配置中的限流参数"""
+    params = {}
+    for name, defaults in DEFAULT_RATE_LIMITS.items():
+        params[name] = dict(defaults)
+        params[name].update((limits or {}).get(name, {}))
+    return params
+
+
+def create_shared_state(limits: Optional[Dict[str, Dict]] = None, context=None) -> Dict:
+    """
+    创建多进程共用的限流状态，需要在启动子进程前创建并作为参数传给子进程
+    
+    Args:
+        limits: 各接口类别的限流参数（所有进程合计），格式同 RateLimiter
+        context: multiprocessing 上下文，默认为 multiprocessing 模块
+    
+    Returns:
+        接口类别 -> 共享数组，传给 RateLimiter / LighterAPI 的 shared_rate_state
+    """
+    context = context or multiprocessing
+    now = time.monotonic()
+    return {
+        name: context.Array('d', [float(params['burst']), now, float(params['rate']), 0.0, 0.0])
+        for name, params in _bucket_params(limits).items()
+    }
+
+
+class RateLimiter:
+    """按接口类别划分令牌桶的限流器"""
+    
+    def __init__(self, limits: Optional[Dict[str, Dict]] = None, shared_state: Optional[Dict] = None):
+        """
+        初始化限流器
+        
+        Args:
+            limits: 各接口类别的限流参数，如 {'orders': {'rate': 10, 'burst': 20}}，
+                    未指定的类别使用 DEFAULT_RATE_LIMITS
+            shared_state: create_shared_state 创建的共享状态，设置后各类别使用跨进程共享的令牌桶
+        """
+        self.buckets: Dict[str, TokenBucket] = {}
+        for name, params in _bucket_params(limits).items():
+            if shared_state is not None:
+                self.buckets[name] = SharedTokenBucket(shared_state[name], **params)
+            else:
+                self.buckets[name] = TokenBucket(**params)
+        self.logger = logging.getLogger(__name__)
+    
+    def bucket(self, rate_class: str) -> TokenBucket:
+        """获取指定类别的令牌桶"""
+        return self.buckets[rate_class]
+    
+    async def acquire(self, rate_class: str, tokens: float = 1.0):
+        """获取指定类别的令牌"""
+        await self.bucket(rate_class).acquire(tokens)
+    
+    def observe(self, rate_class: str, status: int, headers: Mapping[str, str]):
+        """
+        根据响应状态码和限流响应头调整速率
+        
+        Args:
+            rate_class: 接口类别
+            status: HTTP 状态码
+            headers: 响应头
+        """
+        bucket = self.bucket(rate_class)
+        if status == 429:
+            retry_after = _parse_float(headers.get('Retry-After'))
+            bucket.on_throttled(retry_after)
+            if retry_after:
+                self.logger.warning(
+                    "触发交易所限流 (%s)，速率降至 %.2f/s，暂停 %.1f 秒", rate_class, bucket.rate, retry_after
+                )
+            else:
+                self.logger.warning("触发交易所限流 (%s)，速率降至 %.2f/s", rate_class, bucket.rate)
+            return
+        
+        if 200 <= status < 300:
+            bucket.on_success()
+        
+        remaining = _parse_float(headers.get('X-RateLimit-Remaining'))
+        if remaining is not None:
+            reset_after = _parse_float(headers.get('X-RateLimit-Reset'))
+            if reset_after is not None and reset_after > 1e9:
+                # 部分交易所返回的是重置时刻的 Unix 时间戳
+                reset_after = reset_after - time.time()
+            bucket.sync_remaining(remaining, reset_after)
+    
+    def stats(self) -> Dict[str, Dict]:
+        """各类别的当前速率和排队深度，用于监控"""
+        return {name: bucket.stats() for name, bucket in self.buckets.items()}
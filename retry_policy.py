@@ -0,0 +1,111 @@
+"""
+重试策略模块
+为每类接口定义带总截止时间的重试策略，并在整个客户端内共享重试预算，
+保证任何一次 API 调用的最长耗时有上界
+"""
+
+import random
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+from rate_limiter import ORDERS, CANCELS, READS
+
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+@dataclass
+class RetryPolicy:
+    """单类接口的重试策略"""
+    max_retries: int = 3  # 最大重试次数（不含首次请求）
+    deadline: float = 60.0  # 单次调用（含所有重试和排队）的总截止时间（秒）
+    backoff_base: float = 0.5  # 退避基数（秒）
+    backoff_max: float = 8.0  # 单次退避上限（秒）
+    # 请求可能已到达交易所的失败（超时、连接中断）是否重试；非幂等接口应为 False
+    retry_ambiguous: bool = True
+    retry_statuses: Tuple[int, ...] = DEFAULT_RETRY_STATUSES
+    
+    def as_idempotent(self) -> "RetryPolicy":
+        """请求携带客户端订单 ID 时，交易所会去重，可以像幂等请求一样重试"""
+        return replace(self, retry_ambiguous=True, retry_statuses=DEFAULT_RETRY_STATUSES)
+    
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter 指数退避）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def build_retry_policies(max_retries: int = 3, retry_backoff: float = 0.5, deadline: float = 60.0,
+                         overrides: Optional[Dict[str, Dict]] = None) -> Dict[str, RetryPolicy]:
+    """
+    构造各接口类别的默认重试策略
+    
+    下单是非幂等的：只在请求确定未被处理时重试（连接未建立、429、503），
+    超时或连接中断后不盲目重发，避免重复下单；携带客户端订单 ID 的下单
+    使用 RetryPolicy.as_idempotent() 放宽限制。
+    
+    Args:
+        max_retries: 最大重试次数
+        retry_backoff: 退避基数（秒）
+        deadline: 单次调用的总截止时间（秒）
+        overrides: 按类别覆盖的策略参数，如 {'orders': {'max_retries': 1}}
+    
+    Returns:
+        类别到重试策略的映射
+    """
+    common = {'max_retries': max_retries, 'backoff_base': retry_backoff, 'deadline': deadline}
+    policies = {
+        READS: RetryPolicy(**common),
+        CANCELS: RetryPolicy(**common),
+        ORDERS: RetryPolicy(**common, retry_ambiguous=False, retry_statuses=(429, 503)),
+    }
+    for name, params in (overrides or {}).items():
+        if name in policies:
+            params = dict(params)
+            if 'retry_statuses' in params:
+                params['retry_statuses'] = tuple(params['retry_statuses'])
+            policies[name] = replace(policies[name], **params)
+    return policies
+
+
+class RetryBudget:
+    """
+    客户端共享的重试预算
+    
+    每个请求存入 ratio 个令牌，每次重试消耗 1 个令牌；
+    交易所整体故障时重试次数被限制在请求量的 ratio 倍以内，避免重试风暴
+    """
+    
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 20.0):
+        """
+        初始化重试预算
+        
+        Args:
+            ratio: 每个请求存入的令牌数（允许的重试/请求比例）
+            max_tokens: 令牌上限（允许的突发重试数）
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.retries = 0  # 已执行的重试次数
+        self.rejected = 0  # 因预算耗尽而放弃的重试次数
+    
+    def on_request(self):
+        """记录一次请求"""
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        """尝试为一次重试消耗预算，预算不足时返回 False"""
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.rejected += 1
+        return False
+    
+    def stats(self) -> Dict:
+        """预算使用情况"""
+        return {
+            'tokens': round(self.tokens, 3),
+            'retries': self.retries,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,467 @@
+"""
+网格风险模拟模块
+用蒙特卡洛方法模拟大量价格路径（几何布朗运动，或从历史收益率中自助抽样），
+按批次用 NumPy 同时推进所有路径，统计持仓、未实现盈亏、保证金占用和强平概率的分布
+
+撮合规则与 backtester 一致：价格穿过挂单价格时以挂单价格成交（收 maker 手续费），
+买单成交后在上一层挂卖单，卖单成交后在下一层挂买单。这种网格任何时刻都是
+“下方全是买单、上方全是卖单、中间最多空一层”，因此每条路径只需记录买单上界和卖单下界
+两个层级号，无需逐笔模拟订单
+
+使用方法:
+    python risk_simulator.py 45000 --volatility 0.6 --days 30 --paths 10000
+    python risk_simulator.py 45000 --history trades.ticks --stride 600
+"""
+
+import argparse
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from grid_trading_strategy import GridTradingStrategy
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+
+MODEL_GBM = 'gbm'
+MODEL_BOOTSTRAP = 'bootstrap'
+
+# 报告中的分位数
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _pad(label: str, width: int) -> str:
+    """按显示宽度（中文字符占两格）左对齐"""
+    used = sum(2 if ord(char) > 0x2E80 else 1 for char in label)
+    return label + " " * max(0, width - used)
+
+
+def _require_numpy():
+    """未安装 NumPy 时报错"""
+    if np is None:
+        raise RuntimeError("风险模拟需要安装 NumPy")
+
+
+def historical_returns(path: str, stride: int = 1, start: Any = None, end: Any = None) -> "np.ndarray":
+    """
+    从历史数据计算对数收益率，供自助抽样使用
+    
+    Args:
+        path: 数据文件或 tick_store 列式存储目录（格式见 backtester.read_price_path）
+        stride: 每隔多少个价格取一个点，决定每步收益率对应的时间跨度
+        start: 开始时间（含），仅列式存储支持
+        end: 结束时间（不含），仅列式存储支持
+    
+    Returns:
+        对数收益率数组
+    """
+    _require_numpy()
+    from backtester import read_price_path
+    from tick_store import TickStore, is_tick_store
+    
+    if is_tick_store(path):
+        with TickStore(path) as store:
+            prices = np.array(store.slice(start, end).arrays()['price'][::stride])
+    else:
+        prices = np.fromiter((price for _, price in read_price_path(path, start, end)), dtype=np.float64)[::stride]
+    prices = prices[prices > 0]
+    if len(prices) < 2:
+        raise ValueError("历史数据不足，无法计算收益率")
+    return np.diff(np.log(prices))
+
+
+@dataclass
+class RiskReport:
+    """风险模拟结果（各数组每个元素对应一条路径）"""
+    model: str
+    paths: int
+    steps: int
+    current_price: float
+    initial_capital: float
+    final_price: Any = None
+    position: Any = None  # 最终持仓数量（强平路径为 0）
+    inventory_value: Any = None  # 最终持仓名义价值（带方向）
+    unrealized_pnl: Any = None
+    total_pnl: Any = None
+    fees: Any = None
+    fills: Any = None
+    max_inventory_value: Any = None  # 持仓名义价值绝对值的峰值
+    max_margin_used: Any = None
+    max_drawdown: Any = None
+    liquidated: Any = None  # 是否发生强平
+    liquidation_step: Any = None  # 强平发生的步数（未强平为 -1）
+    below_grid: Any = None  # 价格是否跌破网格下限
+    above_grid: Any = None  # 价格是否突破网格上限
+    elapsed: float = 0.0
+    extra: Dict = field(default_factory=dict)
+    
+    @property
+    def liquidation_probability(self) -> float:
+        return float(self.liquidated.mean())
+    
+    def distribution(self, values) -> Dict[str, float]:
+        """计算分布的均值和分位数"""
+        values = np.asarray(values, dtype=np.float64)
+        result = {'mean': float(values.mean())}
+        for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            result[f"p{q}"] = float(value)
+        return result
+    
+    def summary(self) -> Dict:
+        """各指标分布的摘要"""
+        return {
+            'model': self.model,
+            'paths': self.paths,
+            'steps': self.steps,
+            'initial_capital': self.initial_capital,
+            'liquidation_probability': self.liquidation_probability,
+            'below_grid_probability': float(self.below_grid.mean()),
+            'above_grid_probability': float(self.above_grid.mean()),
+            'final_price': self.distribution(self.final_price),
+            'position': self.distribution(self.position),
+            'inventory_value': self.distribution(self.inventory_value),
+            'unrealized_pnl': self.distribution(self.unrealized_pnl),
+            'total_pnl': self.distribution(self.total_pnl),
+            'max_inventory_value': self.distribution(self.max_inventory_value),
+            'max_margin_used': self.distribution(self.max_margin_used),
+            'max_drawdown': self.distribution(self.max_drawdown),
+            'fills': self.distribution(self.fills)
+        }
+    
+    def format_report(self) -> str:
+        """格式化为文本报告（命令行和图形界面共用）"""
+        summary = self.summary()
+        model = "几何布朗运动" if self.model == MODEL_GBM else "历史收益率抽样"
+        lines = [
+            f"模型: {model}  路径数: {self.paths}  步数: {self.steps}  耗时: {self.elapsed:.2f}s",
+            f"初始资金: {self.initial_capital:.2f} USDT",
+            f"强平概率: {summary['liquidation_probability'] * 100:.2f}%",
+            f"跌破下限概率: {summary['below_grid_probability'] * 100:.2f}%  "
+            f"突破上限概率: {summary['above_grid_probability'] * 100:.2f}%",
+            "",
+            f"{_pad('指标', 14)}{'P5':>12}{'P50':>12}{'P95':>12}"
+        ]
+        rows = (
+            ('最终价格', 'final_price'),
+            ('最终持仓价值', 'inventory_value'),
+            ('未实现盈亏', 'unrealized_pnl'),
+            ('总盈亏', 'total_pnl'),
+            ('持仓价值峰值', 'max_inventory_value'),
+            ('保证金峰值', 'max_margin_used'),
+            ('成交次数', 'fills')
+        )
+        for label, key in rows:
+            stats = summary[key]
+            lines.append(f"{_pad(label, 14)}{stats['p5']:>12.2f}{stats['p50']:>12.2f}{stats['p95']:>12.2f}")
+        stats = summary['max_drawdown']
+        lines.append(
+            f"{_pad('最大回撤', 14)}{stats['p5'] * 100:>11.2f}%{stats['p50'] * 100:>11.2f}%{stats['p95'] * 100:>11.2f}%"
+        )
+        return "\n".join(lines)
+    
+    def print_report(self):
+        """打印模拟报告"""
+        print("\n" + "="*60)
+        print("风险模拟报告")
+        print("="*60)
+        print(self.format_report())
+        print("="*60 + "\n")
+
+
+class RiskSimulator:
+    """
+    网格蒙特卡洛风险模拟器
+    
+    所有路径同时推进：每一步生成一批价格，用 searchsorted 找出每条路径穿过的层级，
+    用数量和成交额的前缀和一次算出本步的成交量（同一步穿过多个层级时按成交均价合并为一笔）
+    """
+    
+    def __init__(self, strategy: GridTradingStrategy, initial_capital: Optional[float] = None,
+                 maker_fee: float = 0.0002, maintenance_margin_rate: float = 0.005,
+                 fill_on_touch: bool = False):
+        """
+        初始化风险模拟器
+        
+        Args:
+            strategy: 网格策略（只读取层级价格、数量和杠杆，不改变其状态）
+            initial_capital: 账户资金，默认为按起始价格计算的所需保证金（total_capital_needed）
+            maker_fee: 挂单成交的手续费率
+            maintenance_margin_rate: 维持保证金率，权益低于 持仓价值 * 该比例 时强平
+            fill_on_touch: 价格触及挂单价格即成交；默认需要价格穿过挂单价格才成交
+        """
+        _require_numpy()
+        self.strategy = strategy
+        self.initial_capital = initial_capital
+        self.maker_fee = maker_fee
+        self.maintenance_margin_rate = maintenance_margin_rate
+        self.fill_on_touch = fill_on_touch
+        
+        self.level_prices = np.array([float(price) for price in strategy.grid_prices], dtype=np.float64)
+        lot_size = float(strategy.lot_size)
+        quantities = np.array(strategy.level_lots, dtype=np.float64) * lot_size
+        # 前缀和：层级 [a, b) 的数量之和 = quantity_prefix[b] - quantity_prefix[a]
+        self.quantity_prefix = np.concatenate(([0.0], np.cumsum(quantities)))
+        self.value_prefix = np.concatenate(([0.0], np.cumsum(quantities * self.level_prices)))
+        self.logger = logging.getLogger(__name__)
+    
+    def simulate_gbm(self, current_price: float, volatility: float, days: float = 30.0,
+                     paths: int = 10000, steps: int = 1000, drift: float = 0.0,
+                     seed: Optional[int] = None) -> RiskReport:
+        """
+        用几何布朗运动模拟价格路径
+        
+        Args:
+            current_price: 起始价格（网格按此价格布置）
+            volatility: 年化波动率（如 0.6 表示 60%）
+            days: 模拟的天数
+            paths: 路径数
+            steps: 每条路径的步数
+            drift: 年化漂移率
+            seed: 随机数种子
+        
+        Returns:
+            模拟结果
+        """
+        dt = days / 365.0 / steps
+        mean = (drift - 0.5 * volatility ** 2) * dt
+        scale = volatility * dt ** 0.5
+        rng = np.random.default_rng(seed)
+        report = self._simulate(current_price, paths, steps, lambda size: mean + scale * rng.standard_normal(size))
+        report.model = MODEL_GBM
+        report.extra = {'volatility': volatility, 'days': days, 'drift': drift}
+        return report
+    
+    def simulate_bootstrap(self, current_price: float, returns, paths: int = 10000,
+                           steps: Optional[int] = None, seed: Optional[int] = None) -> RiskReport:
+        """
+        从历史对数收益率中有放回地抽样生成价格路径
+        
+        Args:
+            current_price: 起始价格（网格按此价格布置）
+            returns: 对数收益率（如 historical_returns() 的结果）
+            paths: 路径数
+            steps: 每条路径的步数，默认与收益率个数相同
+            seed: 随机数种子
+        
+        Returns:
+            模拟结果
+        """
+        returns = np.asarray(returns, dtype=np.float64)
+        if len(returns) == 0:
+            raise ValueError("收益率序列为空")
+        rng = np.random.default_rng(seed)
+        report = self._simulate(current_price, paths, steps or len(returns), lambda size: rng.choice(returns, size))
+        report.model = MODEL_BOOTSTRAP
+        report.extra = {'samples': len(returns)}
+        return report
+    
+    def _simulate(self, current_price: float, paths: int, steps: int,
+                  sample: Callable[[tuple], "np.ndarray"], block: int = 64) -> RiskReport:
+        """
+        推进所有路径
+        
+        Args:
+            current_price: 起始价格
+            paths: 路径数
+            steps: 步数
+            sample: 按给定形状生成对数收益率的函数
+            block: 每次生成多少步的随机数
+        """
+        started = time.perf_counter()
+        
+        strategy = self.strategy
+        capital = self.initial_capital
+        if capital is None:
+            capital = strategy.summarize_grid(current_price)['total_capital_needed']
+        levels = self.level_prices
+        q_prefix, v_prefix = self.quantity_prefix, self.value_prefix
+        leverage = strategy.leverage
+        fee_rate = self.maker_fee
+        maintenance_rate = self.maintenance_margin_rate
+        buy_side, sell_side = ('left', 'right') if self.fill_on_touch else ('right', 'left')
+        lower, upper = levels[0], levels[-1]
+        
+        # 每条路径的网格状态: 买单在 [0, buy_end)，卖单在 [sell_start, 层级数)
+        buy_end0, sell_start0 = strategy.book.side_ranges(current_price)
+        buy_end = np.full(paths, buy_end0, dtype=np.int64)
+        sell_start = np.full(paths, sell_start0, dtype=np.int64)
+        
+        price = np.full(paths, float(current_price))
+        position = np.zeros(paths)
+        entry = np.zeros(paths)
+        cash = np.zeros(paths)  # 成交产生的现金流（卖出为正，买入为负）
+        realized = np.zeros(paths)
+        fees = np.zeros(paths)
+        fills = np.zeros(paths, dtype=np.int64)
+        peak_equity = np.full(paths, float(capital))
+        max_drawdown = np.zeros(paths)
+        max_drawdown_value = np.zeros(paths)
+        max_inventory = np.zeros(paths)
+        max_margin = np.zeros(paths)
+        alive = np.ones(paths, dtype=bool)
+        liquidation_step = np.full(paths, -1, dtype=np.int64)
+        below = np.zeros(paths, dtype=bool)
+        above = np.zeros(paths, dtype=bool)
+        
+        step = 0
+        while step < steps:
+            increments = sample((min(block, steps - step), paths))
+            for increment in increments:
+                step += 1
+                price = np.where(alive, price * np.exp(increment), price)
+                below |= price < lower
+                above |= price > upper
+                
+                # 下跌穿过的买单 [buy_index, buy_end)，上涨穿过的卖单 [sell_start, sell_index)
+                buy_index = np.searchsorted(levels, price, side=buy_side)
+                sell_index = np.searchsorted(levels, price, side=sell_side)
+                down = alive & (buy_index < buy_end)
+                up = alive & (sell_index > sell_start)
+                if down.any() or up.any():
+                    buy_qty = np.where(down, q_prefix[buy_end] - q_prefix[np.minimum(buy_index, buy_end)], 0.0)
+                    buy_value = np.where(down, v_prefix[buy_end] - v_prefix[np.minimum(buy_index, buy_end)], 0.0)
+                    sell_qty = np.where(up, q_prefix[np.maximum(sell_index, sell_start)] - q_prefix[sell_start], 0.0)
+                    sell_value = np.where(up, v_prefix[np.maximum(sell_index, sell_start)] - v_prefix[sell_start], 0.0)
+                    fills += np.where(down, buy_end - buy_index, 0) + np.where(up, sell_index - sell_start, 0)
+                    
+                    # 成交后的网格状态：空出的一层在最后成交层级
+                    buy_end, sell_start = (
+                        np.where(down, buy_index, np.where(up, sell_index - 1, buy_end)),
+                        np.where(down, buy_index + 1, np.where(up, sell_index, sell_start))
+                    )
+                    
+                    quantity = buy_qty + sell_qty
+                    value = buy_value + sell_value
+                    signed = buy_qty - sell_qty
+                    cash += sell_value - buy_value
+                    fees += value * fee_rate
+                    position, entry, realized = self._apply_fills(position, entry, realized, signed, quantity, value)
+                
+                # 按当前价格计算权益、回撤、保证金和强平
+                notional = np.abs(position) * price
+                equity = capital + cash + position * price - fees
+                np.maximum(peak_equity, equity, out=peak_equity)
+                # 与 Backtester 相同：记录最大回撤金额出现时的回撤比例
+                drawdown_value = np.where(alive, peak_equity - equity, 0.0)
+                deeper = drawdown_value > max_drawdown_value
+                if deeper.any():
+                    max_drawdown_value = np.where(deeper, drawdown_value, max_drawdown_value)
+                    max_drawdown = np.where(
+                        deeper,
+                        np.divide(drawdown_value, peak_equity, out=np.zeros(paths), where=peak_equity > 0),
+                        max_drawdown
+                    )
+                np.maximum(max_inventory, np.where(alive, notional, 0.0), out=max_inventory)
+                np.maximum(max_margin, np.where(alive, notional / leverage, 0.0), out=max_margin)
+                
+                liquidate = alive & (position != 0) & (equity <= notional * maintenance_rate)
+                if liquidate.any():
+                    # 强平：按当前价格平掉全部持仓，路径停止
+                    realized = np.where(liquidate, realized + (price - entry) * position, realized)
+                    cash = np.where(liquidate, cash + position * price, cash)
+                    position = np.where(liquidate, 0.0, position)
+                    entry = np.where(liquidate, 0.0, entry)
+                    liquidation_step[liquidate] = step
+                    alive &= ~liquidate
+        
+        unrealized = (price - entry) * position
+        report = RiskReport(
+            model='',
+            paths=paths,
+            steps=steps,
+            current_price=float(current_price),
+            initial_capital=float(capital),
+            final_price=price,
+            position=position,
+            inventory_value=position * price,
+            unrealized_pnl=unrealized,
+            total_pnl=cash + position * price - fees,
+            fees=fees,
+            fills=fills,
+            max_inventory_value=max_inventory,
+            max_margin_used=max_margin,
+            max_drawdown=max_drawdown,
+            liquidated=liquidation_step >= 0,
+            liquidation_step=liquidation_step,
+            below_grid=below,
+            above_grid=above
+        )
+        report.elapsed = time.perf_counter() - started
+        return report
+    
+    @staticmethod
+    def _apply_fills(position, entry, realized, signed, quantity, value):
+        """按本步成交更新持仓、均价和已实现盈亏（与 PositionTracker.on_fill 相同的规则）"""
+        filled = quantity > 0
+        fill_price = np.divide(value, quantity, out=np.zeros_like(value), where=filled)
+        size = np.abs(position)
+        opening = filled & ((position == 0) | ((position > 0) == (signed > 0)))
+        closing = filled & ~opening
+        
+        # 开仓或加仓：更新均价
+        new_entry = np.where(
+            opening,
+            np.divide(entry * size + value, size + quantity, out=np.zeros_like(value), where=opening),
+            entry
+        )
+        
+        # 减仓（数量超过持仓时按成交价反向开仓）
+        closed = np.minimum(quantity, size)
+        direction = np.where(position > 0, 1.0, -1.0)
+        realized = np.where(closing, realized + closed * (fill_price - entry) * direction, realized)
+        new_position = position + signed
+        flat = closing & (np.abs(new_position) < 1e-12)
+        new_position = np.where(flat, 0.0, new_position)
+        new_entry = np.where(flat, 0.0, np.where(closing & (quantity > closed), fill_price, new_entry))
+        return new_position, new_entry, realized
+
+
+def main():
+    """主函数：用 config.json 中的交易配置模拟风险"""
+    from config import Config
+    
+    parser = argparse.ArgumentParser(description="网格蒙特卡洛风险模拟")
+    parser.add_argument('price', type=float, help="起始价格")
+    parser.add_argument('--paths', type=int, default=10000, help="路径数")
+    parser.add_argument('--steps', type=int, default=1000, help="每条路径的步数")
+    parser.add_argument('--volatility', type=float, default=0.6, help="年化波动率（几何布朗运动）")
+    parser.add_argument('--days', type=float, default=30.0, help="模拟天数（几何布朗运动）")
+    parser.add_argument('--drift', type=float, default=0.0, help="年化漂移率（几何布朗运动）")
+    parser.add_argument('--history', default=None, help="历史数据文件或列式存储目录，指定后从历史收益率中抽样")
+    parser.add_argument('--stride', type=int, default=1, help="历史价格的采样间隔")
+    parser.add_argument('--capital', type=float, default=None, help="账户资金（默认为所需保证金）")
+    parser.add_argument('--maker-fee', type=float, default=0.0002, help="挂单手续费率")
+    parser.add_argument('--maintenance-margin', type=float, default=0.005, help="维持保证金率")
+    parser.add_argument('--seed', type=int, default=None, help="随机数种子")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    trading_config = Config.get_trading_config()
+    if not trading_config:
+        print("❌ 未找到交易配置，请先运行交互式配置脚本:")
+        print("   python interactive_setup.py")
+        return
+    
+    strategy = GridTradingStrategy(**trading_config)
+    simulator = RiskSimulator(
+        strategy,
+        initial_capital=args.capital,
+        maker_fee=args.maker_fee,
+        maintenance_margin_rate=args.maintenance_margin
+    )
+    if args.history:
+        returns = historical_returns(args.history, args.stride)
+        report = simulator.simulate_bootstrap(args.price, returns, args.paths, args.steps, args.seed)
+    else:
+        report = simulator.simulate_gbm(
+            args.price, args.volatility, args.days, args.paths, args.steps, args.drift, args.seed
+        )
+    report.print_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ fi
 if [ ! -f "requirements.txt" ]; then
     echo "⚠️  未找到 requirements.txt，正在创建..."
     cat > requirements.txt << EOF
-requests>=2.31.0
+aiohttp>=3.9.0
 EOF
 fi
 
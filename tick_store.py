@@ -0,0 +1,406 @@
+"""
+逐笔成交的列式存储模块
+把 CSV/JSON 成交数据转换为定长二进制列（时间戳、价格、数量、方向），
+读取时以只读 mmap 映射，按时间范围返回零拷贝的切片，可直接作为回测的价格序列
+
+存储格式为一个目录:
+    meta.json       元数据（行数、起止时间、字节序）
+    timestamp.i64   时间戳（毫秒，int64，递增）
+    price.f64       价格（float64）
+    size.f64        数量（float64）
+    side.i8         主动方向（1 买 / -1 卖 / 0 未知）
+
+时间戳列本身有序，按时间定位用二分查找，复杂度 O(log n)
+
+使用方法:
+    python tick_store.py convert trades.csv trades.ticks
+    python tick_store.py info trades.ticks
+"""
+
+import argparse
+import array
+import bisect
+import csv
+import json
+import mmap
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from backtester import PRICE_COLUMNS, TIME_COLUMNS, _find_column, open_data_file
+from grid_trading_strategy import SIDE_BUY, SIDE_NONE, SIDE_SELL
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+# 列名 -> (文件名, array 类型码)
+COLUMNS = {
+    'timestamp': ('timestamp.i64', 'q'),
+    'price': ('price.f64', 'd'),
+    'size': ('size.f64', 'd'),
+    'side': ('side.i8', 'b'),
+}
+
+SIZE_COLUMNS = ('size', 'quantity', 'qty', 'amount', 'volume')
+SIDE_COLUMNS = ('side', 'taker_side', 'direction')
+
+SIDE_VALUES = {
+    'buy': SIDE_BUY, 'b': SIDE_BUY, 'bid': SIDE_BUY, '1': SIDE_BUY,
+    'sell': SIDE_SELL, 's': SIDE_SELL, 'ask': SIDE_SELL, '-1': SIDE_SELL,
+}
+
+
+def parse_timestamp(value: Any) -> int:
+    """
+    把时间转换为毫秒时间戳
+    
+    数值按量级判断单位（秒、毫秒、微秒、纳秒），字符串支持纯数字和 ISO 8601
+    （不带时区的按 UTC 处理）
+    
+    Args:
+        value: 原始时间
+    
+    Returns:
+        毫秒时间戳
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            value = float(text)
+        except ValueError:
+            moment = datetime.fromisoformat(text.replace('Z', '+00:00'))
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            return int(round(moment.timestamp() * 1000))
+    
+    value = float(value)
+    magnitude = abs(value)
+    if magnitude < 1e11:
+        return int(round(value * 1000))
+    if magnitude < 1e14:
+        return int(value)
+    if magnitude < 1e17:
+        return int(value // 1000)
+    return int(value // 1_000_000)
+
+
+def parse_side(value: Any) -> int:
+    """把成交方向转换为 1 / -1 / 0"""
+    if value is None:
+        return SIDE_NONE
+    return SIDE_VALUES.get(str(value).strip().lower(), SIDE_NONE)
+
+
+def is_tick_store(path: str) -> bool:
+    """判断路径是否为列式存储目录"""
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class TickWriter:
+    """按块追加写入列式存储（要求时间戳不递减）"""
+    
+    def __init__(self, path: str, chunk_size: int = 65536):
+        """
+        Args:
+            path: 存储目录（不存在时创建，已有的列文件会被覆盖）
+            chunk_size: 每次写盘的行数
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.files = {name: open(os.path.join(path, filename), 'wb') for name, (filename, _) in COLUMNS.items()}
+        self.buffers = {name: array.array(code) for name, (_, code) in COLUMNS.items()}
+        # 写入过程中删除元数据，未完成的存储不会被当作可用数据读取
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+    
+    def append(self, timestamp: int, price: float, size: float = 0.0, side: int = SIDE_NONE):
+        """追加一笔成交"""
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError(f"时间戳必须递增: 第 {self.count + 1} 行 {timestamp} < {self.last_timestamp}")
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        
+        buffers = self.buffers
+        buffers['timestamp'].append(timestamp)
+        buffers['price'].append(price)
+        buffers['size'].append(size)
+        buffers['side'].append(side)
+        self.count += 1
+        if len(buffers['timestamp']) >= self.chunk_size:
+            self.flush()
+    
+    def flush(self):
+        """把缓冲区写入列文件"""
+        for name, buffer in self.buffers.items():
+            buffer.tofile(self.files[name])
+            self.buffers[name] = array.array(buffer.typecode)
+    
+    def close(self):
+        """写完剩余数据和元数据"""
+        self.flush()
+        for f in self.files.values():
+            f.close()
+        meta = {
+            'version': FORMAT_VERSION,
+            'count': self.count,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
+            'byteorder': sys.byteorder,
+            'columns': {name: filename for name, (filename, _) in COLUMNS.items()}
+        }
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        for f in self.files.values():
+            f.close()
+
+
+def _read_csv_ticks(path: str) -> Iterator[Tuple[Any, float, float, Any]]:
+    """逐行读取 CSV 成交数据，生成 (时间, 价格, 数量, 方向)"""
+    with open_data_file(path) as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        time_col = _find_column(header, TIME_COLUMNS)
+        price_col = _find_column(header, PRICE_COLUMNS)
+        size_col = _find_column(header, SIZE_COLUMNS)
+        side_col = _find_column(header, SIDE_COLUMNS)
+        if time_col is None or price_col is None:
+            raise ValueError(f"成交数据需要时间列和 price 列: {header}")
+        
+        for row in reader:
+            if not row:
+                continue
+            yield (
+                row[time_col],
+                float(row[price_col]),
+                float(row[size_col]) if size_col is not None else 0.0,
+                row[side_col] if side_col is not None else None
+            )
+
+
+def _read_json_ticks(path: str) -> Iterator[Tuple[Any, float, float, Any]]:
+    """读取 JSON 数组或 JSON Lines 成交数据，生成 (时间, 价格, 数量, 方向)"""
+    def pick(record: Dict, names: Tuple[str, ...]):
+        for name in names:
+            if name in record:
+                return record[name]
+        return None
+    
+    def convert(record: Dict):
+        record = {str(key).lower(): value for key, value in record.items()}
+        timestamp, price = pick(record, TIME_COLUMNS), pick(record, PRICE_COLUMNS)
+        if timestamp is None or price is None:
+            raise ValueError(f"成交记录缺少时间或价格: {record}")
+        size = pick(record, SIZE_COLUMNS)
+        return timestamp, float(price), float(size) if size is not None else 0.0, pick(record, SIDE_COLUMNS)
+    
+    with open_data_file(path) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == '[':
+            # JSON 数组需要整体解析
+            for record in json.loads(first + f.read()):
+                yield convert(record)
+            return
+        
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield convert(json.loads(line))
+            line = f.readline()
+
+
+def convert_ticks(source: str, destination: str) -> int:
+    """
+    把 CSV 或 JSON（数组或 JSON Lines，均支持 .gz）成交数据转换为列式存储
+    
+    Args:
+        source: 源数据文件
+        destination: 存储目录
+    
+    Returns:
+        写入的行数
+    """
+    name = source[:-3] if source.endswith('.gz') else source
+    reader = _read_json_ticks if name.endswith(('.json', '.jsonl', '.ndjson')) else _read_csv_ticks
+    with TickWriter(destination) as writer:
+        for timestamp, price, size, side in reader(source):
+            writer.append(parse_timestamp(timestamp), price, size, parse_side(side))
+    return writer.count
+
+
+class TickSlice:
+    """一段连续成交的零拷贝视图"""
+    
+    def __init__(self, timestamps: memoryview, prices: memoryview, sizes: memoryview, sides: memoryview):
+        self.timestamps = timestamps
+        self.prices = prices
+        self.sizes = sizes
+        self.sides = sides
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def price_path(self) -> Iterator[Tuple[int, float]]:
+        """生成 (时间戳, 价格) 序列，可直接传给 Backtester.run"""
+        return zip(self.timestamps, self.prices)
+    
+    def arrays(self) -> Dict[str, Any]:
+        """以 NumPy 数组返回各列（共享内存，不复制；需要安装 NumPy）"""
+        if np is None:
+            raise RuntimeError("需要安装 NumPy")
+        return {
+            'timestamp': np.frombuffer(self.timestamps, dtype=np.int64),
+            'price': np.frombuffer(self.prices, dtype=np.float64),
+            'size': np.frombuffer(self.sizes, dtype=np.float64),
+            'side': np.frombuffer(self.sides, dtype=np.int8)
+        }
+
+
+class TickStore:
+    """以只读 mmap 方式打开的列式存储"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 存储目录
+        """
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"不支持的存储版本: {self.meta.get('version')}")
+        if self.meta.get('byteorder') != sys.byteorder:
+            raise ValueError(f"存储的字节序 {self.meta.get('byteorder')} 与本机 {sys.byteorder} 不一致")
+        
+        self.path = path
+        self.count = self.meta['count']
+        self._maps = []
+        self.columns = {name: self._map_column(name) for name in COLUMNS}
+        self.timestamps = self.columns['timestamp']
+        self.prices = self.columns['price']
+        self.sizes = self.columns['size']
+        self.sides = self.columns['side']
+    
+    def column_path(self, name: str) -> str:
+        """列文件的路径"""
+        return os.path.join(self.path, COLUMNS[name][0])
+    
+    def _map_column(self, name: str) -> memoryview:
+        """映射一列，校验长度与元数据一致"""
+        code = COLUMNS[name][1]
+        if self.count == 0:
+            return memoryview(b'').cast(code)
+        with open(self.column_path(name), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped).cast(code)
+        if len(view) != self.count:
+            raise ValueError(f"列 {name} 的长度 {len(view)} 与元数据 {self.count} 不一致")
+        return view
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def index_of(self, timestamp: Any) -> int:
+        """
+        时间不早于 timestamp 的第一笔成交的位置（二分查找）
+        
+        Args:
+            timestamp: 毫秒时间戳，或 parse_timestamp 支持的任意时间格式
+        """
+        if not isinstance(timestamp, int):
+            timestamp = parse_timestamp(timestamp)
+        return bisect.bisect_left(self.timestamps, timestamp)
+    
+    def bounds(self, start: Any = None, end: Any = None) -> Tuple[int, int]:
+        """时间范围 [start, end) 对应的行号范围"""
+        begin = self.index_of(start) if start is not None else 0
+        stop = self.index_of(end) if end is not None else self.count
+        return begin, max(begin, stop)
+    
+    def slice(self, start: Any = None, end: Any = None) -> TickSlice:
+        """
+        返回时间范围 [start, end) 内成交的零拷贝视图
+        
+        Args:
+            start: 开始时间（含），None 表示从头开始
+            end: 结束时间（不含），None 表示到末尾
+        """
+        begin, stop = self.bounds(start, end)
+        return TickSlice(*(self.columns[name][begin:stop] for name in COLUMNS))
+    
+    def price_path(self, start: Any = None, end: Any = None) -> Iterator[Tuple[int, float]]:
+        """时间范围内的 (时间戳, 价格) 序列"""
+        return self.slice(start, end).price_path()
+    
+    def close(self):
+        """释放映射（仍被切片引用的映射在切片释放后才会回收）"""
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._maps = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _format_timestamp(timestamp: Optional[int]) -> str:
+    """把毫秒时间戳格式化为 UTC 时间"""
+    if timestamp is None:
+        return '-'
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def main():
+    """主函数：转换数据或查看存储信息"""
+    parser = argparse.ArgumentParser(description="逐笔成交列式存储")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help="把 CSV/JSON 成交数据转换为列式存储")
+    convert_parser.add_argument('source', help="源数据文件（.csv / .json / .jsonl，支持 .gz）")
+    convert_parser.add_argument('destination', help="存储目录")
+    info_parser = subparsers.add_parser('info', help="查看存储信息")
+    info_parser.add_argument('path', help="存储目录")
+    args = parser.parse_args()
+    
+    if args.command == 'convert':
+        count = convert_ticks(args.source, args.destination)
+        print(f"✅ 已转换 {count} 笔成交到 {args.destination}")
+        return
+    
+    with TickStore(args.path) as store:
+        print(f"成交笔数: {store.count}")
+        print(f"开始时间: {_format_timestamp(store.meta['first_timestamp'])} UTC")
+        print(f"结束时间: {_format_timestamp(store.meta['last_timestamp'])} UTC")
+
+
+if __name__ == "__main__":
+    main()